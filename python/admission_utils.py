@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import math
+import weakref
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from python.metric_utils import (
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_REJECTIONS,
+    ADMISSION_RUNNING,
+    ADMISSION_WAIT_SECONDS,
+    get_labels,
+    get_queue_labels,
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted because its lane is full or its
+    estimated wait exceeds the lane's budget. retry_after is a hint in whole
+    seconds for the Retry-After header.
+    """
+
+    def __init__(self, lane: str, retry_after: int, reason: str) -> None:
+        super().__init__(reason)
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded, prioritised admission in front of an engine that should run at
+    most max_running requests at a time.
+
+    Every request names a lane of wait_budgets. Lanes are served in strict
+    priority order (the first key of wait_budgets first) and in arrival order
+    within a lane. A request gets a slot at once if one is free and no request
+    of the same or a higher priority is waiting. Otherwise it is queued,
+    unless its lane already holds max_queued requests or its estimated wait
+    exceeds the budget of the lane, in which case AdmissionRejected is raised
+    right away instead of letting it time out in the queue. The estimated wait
+    is the number of requests ahead of it divided by max_running, times a
+    moving average of how long requests hold a slot.
+
+    Queue depth, wait time and rejections per lane and the number of running
+    requests are exported as the admission_* metrics.
+
+    Usage:
+        admission = AdmissionController(
+            max_running=128, max_queued=256,
+            wait_budgets={"interactive": 10, "batch": 300},
+        )
+        async with admission.slot("interactive"):
+            ...
+    """
+
+    def __init__(
+        self,
+        max_running: int,
+        max_queued: int,
+        wait_budgets: dict[str, float],
+        smoothing: float = 0.1,
+        model_name: str = "",
+    ) -> None:
+        if max_running < 1:
+            raise ValueError("max_running must be >= 1")
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.wait_budgets = wait_budgets
+        self.lanes = list(wait_budgets)
+        self.smoothing = smoothing
+        self.service_time = 0.0
+        self.running = 0
+        self._queues: dict[str, deque[asyncio.Future]] = {
+            lane: deque() for lane in self.lanes
+        }
+        self._depth_metrics = {
+            lane: ADMISSION_QUEUE_DEPTH.labels(**get_queue_labels(model_name, lane))
+            for lane in self.lanes
+        }
+        self._wait_metrics = {
+            lane: ADMISSION_WAIT_SECONDS.labels(**get_queue_labels(model_name, lane))
+            for lane in self.lanes
+        }
+        self._rejection_metrics = {
+            lane: ADMISSION_REJECTIONS.labels(**get_queue_labels(model_name, lane))
+            for lane in self.lanes
+        }
+        self._running_metric = ADMISSION_RUNNING.labels(**get_labels(model_name))
+
+    def queued(self, lane: str) -> int:
+        return len(self._queues[lane])
+
+    def _queued_ahead(self, lane: str) -> int:
+        """Number of waiting requests that would be served before a new one."""
+        return sum(
+            len(self._queues[ahead])
+            for ahead in self.lanes[: self.lanes.index(lane) + 1]
+        )
+
+    def estimate_wait(self, lane: str) -> float:
+        """Estimated seconds a request arriving now in lane waits for a slot."""
+        return (self._queued_ahead(lane) + 1) * self.service_time / self.max_running
+
+    async def acquire(self, lane: str) -> float:
+        """
+        Wait for a slot in lane and return the event loop time it was granted
+        at, to be passed to release.
+        """
+        if lane not in self._queues:
+            raise ValueError(f"Unknown admission lane: {lane!r}")
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if self.running < self.max_running and not self._queued_ahead(lane):
+            self.running += 1
+            self._running_metric.set(self.running)
+            self._wait_metrics[lane].observe(0.0)
+            return start
+
+        queue = self._queues[lane]
+        estimate = self.estimate_wait(lane)
+        if len(queue) >= self.max_queued or estimate > self.wait_budgets[lane]:
+            self._rejection_metrics[lane].inc()
+            reason = (
+                f"Too many {lane} requests queued ({len(queue)}), "
+                f"estimated wait {estimate:.1f}s"
+            )
+            logging.warning(reason)
+            raise AdmissionRejected(lane, max(1, math.ceil(estimate)), reason)
+
+        future = loop.create_future()
+        queue.append(future)
+        self._depth_metrics[lane].set(len(queue))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller went away.
+                self.release(loop.time())
+            elif future in queue:
+                queue.remove(future)
+                self._depth_metrics[lane].set(len(queue))
+            raise
+        now = loop.time()
+        self._wait_metrics[lane].observe(now - start)
+        return now
+
+    def release(self, admitted_at: float) -> None:
+        """Free the slot granted at admitted_at and admit the next request."""
+        held = asyncio.get_running_loop().time() - admitted_at
+        if self.service_time:
+            self.service_time += self.smoothing * (held - self.service_time)
+        else:
+            self.service_time = held
+        self.running -= 1
+        for lane in self.lanes:
+            queue = self._queues[lane]
+            while queue and self.running < self.max_running:
+                future = queue.popleft()
+                if not future.done():
+                    self.running += 1
+                    future.set_result(None)
+            self._depth_metrics[lane].set(len(queue))
+        self._running_metric.set(self.running)
+
+    @asynccontextmanager
+    async def slot(self, lane: str) -> AsyncIterator[None]:
+        admitted_at = await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def release_after(
+        self, stream: AsyncGenerator, admitted_at: float
+    ) -> AsyncGenerator:
+        """
+        Yield from stream and release the slot granted at admitted_at once it
+        ends or is closed, for responses that outlive the call admitting them.
+        The slot is also released if the returned stream is dropped without
+        being iterated or closed, e.g. when the client goes away first.
+        """
+        return _ReleasingStream(stream, self.release, admitted_at)
+
+
+def _release_dropped(
+    loop: asyncio.AbstractEventLoop,
+    release: Callable[[float], None],
+    admitted_at: float,
+) -> None:
+    # Runs when a _ReleasingStream is garbage collected, which can happen
+    # outside of the event loop.
+    if not loop.is_closed():
+        loop.call_soon_threadsafe(release, admitted_at)
+
+
+class _ReleasingStream(AsyncGenerator):
+    """
+    Async generator wrapping stream that calls release(admitted_at) exactly
+    once: when stream is exhausted, raises or is closed, or else when the
+    wrapper is garbage collected. An async generator function can't do this,
+    as its finally block never runs if it is dropped before it starts.
+    """
+
+    def __init__(
+        self,
+        stream: AsyncGenerator,
+        release: Callable[[float], None],
+        admitted_at: float,
+    ) -> None:
+        self._stream = stream
+        self._release = release
+        self._admitted_at = admitted_at
+        self._finalizer = weakref.finalize(
+            self,
+            _release_dropped,
+            asyncio.get_running_loop(),
+            release,
+            admitted_at,
+        )
+
+    def _release_slot(self) -> None:
+        if self._finalizer.detach() is not None:
+            self._release(self._admitted_at)
+
+    async def asend(self, value):
+        try:
+            return await self._stream.asend(value)
+        except BaseException:
+            self._release_slot()
+            raise
+
+    async def athrow(self, typ, val=None, tb=None):
+        try:
+            return await self._stream.athrow(typ, val, tb)
+        except BaseException:
+            self._release_slot()
+            raise
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release_slot()
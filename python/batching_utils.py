@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from collections.abc import Callable, Hashable, Sequence
+from concurrent.futures import Executor
+from typing import Any
+
+from python.metric_utils import BATCH_SIZE, get_batch_labels
+
+
+def estimate_tokens(text: str, chars_per_token: int = 4) -> int:
+    """Cheap token count estimate used to pack batches without tokenizing twice."""
+    return max(1, len(text) // chars_per_token)
+
+
+class MicroBatcher:
+    """
+    Cross-request dynamic batcher for blocking batch functions.
+
+    Concurrent callers submit lists of items. Items are collected for up to
+    max_wait_ms after the first one arrives, or until the pending items fill
+    a whole batch. They are then grouped by group_key (items in a batch always
+    share the same key), sorted by cost to cut padding, and packed greedily
+    into batches of at most max_batch_size items and max_batch_cost total
+    cost. An item whose cost alone exceeds the budget runs in a batch of its
+    own. Batches run one at a time through process_batch in the executor (the
+    loop's default executor if None), so the event loop stays responsive while
+    the model works. Each caller gets its results back in submission order.
+
+    process_batch receives a list of items and must return a sequence of
+    results of the same length. If it raises, every caller with items in that
+    batch gets the exception.
+
+    Usage:
+        batcher = MicroBatcher(model.encode, max_wait_ms=10, max_batch_cost=8192,
+                               cost=estimate_tokens)
+        vectors = await batcher.submit(["text1", "text2"])
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[list], Sequence],
+        max_wait_ms: float = 10.0,
+        max_batch_size: int | None = None,
+        max_batch_cost: int | None = None,
+        cost: Callable[[Any], int] | None = None,
+        group_key: Callable[[Any], Hashable] | None = None,
+        executor: Executor | None = None,
+        name: str = "batcher",
+        model_name: str = "",
+    ) -> None:
+        self.process_batch = process_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_batch_cost = max_batch_cost
+        self.cost = cost or (lambda item: 1)
+        self.group_key = group_key or (lambda item: None)
+        self.executor = executor
+        self._pending: list[tuple[Any, int, asyncio.Future]] = []
+        self._pending_cost = 0
+        self._wakeup: asyncio.Event | None = None
+        self._worker: asyncio.Task | None = None
+        self._batch_size_metric = BATCH_SIZE.labels(
+            **get_batch_labels(model_name, name)
+        )
+
+    async def submit(self, items: Sequence) -> list:
+        """Queue items for batching and wait for their results."""
+        if not items:
+            return []
+        loop = asyncio.get_running_loop()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            cost = self.cost(item)
+            self._pending.append((item, cost, future))
+            self._pending_cost += cost
+            futures.append(future)
+        self._ensure_worker()
+        self._wakeup.set()
+        return list(await asyncio.gather(*futures))
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    def _batch_full(self) -> bool:
+        return (
+            self.max_batch_size is not None
+            and len(self._pending) >= self.max_batch_size
+        ) or (
+            self.max_batch_cost is not None
+            and self._pending_cost >= self.max_batch_cost
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            deadline = loop.time() + self.max_wait
+            while not self._batch_full():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            pending, self._pending, self._pending_cost = self._pending, [], 0
+            self._wakeup.clear()
+            for batch in self._pack(pending):
+                await self._run_batch(loop, batch)
+
+    def _pack(self, pending: list) -> list[list]:
+        groups: dict[Hashable, list] = {}
+        for entry in pending:
+            if not entry[2].done():
+                groups.setdefault(self.group_key(entry[0]), []).append(entry)
+        batches = []
+        for entries in groups.values():
+            batch, batch_cost = [], 0
+            for entry in sorted(entries, key=lambda entry: entry[1]):
+                if batch and (
+                    (
+                        self.max_batch_size is not None
+                        and len(batch) >= self.max_batch_size
+                    )
+                    or (
+                        self.max_batch_cost is not None
+                        and batch_cost + entry[1] > self.max_batch_cost
+                    )
+                ):
+                    batches.append(batch)
+                    batch, batch_cost = [], 0
+                batch.append(entry)
+                batch_cost += entry[1]
+            if batch:
+                batches.append(batch)
+        return batches
+
+    async def _run_batch(self, loop: asyncio.AbstractEventLoop, batch: list) -> None:
+        self._batch_size_metric.observe(len(batch))
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.process_batch, [entry[0] for entry in batch]
+            )
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Batch function returned {len(results)} results "
+                    f"for {len(batch)} items."
+                )
+        except Exception as e:
+            logging.error(f"Error while processing a batch of {len(batch)}: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,331 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from python.metric_utils import (
+    CACHE_ENTRIES,
+    CACHE_HITS,
+    CACHE_MISSES,
+    CACHE_SIZE_BYTES,
+    get_cache_labels,
+    total_size,
+)
+
+
+class LRUCache:
+    """
+    Bounded in-process LRU cache that exports Prometheus metrics.
+
+    Entries are evicted least-recently-used first as soon as either bound is
+    exceeded: max_entries (number of items) or max_bytes (sum of sizeof(value)
+    over all items). A bound set to None is ignored; a cache with both bounds
+    set to 0 is disabled and every lookup is a miss. With ttl set, entries
+    also expire ttl seconds after they were put; an expired entry is a miss.
+    All operations are guarded by a lock so the cache can be shared with
+    executor threads.
+
+    Hit rate and memory are exported per (model_name, cache) as the
+    cache_hits/cache_misses counters and the cache_entries/cache_size_bytes
+    gauges (see python/metric_utils.py).
+
+    Usage:
+        cache = LRUCache("features", model_name="enwiki-articlequality", max_entries=1000)
+        value = cache.get(key)
+        if value is None:
+            value = compute(key)
+            cache.put(key, value)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_name: str,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] = total_size,
+        ttl: float | None = None,
+    ) -> None:
+        self.name = name
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.size_bytes = 0
+        # key -> (value, size, expiry time or None)
+        self._data: OrderedDict[Hashable, tuple[Any, int, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        labels = get_cache_labels(model_name, name)
+        self._hits_metric = CACHE_HITS.labels(**labels)
+        self._misses_metric = CACHE_MISSES.labels(**labels)
+        self._entries_metric = CACHE_ENTRIES.labels(**labels)
+        self._size_metric = CACHE_SIZE_BYTES.labels(**labels)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries != 0 and self.max_bytes != 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key (marking it recently used) or default."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[2] is not None and item[2] <= time.monotonic():
+                del self._data[key]
+                self.size_bytes -= item[1]
+                self._update_gauges()
+                item = None
+            if item is None:
+                self.misses += 1
+                self._misses_metric.inc()
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            self._hits_metric.inc()
+            return item[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Insert or replace a value, evicting old entries to stay within bounds."""
+        if not self.enabled:
+            return
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            logging.debug(
+                f"Not caching entry of {size} bytes in {self.name} cache "
+                f"(max {self.max_bytes} bytes)."
+            )
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[1]
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._data[key] = (value, size, expires)
+            self.size_bytes += size
+            self._evict()
+            self._update_gauges()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry and return its value (or default if absent)."""
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            self.size_bytes -= item[1]
+            self._update_gauges()
+            return item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.size_bytes = 0
+            self._update_gauges()
+
+    def stats(self) -> dict[str, Any]:
+        """Snapshot of the cache counters, mainly for logging and tests."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "size_bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _evict(self) -> None:
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self.size_bytes > self.max_bytes)
+        ):
+            _, (_, size, _) = self._data.popitem(last=False)
+            self.size_bytes -= size
+
+    def _update_gauges(self) -> None:
+        self._entries_metric.set(len(self._data))
+        self._size_metric.set(self.size_bytes)
+
+
+class DiskCache:
+    """
+    Bounded persistent key/value cache in a SQLite file.
+
+    Used as a second tier behind an LRUCache, so entries survive restarts and
+    can be shared by every process that opens the same file. Keys are strings
+    and values anything JSON-serializable. When the file holds more than
+    max_entries entries the least recently used ones are deleted. Entries are
+    ordered by the wall-clock time they were last used, which is common to all
+    processes and restarts.
+
+    Writes are kept off the read path: the entry count is tracked from this
+    process's inserts and deletions (and only counted again after another
+    connection changed the file), and the last-used times of hits are
+    buffered and written by the next put, or once touch_batch_size of them
+    are pending or touch_interval seconds have passed. Hits and misses are
+    exported like LRUCache's; the entry gauge is kept up to date but the size
+    gauge is not, since the file size includes SQLite's own overhead.
+
+    The methods block on disk I/O, so async callers should run them in an
+    executor.
+
+    Usage:
+        disk = DiskCache("/srv/cache/translations.sqlite", "translations",
+                         model_name="nllb-200", max_entries=1_000_000)
+        value = disk.get(key)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        model_name: str,
+        max_entries: int | None = None,
+        touch_batch_size: int = 1000,
+        touch_interval: float = 1.0,
+    ) -> None:
+        self.path = path
+        self.name = name
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.touch_batch_size = touch_batch_size
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache(used)")
+        self._connection.commit()
+        self._last_used = 0
+        # Last-used times of hits not written yet, by key.
+        self._touched: dict[str, int] = {}
+        self._touched_at = time.monotonic()
+        self._data_version = None
+        self._entries = self._count()
+        labels = get_cache_labels(model_name, name)
+        self._hits_metric = CACHE_HITS.labels(**labels)
+        self._misses_metric = CACHE_MISSES.labels(**labels)
+        self._entries_metric = CACHE_ENTRIES.labels(**labels)
+        self._entries_metric.set(self._entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def _now(self) -> int:
+        # Wall-clock nanoseconds, strictly increasing within the process.
+        self._last_used = max(time.time_ns(), self._last_used + 1)
+        return self._last_used
+
+    def _data_changed(self) -> bool:
+        """Whether another connection committed changes since the last call."""
+        (version,) = self._connection.execute("PRAGMA data_version").fetchone()
+        changed, self._data_version = version != self._data_version, version
+        return changed
+
+    def _count(self) -> int:
+        self._data_changed()
+        return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def _write_touched(self) -> None:
+        if self._touched:
+            self._connection.executemany(
+                "UPDATE cache SET used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_at = time.monotonic()
+
+    def get_many(self, keys: list[str]) -> dict[str, Any]:
+        """Return the cached values of the keys that are present."""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's limit on the number of query parameters.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                used = self._now()
+                self._touched.update((key, used) for key in found)
+                if (
+                    len(self._touched) >= self.touch_batch_size
+                    or time.monotonic() - self._touched_at >= self.touch_interval
+                ):
+                    self._write_touched()
+                    self._connection.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        self._hits_metric.inc(len(found))
+        self._misses_metric.inc(len(keys) - len(found))
+        return found
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def put_many(self, items: dict[str, Any]) -> None:
+        """Insert or replace values, evicting old entries to stay within bounds."""
+        if not items or self.max_entries == 0:
+            return
+        with self._lock:
+            if self._data_changed():
+                self._entries = self._count()
+            keys = list(items)
+            existing = 0
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                (count,) = self._connection.execute(
+                    f"SELECT COUNT(*) FROM cache WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchone()
+                existing += count
+            self._write_touched()
+            used = self._now()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, used) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), used) for key, value in items.items()],
+            )
+            self._entries += len(items) - existing
+            if self.max_entries is not None and self._entries > self.max_entries:
+                deleted = self._connection.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY used LIMIT ?)",
+                    (self._entries - self.max_entries,),
+                ).rowcount
+                self._entries -= deleted
+            self._connection.commit()
+            # Our own commit changes data_version only for other connections.
+            self._data_changed()
+            entries = self._entries
+        self._entries_metric.set(entries)
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many({key: value})
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_touched()
+            self._connection.commit()
+            self._connection.close()
@@ -0,0 +1,143 @@
+import base64
+import hashlib
+import logging
+import unicodedata
+from collections.abc import Awaitable, Callable, Sequence
+
+import numpy as np
+from kserve.errors import InvalidInput
+
+from python.cache_utils import LRUCache
+
+# OpenAI-compatible "encoding_format" values. "base64" packs each vector as
+# little-endian float32 like the OpenAI API does, "base64_float16" halves the
+# payload again for callers that can tolerate half precision.
+BASE64_DTYPES = {"base64": "<f4", "base64_float16": "<f2"}
+ENCODING_FORMATS = ("float", *BASE64_DTYPES)
+
+
+def get_encoding_format(payload: dict, default: str = "float") -> str:
+    """Read and validate the optional "encoding_format" field of a request."""
+    encoding_format = payload.get("encoding_format") or default
+    if encoding_format not in ENCODING_FORMATS:
+        error_message = (
+            f"Unsupported encoding_format {encoding_format!r}. "
+            f"Expected one of: {', '.join(ENCODING_FORMATS)}."
+        )
+        logging.error(error_message)
+        raise InvalidInput(error_message)
+    return encoding_format
+
+
+def get_truncate_dim(payload: dict, default: int | None = None) -> int | None:
+    """Read and validate the optional Matryoshka "truncate_dim" field of a request."""
+    truncate_dim = payload.get("truncate_dim", default)
+    if truncate_dim is None:
+        return None
+    if (
+        isinstance(truncate_dim, bool)
+        or not isinstance(truncate_dim, int)
+        or truncate_dim <= 0
+    ):
+        error_message = "Expected truncate_dim to be a positive integer."
+        logging.error(error_message)
+        raise InvalidInput(error_message)
+    return truncate_dim
+
+
+def truncate_embeddings(embeddings: np.ndarray, truncate_dim: int | None) -> np.ndarray:
+    """Matryoshka truncation of L2-normalized embeddings.
+
+    Keeps the first truncate_dim dimensions and re-normalizes each row, which is
+    what SentenceTransformer does when loaded with truncate_dim (it truncates
+    before normalizing, and normalization is scale invariant).
+    """
+    if truncate_dim is None or truncate_dim >= embeddings.shape[1]:
+        return embeddings
+    truncated = embeddings[:, :truncate_dim]
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.where(norms == 0, 1, norms)
+
+
+def encode_embeddings(embeddings, encoding_format: str = "float") -> list:
+    """Format a 2D batch of embeddings for the OpenAI-style response.
+
+    "float" returns one list of floats per row. The base64 formats cast the
+    whole batch once and emit one base64 string per row, which avoids building
+    (and JSON-serializing) a Python float per dimension.
+    """
+    if encoding_format == "float":
+        return [embedding.tolist() for embedding in embeddings]
+    matrix = np.ascontiguousarray(embeddings, dtype=BASE64_DTYPES[encoding_format])
+    return [base64.b64encode(row.tobytes()).decode("ascii") for row in matrix]
+
+
+def decode_embedding(data: str, encoding_format: str = "base64") -> np.ndarray:
+    """Decode a base64 embedding back into a float32 numpy vector."""
+    raw = np.frombuffer(base64.b64decode(data), dtype=BASE64_DTYPES[encoding_format])
+    return raw.astype(np.float32)
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of an input text used for cache keys."""
+    return unicodedata.normalize("NFC", text).strip()
+
+
+class EmbeddingCache:
+    """
+    Cache of full-dimension embeddings keyed by (model, prompt_name, text hash).
+
+    Vectors are stored before any Matryoshka truncation, so requests that ask
+    for different truncate_dim values are all served from the same entry (see
+    truncate_embeddings). Identical texts within one request are only encoded
+    once. The memory bound is the sum of the stored vectors' nbytes; a
+    max_bytes of 0 disables caching but keeps the in-request deduplication.
+    """
+
+    def __init__(self, model_name: str, max_bytes: int) -> None:
+        self.model_name = model_name
+        self.cache = LRUCache(
+            "embeddings",
+            model_name=model_name,
+            max_bytes=max_bytes,
+            sizeof=lambda vector: vector.nbytes,
+        )
+
+    def key(self, text: str, prompt_name: str | None) -> tuple:
+        digest = hashlib.blake2b(
+            normalize_text(text).encode("utf-8"), digest_size=16
+        ).digest()
+        return self.model_name, prompt_name, digest
+
+    async def embed(
+        self,
+        texts: list[str],
+        prompt_name: str | None,
+        encode: Callable[[list[str]], Awaitable[Sequence[np.ndarray]]],
+    ) -> np.ndarray:
+        """Return a float32 matrix of embeddings, one row per text.
+
+        encode is awaited at most once, with the unique texts that are not in
+        the cache, and must return their L2-normalized full-dimension vectors.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        keys = [self.key(text, prompt_name) for text in texts]
+        vectors = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self.cache.get(key) if self.cache.enabled else None
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+        if missing:
+            encoded = np.asarray(await encode(list(missing.values())), dtype=np.float32)
+            for key, vector in zip(missing, encoded):
+                # Copy the row so the cache does not pin the whole batch array.
+                vector = vector.copy()
+                vectors[key] = vector
+                self.cache.put(key, vector)
+        return np.stack([vectors[key] for key in keys])
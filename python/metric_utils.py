@@ -2,7 +2,7 @@ from collections import deque
 from itertools import chain
 from sys import getsizeof
 
-from prometheus_client import Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 PROM_LABELS = ["model_name"]
 FETCH_SIZE_BYTE = Histogram(
@@ -19,11 +19,114 @@ PRE_SIZE_BYTE = Histogram(
     labelnames=PROM_LABELS,
 )
 
+CACHE_LABELS = PROM_LABELS + ["cache"]
+CACHE_HITS = Counter(
+    "cache_hits",
+    "number of lookups served from an in-process cache",
+    labelnames=CACHE_LABELS,
+)
+
+CACHE_MISSES = Counter(
+    "cache_misses",
+    "number of lookups not found in an in-process cache",
+    labelnames=CACHE_LABELS,
+)
+
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "number of entries held by an in-process cache",
+    labelnames=CACHE_LABELS,
+)
+
+CACHE_SIZE_BYTES = Gauge(
+    "cache_size_bytes",
+    "approximate memory held by an in-process cache in bytes",
+    labelnames=CACHE_LABELS,
+)
+
+BATCH_LABELS = PROM_LABELS + ["batcher"]
+BATCH_SIZE = Histogram(
+    "batch_size",
+    "number of items per batch formed by a cross-request batcher",
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512],
+    labelnames=BATCH_LABELS,
+)
+
+
+PROMPT_TOKENS = Counter(
+    "prompt_tokens",
+    "number of prompt tokens submitted to an LLM engine",
+    labelnames=PROM_LABELS,
+)
+
+PROMPT_CACHED_TOKENS = Counter(
+    "prompt_cached_tokens",
+    "number of prompt tokens served from the prefix cache of an LLM engine",
+    labelnames=PROM_LABELS,
+)
+
+QUEUE_LABELS = PROM_LABELS + ["lane"]
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "number of requests waiting for admission to a model",
+    labelnames=QUEUE_LABELS,
+)
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds",
+    "time requests waited for admission to a model in seconds",
+    buckets=[0.005, 0.05, 0.25, 1, 2.5, 5, 10, 30, 60, 120, 300],
+    labelnames=QUEUE_LABELS,
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections",
+    "number of requests rejected by admission control",
+    labelnames=QUEUE_LABELS,
+)
+
+ADMISSION_RUNNING = Gauge(
+    "admission_running_requests",
+    "number of admitted requests holding a slot of a model",
+    labelnames=PROM_LABELS,
+)
+
+
+EXPLANATION_LABELS = PROM_LABELS + ["mode"]
+EXPLANATION_SECONDS = Histogram(
+    "explanation_seconds",
+    "time spent computing the explanation of a prediction in seconds",
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],
+    labelnames=EXPLANATION_LABELS,
+)
+
+EXPLANATION_TIMEOUTS = Counter(
+    "explanation_timeouts",
+    "number of explanations abandoned for exceeding their time budget",
+    labelnames=EXPLANATION_LABELS,
+)
+
 
 def get_labels(model_name):
     return {PROM_LABELS[0]: model_name}
 
 
+def get_cache_labels(model_name, cache_name):
+    return {CACHE_LABELS[0]: model_name, CACHE_LABELS[1]: cache_name}
+
+
+def get_batch_labels(model_name, batcher_name):
+    return {BATCH_LABELS[0]: model_name, BATCH_LABELS[1]: batcher_name}
+
+
+def get_queue_labels(model_name, lane):
+    return {QUEUE_LABELS[0]: model_name, QUEUE_LABELS[1]: lane}
+
+
+def get_explanation_labels(model_name, mode):
+    return {EXPLANATION_LABELS[0]: model_name, EXPLANATION_LABELS[1]: mode}
+
+
 def total_size(o, handlers={}):
     """Returns the approximate memory footprint an object and all of its contents.
 
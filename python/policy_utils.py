@@ -0,0 +1,59 @@
+import logging
+
+from kserve.errors import InvalidInput
+
+from python.metric_utils import PROMPT_CACHED_TOKENS, PROMPT_TOKENS, get_labels
+
+# Helpers shared by the policy classifiers (CoPE-A, CoPE-B), which prompt a
+# model with a policy followed by the content to classify.
+#
+# Their prompts are split at the content: everything before it only depends
+# on the policy, so requests for the same policy share a byte-identical
+# leading prefix that vLLM's prefix cache serves instead of recomputing it.
+# The prefix ends with a line break, so tokenizing the whole prompt yields the
+# same leading tokens whatever content follows; at worst the last token of the
+# prefix merges with the content, which only costs its last cache block.
+
+
+def normalize_policy(policy: str) -> str:
+    """Normalize line endings and outer whitespace, which do not change a policy."""
+    return policy.replace("\r\n", "\n").strip()
+
+
+def get_policies(payload: dict, max_policies: int) -> tuple[list[str], bool]:
+    """
+    Return the policies of a payload, either a single "policy" or a list of
+    "policies", and whether it was a list.
+    """
+    if "policies" in payload:
+        policies = payload["policies"]
+        if not isinstance(policies, list) or not policies:
+            error_message = "'policies' must be a non-empty list of strings."
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        if len(policies) > max_policies:
+            error_message = (
+                f"Too many policies: {len(policies)}, the maximum is {max_policies}."
+            )
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        batch = True
+    elif "policy" in payload:
+        policies = [payload["policy"]]
+        batch = False
+    else:
+        raise InvalidInput(
+            "Invalid payload format. Must contain a 'policy' or 'policies' field."
+        )
+    if not all(isinstance(policy, str) for policy in policies):
+        error_message = "'policy' and 'policies' must be strings."
+        logging.error(error_message)
+        raise InvalidInput(error_message)
+    return policies, batch
+
+
+def record_prefix_cache(model_name: str, request_output) -> None:
+    """Export how many prompt tokens of a request were served from the prefix cache."""
+    labels = get_labels(model_name)
+    PROMPT_TOKENS.labels(**labels).inc(len(request_output.prompt_token_ids))
+    PROMPT_CACHED_TOKENS.labels(**labels).inc(request_output.num_cached_tokens or 0)
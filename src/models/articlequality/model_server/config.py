@@ -14,6 +14,17 @@ class Settings(BaseSettings):
     force_http: bool = False
     model_name_v2: str = "articlequality_v2"
     model_path_v2: str = "/mnt/models/catboost_model.cbm"
+    max_concurrent_fetches: int = 10
+    # Sends the HTML fetches of all wikis to this endpoint (e.g. an internal
+    # API gateway) instead of each wiki's public host.
+    wiki_url: str | None = None
+    aiohttp_client_timeout: float = 5
+    http_pool_size: int = 100
+    dns_cache_ttl: int = 300
+    # Features of revisions already scored, in memory and optionally on disk.
+    feature_cache_size: int = 10000
+    feature_cache_path: str | None = None
+    feature_cache_disk_size: int = 1000000
 
 
 settings = Settings()
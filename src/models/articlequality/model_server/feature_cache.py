@@ -0,0 +1,71 @@
+import asyncio
+import json
+import logging
+from typing import Any
+
+from python.cache_utils import DiskCache, LRUCache
+
+# Bump when the output of get_article_features or get_article_features_v2
+# changes, so that features cached by an older version are not used.
+FEATURES_VERSION = 1
+
+
+class FeatureCache:
+    """
+    Cache of article features keyed by (feature_set, FEATURES_VERSION, wiki,
+    rev_id). A revision's content never changes, so neither do its features,
+    and a hit saves both fetching and parsing its HTML.
+
+    Lookups go to a bounded in-memory LRUCache first and then, if disk_path is
+    set, to a DiskCache whose hits are promoted to memory. The disk tier is read
+    and written in the loop's default executor, so that the event loop is not
+    blocked on disk I/O. Hit rates are
+    exported as the cache_hits/cache_misses metrics with cache="features" and
+    "features_disk".
+    """
+
+    def __init__(
+        self,
+        feature_set: str,
+        model_name: str,
+        max_entries: int,
+        disk_path: str | None = None,
+        disk_max_entries: int | None = None,
+    ) -> None:
+        self.feature_set = feature_set
+        self.cache = LRUCache(
+            "features", model_name=model_name, max_entries=max_entries
+        )
+        self.disk = (
+            DiskCache(
+                disk_path,
+                "features_disk",
+                model_name=model_name,
+                max_entries=disk_max_entries,
+            )
+            if disk_path
+            else None
+        )
+        if self.disk is not None:
+            logging.info(f"Using on-disk feature cache at {disk_path}")
+
+    def key(self, wiki: str, rev_id: int) -> str:
+        return json.dumps([self.feature_set, FEATURES_VERSION, wiki, rev_id])
+
+    async def get(self, wiki: str, rev_id: int) -> Any:
+        """Return the cached features of the revision, or None."""
+        key = self.key(wiki, rev_id)
+        features = self.cache.get(key) if self.cache.enabled else None
+        if features is None and self.disk is not None:
+            loop = asyncio.get_running_loop()
+            features = await loop.run_in_executor(None, self.disk.get, key)
+            if features is not None:
+                self.cache.put(key, features)
+        return features
+
+    async def put(self, wiki: str, rev_id: int, features: Any) -> None:
+        key = self.key(wiki, rev_id)
+        self.cache.put(key, features)
+        if self.disk is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.disk.put, key, features)
@@ -1,8 +1,10 @@
+import asyncio
 import logging
 import math
 from distutils.util import strtobool
 from typing import Any
 
+import aiohttp
 import kserve
 import numpy as np
 from kserve import ModelServer
@@ -18,6 +20,7 @@ from utils import (
 from python.decorators import preprocess_size_bytes
 from python.preprocess_utils import validate_json_input
 from src.models.articlequality.model_server.config import Settings
+from src.models.articlequality.model_server.feature_cache import FeatureCache
 from src.models.articlequality.model_server.model_v2 import ArticleQualityModelV2
 
 logging.basicConfig(level=kserve.constants.KSERVE_LOGLEVEL)
@@ -30,6 +33,13 @@ class ArticleQualityModel(kserve.Model):
         model_path: str,
         max_feature_vals: str,
         force_http: bool = False,
+        wiki_url: str | None = None,
+        aiohttp_client_timeout: float = 5,
+        http_pool_size: int = 100,
+        dns_cache_ttl: int = 300,
+        feature_cache_size: int = 10000,
+        feature_cache_path: str | None = None,
+        feature_cache_disk_size: int | None = None,
     ) -> None:
         super().__init__(name)
         self.name = name
@@ -37,6 +47,20 @@ class ArticleQualityModel(kserve.Model):
         self.model_path = model_path
         self.max_feature_vals = max_feature_vals
         self.protocol = "http" if force_http else "https"
+        self.wiki_url = wiki_url
+        self.aiohttp_client_timeout = aiohttp_client_timeout
+        self.http_pool_size = http_pool_size
+        self.dns_cache_ttl = dns_cache_ttl
+        self._http_client_session = {}
+        # Raw features are cached: normalizing them is cheap and depends on
+        # max_feature_vals, which may change between deployments.
+        self.feature_cache = FeatureCache(
+            "v1",
+            model_name=name,
+            max_entries=feature_cache_size,
+            disk_path=feature_cache_path,
+            disk_max_entries=feature_cache_disk_size,
+        )
         self.max_qual_vals = None
         self.model = None
         self.labels = ("Stub", "Start", "C", "B", "GA", "FA")
@@ -60,6 +84,34 @@ class ArticleQualityModel(kserve.Model):
         self.max_qual_vals = load_quality_max_featurevalues(self.max_feature_vals)
         self.ready = True
 
+    def stop(self) -> None:
+        super().stop()
+        # Called by the model server on shutdown, within its event loop.
+        asyncio.create_task(self.close_http_client_sessions())
+
+    async def close_http_client_sessions(self) -> None:
+        sessions, self._http_client_session = self._http_client_session, {}
+        for session in sessions.values():
+            await session.close()
+
+    def get_http_client_session(self, host: str) -> aiohttp.ClientSession:
+        """Returns a long-lived aiohttp session for the host passed as input,
+        created on first use. Its connections are kept alive and reused by
+        later requests, and DNS lookups are cached."""
+        if (
+            self._http_client_session.get(host, None) is None
+            or self._http_client_session[host].closed
+        ):
+            logging.info(f"Opening a new Asyncio session for {host}.")
+            self._http_client_session[host] = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.aiohttp_client_timeout),
+                raise_for_status=True,
+                connector=aiohttp.TCPConnector(
+                    limit=self.http_pool_size, ttl_dns_cache=self.dns_cache_ttl
+                ),
+            )
+        return self._http_client_session[host]
+
     def extract_score_range(self) -> tuple[float, float]:
         """Extract the top score and score range from the model."""
         top_input = []
@@ -85,10 +137,17 @@ class ArticleQualityModel(kserve.Model):
         inputs = validate_json_input(inputs)
         lang = inputs.get("lang")
         rev_id = inputs.get("rev_id")
-        article_html = await get_article_html(lang, rev_id, self.protocol)
-        raw_features = get_article_features(article_html)
-        raw_features_dict = dict(zip(self.feature_order, raw_features))
         page_length_idx = self.feature_order.index("characters")
+        raw_features = await self.feature_cache.get(lang, rev_id)
+        if raw_features is None:
+            host = self.wiki_url or f"{self.protocol}://{lang}.wikipedia.org"
+            article_html = await get_article_html(
+                self.get_http_client_session(host), host, lang, rev_id
+            )
+            raw_features = get_article_features(article_html)
+            if raw_features[page_length_idx] > 0:
+                await self.feature_cache.put(lang, rev_id, raw_features)
+        raw_features_dict = dict(zip(self.feature_order, raw_features))
         if raw_features[page_length_idx] > 0:  # page_length > 0
             normalized_features_tuple = normalize_features(
                 self.max_qual_vals, lang, *raw_features
@@ -146,11 +205,26 @@ if __name__ == "__main__":
         model_path=settings.model_path,
         max_feature_vals=settings.max_feature_vals,
         force_http=settings.force_http,
+        wiki_url=settings.wiki_url,
+        aiohttp_client_timeout=settings.aiohttp_client_timeout,
+        http_pool_size=settings.http_pool_size,
+        dns_cache_ttl=settings.dns_cache_ttl,
+        feature_cache_size=settings.feature_cache_size,
+        feature_cache_path=settings.feature_cache_path,
+        feature_cache_disk_size=settings.feature_cache_disk_size,
     )
     model_v2 = ArticleQualityModelV2(
         name=settings.model_name_v2,
         model_path=settings.model_path_v2,
         force_http=settings.force_http,
+        max_concurrent_fetches=settings.max_concurrent_fetches,
+        wiki_url=settings.wiki_url,
+        aiohttp_client_timeout=settings.aiohttp_client_timeout,
+        http_pool_size=settings.http_pool_size,
+        dns_cache_ttl=settings.dns_cache_ttl,
+        feature_cache_size=settings.feature_cache_size,
+        feature_cache_path=settings.feature_cache_path,
+        feature_cache_disk_size=settings.feature_cache_disk_size,
     )
     server = ModelServer()
     server.start([model, model_v2])
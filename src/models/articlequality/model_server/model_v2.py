@@ -1,12 +1,15 @@
+import asyncio
 import logging
 from typing import Any
 
+import aiohttp
 import kserve
 from catboost import CatBoostClassifier
 from kserve.errors import InferenceError
 
 from python.decorators import preprocess_size_bytes
 from python.preprocess_utils import validate_json_input
+from src.models.articlequality.model_server.feature_cache import FeatureCache
 from src.models.articlequality.model_server.request_model import RequestModel
 from src.models.articlequality.model_server.utils import (
     get_article_features_v2,
@@ -22,12 +25,35 @@ class ArticleQualityModelV2(kserve.Model):
         name: str,
         model_path: str,
         force_http: bool = False,
+        max_concurrent_fetches: int = 10,
+        wiki_url: str | None = None,
+        aiohttp_client_timeout: float = 5,
+        http_pool_size: int = 100,
+        dns_cache_ttl: int = 300,
+        feature_cache_size: int = 10000,
+        feature_cache_path: str | None = None,
+        feature_cache_disk_size: int | None = None,
     ) -> None:
         super().__init__(name)
         self.name = name
         self.ready = False
         self.model_path = model_path
         self.protocol = "http" if force_http else "https"
+        # Bounds the HTML fetches in flight across all requests, so a large
+        # batch can't flood the upstream.
+        self.fetch_semaphore = asyncio.Semaphore(max_concurrent_fetches)
+        self.wiki_url = wiki_url
+        self.aiohttp_client_timeout = aiohttp_client_timeout
+        self.http_pool_size = http_pool_size
+        self.dns_cache_ttl = dns_cache_ttl
+        self._http_client_session = {}
+        self.feature_cache = FeatureCache(
+            "v2",
+            model_name=name,
+            max_entries=feature_cache_size,
+            disk_path=feature_cache_path,
+            disk_max_entries=feature_cache_disk_size,
+        )
         self.model = None
         self.labels = None
         self.ordinal_class_weights = None
@@ -51,26 +77,90 @@ class ArticleQualityModelV2(kserve.Model):
         self.ordinal_class_weights = [i / (num_labels - 1) for i in range(num_labels)]
         self.ready = True
 
+    def stop(self) -> None:
+        super().stop()
+        # Called by the model server on shutdown, within its event loop.
+        asyncio.create_task(self.close_http_client_sessions())
+
+    async def close_http_client_sessions(self) -> None:
+        sessions, self._http_client_session = self._http_client_session, {}
+        for session in sessions.values():
+            await session.close()
+
+    def get_http_client_session(self, host: str) -> aiohttp.ClientSession:
+        """Returns a long-lived aiohttp session for the host passed as input,
+        created on first use. Its connections are kept alive and reused by
+        later requests, and DNS lookups are cached."""
+        if (
+            self._http_client_session.get(host, None) is None
+            or self._http_client_session[host].closed
+        ):
+            logging.info(f"Opening a new Asyncio session for {host}.")
+            self._http_client_session[host] = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.aiohttp_client_timeout),
+                raise_for_status=True,
+                connector=aiohttp.TCPConnector(
+                    limit=self.http_pool_size, ttl_dns_cache=self.dns_cache_ttl
+                ),
+            )
+        return self._http_client_session[host]
+
+    async def get_features(self, lang: str, rev_id: int) -> list[int]:
+        features = await self.feature_cache.get(lang, rev_id)
+        if features is not None:
+            return features
+        host = self.wiki_url or f"{self.protocol}://{lang}.wikipedia.org"
+        async with self.fetch_semaphore:
+            article_html = await get_article_html(
+                self.get_http_client_session(host), host, lang, rev_id
+            )
+        features = get_article_features_v2(article_html)
+        page_length_idx = self.feature_order.index("characters")
+        if features[page_length_idx] <= 0:  # page_length > 0
+            raise InferenceError(
+                f"Article with language {lang} and revid {rev_id}"
+                " has errors when preprocessing"
+            )
+        await self.feature_cache.put(lang, rev_id, features)
+        return features
+
     async def preprocess(
         self, inputs: dict[str, Any], headers: dict[str, str] = None
-    ) -> dict[str, list[dict[str, Any]]]:
+    ) -> dict[str, Any]:
+        """
+        Fetches and extracts the features of all instances concurrently.
+        An instance that fails doesn't fail the others: its error is kept
+        under "errors" by instance index and returned in its place by
+        predict. The request only fails if every instance does.
+        """
         validated_inputs: dict[str, list[dict[str, Any]]] = validate_json_input(inputs)
         request_model = RequestModel(**validated_inputs)
-        features_dict: dict[str, list[dict[str, Any]]] = {"features": []}
-        for validated_input in request_model.instances:
-            lang = validated_input.lang
-            rev_id = validated_input.rev_id
-            article_html = await get_article_html(lang, rev_id, self.protocol)
-            features = get_article_features_v2(article_html)
-            page_length_idx = self.feature_order.index("characters")
-            if features[page_length_idx] <= 0:  # page_length > 0
-                raise InferenceError(
-                    f"Article with language {lang} and revid {rev_id}"
-                    " has errors when preprocessing"
-                )
-
-            features_dict["features"].append(features)
-        return features_dict
+        results = await asyncio.gather(
+            *(
+                self.get_features(instance.lang, instance.rev_id)
+                for instance in request_model.instances
+            ),
+            return_exceptions=True,
+        )
+        errors = {
+            idx: result
+            for idx, result in enumerate(results)
+            if isinstance(result, Exception)
+        }
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        for idx, error in errors.items():
+            instance = request_model.instances[idx]
+            logging.error(
+                f"Skipping article with language {instance.lang} and revid"
+                f" {instance.rev_id}. Reason: {error}"
+            )
+        return {
+            "features": [
+                result for idx, result in enumerate(results) if idx not in errors
+            ],
+            "errors": {idx: str(error) for idx, error in errors.items()},
+        }
 
     @preprocess_size_bytes("articlequality", key_name="features")
     def predict(
@@ -88,12 +178,18 @@ class ArticleQualityModelV2(kserve.Model):
                     - GA, B probabilities are higher than the rest except for FA when the label is FA.
         prediction_probabilities: prediction probabilities for each class.
         features: calculated features for the given article.
+        Instances that could not be preprocessed get an "error" message instead.
 
         """
         features = request["features"]
+        errors = request.get("errors", {})
         response = {"predictions": []}
-        predictions = self.model.predict_proba(features)
-        for feature, prediction_proba in zip(features, predictions):
+        scored = zip(features, self.model.predict_proba(features))
+        for idx in range(len(features) + len(errors)):
+            if idx in errors:
+                response["predictions"].append({"error": errors[idx]})
+                continue
+            feature, prediction_proba = next(scored)
             response["predictions"].append(
                 {
                     "label": self.labels[prediction_proba.argmax()],
@@ -1,11 +1,19 @@
 import math
+from collections import Counter
 
-import aiohttp
 import pandas as pd
 from aiohttp.client_exceptions import ClientResponseError
 from kserve.errors import InferenceError
 from mwparserfromhtml import Article
-from mwparserfromhtml.parse.utils import is_transcluded
+from mwparserfromhtml.parse.elements import (
+    Category,
+    Citation,
+    Heading,
+    Media,
+    Messagebox,
+    Reference,
+    Wikilink,
+)
 from tenacity import retry, stop_after_attempt, wait_fixed
 
 from python.decorators import fetch_size_bytes
@@ -13,25 +21,28 @@ from python.decorators import fetch_size_bytes
 
 @fetch_size_bytes("articlequality")
 @retry(wait=wait_fixed(0.5), stop=stop_after_attempt(2), reraise=True)
-async def get_article_html(lang, revid, protocol):
+async def get_article_html(session, host, lang, revid):
     """Get an article revision's HTML.
 
     NOTE: fetching HTML for old revisions can be slow as it's not always cached.
     Here we use exact revision IDs.
 
+    The session is long-lived and pooled by the caller, so connections to the
+    host are kept alive across calls. host is either the wiki itself or an
+    internal endpoint serving all wikis, which is told the wiki by the Host
+    header.
+
     See: https://www.mediawiki.org/wiki/RESTBase/service_migration#Parsoid_endpoints
 
     """
-    base_url = f"{protocol}://{lang}.wikipedia.org/w/rest.php/v1/revision/{revid}/html"
-    timeout = aiohttp.ClientTimeout(total=5)
+    base_url = f"{host}/w/rest.php/v1/revision/{revid}/html"
+    headers = {
+        "User-Agent": "liftwing articlequality model",
+        "Host": f"{lang}.wikipedia.org",
+    }
     try:
-        async with aiohttp.ClientSession(
-            timeout=timeout, raise_for_status=True
-        ) as session:
-            async with session.get(
-                base_url, headers={"User-Agent": "liftwing articlequality model"}
-            ) as response:
-                return await response.text()
+        async with session.get(base_url, headers=headers) as response:
+            return await response.text()
     except ClientResponseError as e:
         error_message = f"Fetching html failed for the article revision with id: {revid}. Reason: {e.message}"
         raise InferenceError(error_message, status=str(e.status))
@@ -75,6 +86,51 @@ def _html_to_plaintext(article):
     return "\n".join(paragraphs) if paragraphs else None
 
 
+def _count_elements(article):
+    """Count the elements the features are built from in a single walk of
+    the article's tree, instead of one walk per element type.
+
+    An element is transcluded if it or one of its ancestors comes from a
+    template, which is tracked on the way down rather than looked up for
+    each element.
+    """
+    max_icon_pixel_area = 100 * 100  # 10000 pixels
+    counts = Counter()
+    stack = [(article.wikistew, False)]
+    while stack:
+        parent, parent_transcluded = stack.pop()
+        for tag in parent.children:
+            if tag.name is None:  # text, comments, doctype
+                continue
+            transcluded = parent_transcluded or tag.get("about", "").startswith("#mwt")
+            stack.append((tag, transcluded))
+            if Citation.is_citation(tag):
+                counts["refs"] += 1
+            elif Reference.is_reference(tag):
+                counts["sources"] += 1
+            elif Wikilink.is_wikilink(tag):
+                if not transcluded and not tag.get("href", "").endswith("redlink=1"):
+                    counts["wikilinks"] += 1
+            elif Category.is_category(tag):
+                if not transcluded:
+                    counts["categories"] += 1
+            elif Heading.is_heading(tag):
+                if Heading(tag).level <= 3:
+                    counts["headings"] += 1
+            elif Messagebox.is_message_box(tag):
+                counts["messageboxes"] += 1
+            if Media.is_media(tag):
+                media_type = Media.get_media_type(tag)
+                if media_type == "img":
+                    counts["images"] += 1
+                    image = Media(tag)
+                    if image.height * image.width > max_icon_pixel_area:
+                        counts["media"] += 1
+                elif media_type in ("audio", "video"):
+                    counts["media"] += 1
+    return counts
+
+
 def get_article_features_v2(article_html):
     try:
         article = Article(article_html)
@@ -84,44 +140,19 @@ def get_article_features_v2(article_html):
 
     plaintext = _html_to_plaintext(article)
     page_length = len(plaintext) if plaintext else 0
-    refs = len(article.wikistew.get_citations())
-    wikilinks_objects = [
-        w for w in article.wikistew.get_wikilinks() if not is_transcluded(w.html_tag)
-    ]
-    wikilinks = len(
-        [
-            wikilink.link.lstrip(".")
-            for wikilink in wikilinks_objects
-            if not wikilink.link.endswith("redlink=1")
-        ]
-    )
-    categories = len(
-        [1 for c in article.wikistew.get_categories() if not is_transcluded(c.html_tag)]
-    )
-    max_icon_pixel_area = 100 * 100  # 10000 pixels
-    article_images = [
-        image
-        for image in article.wikistew.get_images()
-        if image.height * image.width > max_icon_pixel_area
-    ]
-    article_videos = [video for video in article.wikistew.get_video()]
-    article_audio = [audio for audio in article.wikistew.get_audio()]
-    media = len(article_images) + len(article_videos) + len(article_audio)
-    headings = len([h for h in article.wikistew.get_headings() if h.level <= 3])
-
-    len_images = len(article.wikistew.get_images())
+    counts = _count_elements(article)
     len_first_paragraph = len(article.wikistew.get_first_paragraph())
 
     # feature order should follow the order in the model.
     # see the notebook or model.feature_names_ and ArticleQualityModel.feature_order
     return [
         page_length,
-        refs,
-        wikilinks,
-        categories,
-        media,
-        headings,
-        len_images,
+        counts["refs"],
+        counts["wikilinks"],
+        counts["categories"],
+        counts["media"],
+        counts["headings"],
+        counts["images"],
         len_first_paragraph,
     ]
 
@@ -135,51 +166,24 @@ def get_article_features(article_html):
 
     plaintext = _html_to_plaintext(article)
     page_length = len(plaintext) if plaintext else 0
-    refs = len(article.wikistew.get_citations())
-    wikilinks_objects = [
-        w for w in article.wikistew.get_wikilinks() if not is_transcluded(w.html_tag)
-    ]
-    wikilinks = len(
-        [
-            wikilink.link.lstrip(".")
-            for wikilink in wikilinks_objects
-            if not wikilink.link.endswith("redlink=1")
-        ]
-    )
-    categories = len(
-        [1 for c in article.wikistew.get_categories() if not is_transcluded(c.html_tag)]
-    )
-    max_icon_pixel_area = 100 * 100  # 10000 pixels
-    article_images = [
-        image
-        for image in article.wikistew.get_images()
-        if image.height * image.width > max_icon_pixel_area
-    ]
-    article_videos = [video for video in article.wikistew.get_video()]
-    article_audio = [audio for audio in article.wikistew.get_audio()]
-    media = len(article_images) + len(article_videos) + len(article_audio)
-    headings = len([h for h in article.wikistew.get_headings() if h.level <= 3])
-
-    # new additions
-    # unique sources
-    sources = len(article.wikistew.get_references())
+    counts = _count_elements(article)
 
     # infoboxes, if len >= 1, then return true else false
+    # (only the lead section is searched, so this is no full walk)
     infoboxes = True if len(article.wikistew.get_infobox()) >= 1 else False
 
-    # message boxes, return true if len >= 1 else false
-    messageboxes = True if len(article.wikistew.get_message_boxes()) >= 1 else False
-
     return [
         page_length,
-        refs,
-        wikilinks,
-        categories,
-        media,
-        headings,
-        sources,
+        counts["refs"],
+        counts["wikilinks"],
+        counts["categories"],
+        counts["media"],
+        counts["headings"],
+        # unique sources
+        counts["sources"],
         infoboxes,
-        messageboxes,
+        # message boxes, return true if len >= 1 else false
+        counts["messageboxes"] >= 1,
     ]
 
 
@@ -0,0 +1,81 @@
+"""
+Microbenchmark of the articlequality feature extraction on a large page.
+
+The page is built from a saved Parsoid HTML fixture by repeating all of its
+sections after the lead, so it has the mix of elements of a real article at
+the size of a long one. Each step is timed separately and compared with
+walking the tree once per element type, as mwparserfromhtml's getters do.
+
+Usage (from the root of the repo):
+    python src/models/articlequality/scripts/benchmark_features.py --repeat-sections 30
+"""
+
+import argparse
+import os
+import timeit
+import warnings
+
+from mwparserfromhtml import Article
+from mwparserfromhtml.parse.utils import is_transcluded
+
+from src.models.articlequality.model_server.utils import (
+    _count_elements,
+    _html_to_plaintext,
+    get_article_features,
+    get_article_features_v2,
+)
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__),
+    "../../../../test/unit/articlequality/fixtures/lighthouse.html",
+)
+
+
+def build_page(html: str, repeat_sections: int) -> str:
+    start = html.index('<section data-mw-section-id="1"')
+    end = html.index("</body>")
+    return html[:start] + html[start:end] * repeat_sections + html[end:]
+
+
+def count_with_getters(article: Article) -> None:
+    """One walk of the tree per element type."""
+    wikistew = article.wikistew
+    wikistew.get_citations()
+    wikistew.get_references()
+    [w for w in wikistew.get_wikilinks() if not is_transcluded(w.html_tag)]
+    [c for c in wikistew.get_categories() if not is_transcluded(c.html_tag)]
+    wikistew.get_images()
+    wikistew.get_video()
+    wikistew.get_audio()
+    wikistew.get_headings()
+    wikistew.get_images()
+    wikistew.get_message_boxes()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat-sections", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+    # mwparserfromhtml calls deprecated BeautifulSoup methods.
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        page = build_page(f.read(), args.repeat_sections)
+    article = Article(page)
+    steps = {
+        "parse": lambda: Article(page),
+        "plaintext": lambda: _html_to_plaintext(article),
+        "count (getters)": lambda: count_with_getters(article),
+        "count (single pass)": lambda: _count_elements(article),
+        "get_article_features": lambda: get_article_features(page),
+        "get_article_features_v2": lambda: get_article_features_v2(page),
+    }
+    print(f"page: {len(page) / 1024:.0f} KiB, best of {args.runs} runs")
+    for name, step in steps.items():
+        best = min(timeit.repeat(step, number=1, repeat=args.runs))
+        print(f"{name:<25} {best * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
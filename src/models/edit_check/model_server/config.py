@@ -9,6 +9,14 @@ If environment variables do not exist, it uses the default values.
 
 class Settings(BaseSettings):
     max_batch_size: int = 300
+    # Extra time to wait for texts of other requests before running a batch.
+    batch_wait_ms: float = 0.0
+    # SHAP explanations run in their own threads with a budget of model
+    # evaluations per text (smaller for approximate ones) and a time limit.
+    shap_workers: int = 1
+    shap_max_evals: int = 500
+    shap_approximate_max_evals: int = 100
+    shap_timeout: float = 30.0
     model_name: str = "edit-check"
     max_char_length: int = 2000
     environment: str = "production"
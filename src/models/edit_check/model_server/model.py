@@ -1,6 +1,10 @@
+import asyncio
+import copy
 import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from distutils.util import strtobool
 from typing import Any
 
@@ -17,6 +21,12 @@ from transformers import (
 )
 
 # from shap.plots._text import unpack_shap_explanation_contents, process_shap_values
+from python.batching_utils import MicroBatcher, estimate_tokens
+from python.metric_utils import (
+    EXPLANATION_SECONDS,
+    EXPLANATION_TIMEOUTS,
+    get_explanation_labels,
+)
 from python.preprocess_utils import validate_json_input
 from src.models.edit_check.model_server.config import settings
 from src.models.edit_check.model_server.request_model import RequestModel
@@ -37,10 +47,25 @@ class EditCheckModel(kserve.Model):
         self.ready = False
         self.model_path = os.environ.get("MODEL_PATH", "/mnt/models/")
         self.model_pipeline = self.load()
-        self.explainer = shap.Explainer(self.model_pipeline)
+        self.explainer = shap.Explainer(self.explanation_pipeline)
+        # An explanation costs up to max_evals forward passes, so explanations
+        # run in their own threads while predictions keep being served.
+        self.explanation_executor = ThreadPoolExecutor(
+            max_workers=settings.shap_workers, thread_name_prefix="shap"
+        )
         self.use_metadata = strtobool(
             os.environ.get("USE_METADATA", "False")
         )  # if using lang and page_title in model input
+        # Texts of concurrent requests are classified together, up to BATCH
+        # texts per pipeline call, sorted by length to cut padding.
+        self.batcher = MicroBatcher(
+            self.classify,
+            max_wait_ms=settings.batch_wait_ms,
+            max_batch_size=BATCH,
+            cost=lambda text: min(estimate_tokens(text), MAXLEN),
+            name="edit_check",
+            model_name=name,
+        )
 
     def load(self) -> Pipeline:
         device = "cuda:0" if torch.cuda.is_available() else "cpu"
@@ -65,9 +90,69 @@ class EditCheckModel(kserve.Model):
             device=device,
             batch_size=BATCH,
         )
+        # The explainer shares the model but not the tokenizer: a fast
+        # tokenizer cannot be used by two threads at once.
+        self.explanation_pipeline = pipeline(
+            task="text-classification",
+            model=model,
+            tokenizer=copy.deepcopy(tokenizer),
+            device=device,
+            batch_size=BATCH,
+        )
         self.ready = True
         return model_pipeline
 
+    def classify(self, texts: list[str]) -> list[dict[str, Any]]:
+        """Run the pipeline on one batch of texts (called off the event loop)."""
+        return self.model_pipeline(
+            texts, truncation=True, max_length=MAXLEN, batch_size=len(texts)
+        )
+
+    def explain(self, text: str, max_evals: int) -> Any:
+        """Explain the prediction for one text (called in the explanation executor)."""
+        return self.explainer([text], max_evals=max_evals)[0]
+
+    async def explain_texts(
+        self, texts: list[str], approximate: list[bool]
+    ) -> list[Any]:
+        """
+        Explain texts in the explanation executor, with a smaller evaluation
+        budget for the approximate ones. An explanation that is not done within
+        settings.shap_timeout seconds (including the time it waited for a
+        worker) is returned as None; if it had already started, its thread
+        finishes it in the background.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def explain_one(text: str, approximate: bool) -> Any:
+            mode = "approximate" if approximate else "full"
+            max_evals = (
+                settings.shap_approximate_max_evals
+                if approximate
+                else settings.shap_max_evals
+            )
+            labels = get_explanation_labels(self.name, mode)
+            start = time.perf_counter()
+            try:
+                explanation = await asyncio.wait_for(
+                    loop.run_in_executor(
+                        self.explanation_executor, self.explain, text, max_evals
+                    ),
+                    settings.shap_timeout,
+                )
+            except asyncio.TimeoutError:
+                EXPLANATION_TIMEOUTS.labels(**labels).inc()
+                logging.warning(
+                    f"SHAP explanation timed out after {settings.shap_timeout}s."
+                )
+                return None
+            EXPLANATION_SECONDS.labels(**labels).observe(time.perf_counter() - start)
+            return explanation
+
+        return await asyncio.gather(
+            *(explain_one(text, approx) for text, approx in zip(texts, approximate))
+        )
+
     async def preprocess(
         self, inputs: dict[str, Any], headers: dict[str, str] = None
     ) -> tuple[list[str], list[str], dict[str, list]]:
@@ -140,15 +225,17 @@ class EditCheckModel(kserve.Model):
         # Extract the three lists from preprocess output
         text_for_prediction, text_for_explanation, processed_requests = request
 
-        # Predict both original and modified text
-        tokenizer_kwargs = {"truncation": True, "max_length": MAXLEN}
-        predictions = self.model_pipeline(
-            text_for_prediction, **tokenizer_kwargs, batch_size=BATCH
+        approximate = [
+            bool(valid_request["instance"].approximate_shap_values)
+            for valid_request in processed_requests["Valid"]
+            if valid_request["instance"].return_shap_values
+        ]
+        # Predict both original and modified text, batched with the texts of
+        # concurrent requests, while the modified texts are explained.
+        predictions, explainer_outputs = await asyncio.gather(
+            self.batcher.submit(text_for_prediction),
+            self.explain_texts(text_for_explanation, approximate),
         )
-        # Pass the modified text to the explainer
-        explainer_outputs = []
-        if len(text_for_explanation) > 0:
-            explainer_outputs = self.explainer(text_for_explanation)
 
         return predictions, explainer_outputs, processed_requests
 
@@ -187,22 +274,30 @@ class EditCheckModel(kserve.Model):
             # Return SHAP values and tokens if the request has return_shap_values set to True
             if valid_request["instance"].return_shap_values:
                 shap_values = explainer_outputs[explainer_outputs_idx]
-                (
-                    unpacked_values,
-                    clustering,
-                ) = shap.plots._text.unpack_shap_explanation_contents(shap_values)
-                # Reprocess the shap_values and tokens based on clustering data
-                # https://github.com/shap/shap/blob/master/shap/plots/_text.py#L378
-                tokens, values, _ = shap.plots._text.process_shap_values(
-                    shap_values.data, unpacked_values[:, 1], 1, "", clustering, False
-                )
-                # Return top 3 tokens with highest SHAP values
-                details["violations"] = sorted(
-                    zip(tokens, values), key=lambda x: x[1], reverse=True
-                )[:3]
-                details["shap_values"] = values.tolist()
-                details["tokens"] = tokens.tolist()
                 explainer_outputs_idx += 1
+                if shap_values is None:
+                    details["error"] = "SHAP explanation timed out"
+                else:
+                    (
+                        unpacked_values,
+                        clustering,
+                    ) = shap.plots._text.unpack_shap_explanation_contents(shap_values)
+                    # Reprocess the shap_values and tokens based on clustering data
+                    # https://github.com/shap/shap/blob/master/shap/plots/_text.py#L378
+                    tokens, values, _ = shap.plots._text.process_shap_values(
+                        shap_values.data,
+                        unpacked_values[:, 1],
+                        1,
+                        "",
+                        clustering,
+                        False,
+                    )
+                    # Return top 3 tokens with highest SHAP values
+                    details["violations"] = sorted(
+                        zip(tokens, values), key=lambda x: x[1], reverse=True
+                    )[:3]
+                    details["shap_values"] = values.tolist()
+                    details["tokens"] = tokens.tolist()
 
             # Construct the final response payload
             formatted_responses.append(
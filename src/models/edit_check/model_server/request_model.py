@@ -218,6 +218,10 @@ class Instance(BaseModel):
     return_shap_values: bool | None = Field(
         default=False, description="Whether to return SHAP values."
     )
+    approximate_shap_values: bool | None = Field(
+        default=False,
+        description="Whether to compute SHAP values with fewer model evaluations.",
+    )
 
     @field_validator("original_text", "modified_text", mode="after")
     def text_length(cls, value):
@@ -1,6 +1,8 @@
-import csv
 import logging
 import os
+import shutil
+import tempfile
+import threading
 from typing import Any
 
 import kserve
@@ -8,6 +10,11 @@ from kserve import ModelServer
 from kserve.errors import InvalidInput
 
 from python.preprocess_utils import check_input_param, validate_json_input
+from src.models.editing_suggestions.model_server.suggestions_index import (
+    SuggestionsIndex,
+    build_index,
+    source_signature,
+)
 
 logging.basicConfig(level=kserve.constants.KSERVE_LOGLEVEL)
 
@@ -34,42 +41,94 @@ def parse_page_id(page_id: Any) -> int:
     raise InvalidInput(error_message)
 
 
-def load_from_csv(path: str) -> dict[str, dict[int, list[dict[str, Any]]]]:
-    editing_suggestions: dict[str, dict[int, list[dict[str, Any]]]] = {}
-    with open(path, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            wiki_id = row["wiki_id"]
-            page_id = int(row["page_id"])
-            suggestion = {
-                **row,
-                "revision_id": int(row["revision_id"]),
-                "page_id": page_id,
-            }
-            pages = editing_suggestions.setdefault(wiki_id, {})
-            pages.setdefault(page_id, []).append(suggestion)
-    return editing_suggestions
-
-
 class EditingSuggestionsModel(kserve.Model):
-    def __init__(self, name: str, model_path: str) -> None:
+    def __init__(
+        self,
+        name: str,
+        model_path: str,
+        reload_interval: float = 0,
+        max_pages: int = 100,
+    ) -> None:
         super().__init__(name)
         self.name = name
         self.model_path = model_path
-        self.editing_suggestions: dict[str, dict[int, list[dict[str, Any]]]] = {}
+        self.reload_interval = reload_interval
+        self.max_pages = max_pages
+        self.index: SuggestionsIndex | None = None
+        self.signature: tuple[int, int, int] | None = None
+        self.build_dir: str | None = None
+        self.stop_watching = threading.Event()
         self.ready = False
         self.load()
+        if reload_interval > 0:
+            threading.Thread(target=self.watch, daemon=True).start()
+
+    def open_index(self) -> tuple[SuggestionsIndex, str | None]:
+        """
+        Open the suggestions index at model_path. A suggestions CSV is still
+        accepted and indexed into a temporary directory, which is returned
+        along with the index, but should be converted offline with
+        suggestions_index.py for fast startup.
+        """
+        if os.path.isdir(self.model_path):
+            logging.info("Loading suggestions index from %s", self.model_path)
+            return SuggestionsIndex(self.model_path), None
+        logging.warning("%s is not a suggestions index, building one", self.model_path)
+        build_dir = tempfile.mkdtemp()
+        try:
+            index_path = os.path.join(build_dir, "index")
+            build_index(self.model_path, index_path)
+            return SuggestionsIndex(index_path), build_dir
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
 
     def load(self) -> None:
-        logging.info("Loading suggestions from %s", self.model_path)
-        self.editing_suggestions = load_from_csv(self.model_path)
+        self.signature = source_signature(self.model_path)
+        self.index, self.build_dir = self.open_index()
         self.ready = True
 
-    def preprocess(
-        self, inputs: dict[str, Any], headers: dict[str, str] = None
-    ) -> dict[str, Any]:
-        inputs = validate_json_input(inputs)
-        wiki_id = inputs.get("wiki_id")
-        page_id = inputs.get("page_id")
+    def reload_if_changed(self) -> bool:
+        """
+        Load the suggestions at model_path again if they changed since the last
+        load and swap them in. Requests read self.index once, so they see either
+        the old or the new index in full, never a partially loaded one.
+        """
+        signature = source_signature(self.model_path)
+        if signature == self.signature:
+            return False
+        index, build_dir = self.open_index()
+        if source_signature(self.model_path) != signature:
+            # Replaced again while loading, the next check picks up the new one.
+            if build_dir:
+                shutil.rmtree(build_dir, ignore_errors=True)
+            return False
+        old_build_dir = self.build_dir
+        self.index, self.signature, self.build_dir = index, signature, build_dir
+        # Open memory maps of the old index stay valid after its files are removed.
+        if old_build_dir:
+            shutil.rmtree(old_build_dir, ignore_errors=True)
+        logging.info("Reloaded suggestions index of %s pages", len(index))
+        return True
+
+    def watch(self) -> None:
+        """Check model_path for new suggestions every reload_interval seconds."""
+        while not self.stop_watching.wait(self.reload_interval):
+            try:
+                self.reload_if_changed()
+            except Exception:
+                logging.exception(
+                    "Failed to reload suggestions from %s, keeping the current ones",
+                    self.model_path,
+                )
+
+    def parse_page(self, page: Any, default_wiki_id: Any = None) -> dict[str, Any]:
+        if not isinstance(page, dict):
+            error_message = "Each page should be an object with a 'page_id' key."
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        wiki_id = page.get("wiki_id", default_wiki_id)
+        page_id = page.get("page_id")
         check_input_param(wiki_id=wiki_id, page_id=page_id)
 
         if not isinstance(wiki_id, str):
@@ -81,17 +140,55 @@ class EditingSuggestionsModel(kserve.Model):
 
         return {"wiki_id": wiki_id, "page_id": page_id}
 
+    def preprocess(
+        self, inputs: dict[str, Any], headers: dict[str, str] = None
+    ) -> dict[str, Any]:
+        """
+        Accepts either a single {"wiki_id": ..., "page_id": ...} or a batch of
+        {"pages": [{"wiki_id": ..., "page_id": ...}, ...]}. Pages of a batch
+        may omit wiki_id to use a top-level "wiki_id".
+        """
+        inputs = validate_json_input(inputs)
+        if "pages" not in inputs:
+            return self.parse_page(inputs)
+
+        pages = inputs["pages"]
+        if not isinstance(pages, list) or not pages:
+            error_message = "The input 'pages' should be a non-empty list."
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        if len(pages) > self.max_pages:
+            error_message = (
+                f"The input 'pages' should have at most {self.max_pages} items."
+            )
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+
+        return {
+            "pages": [self.parse_page(page, inputs.get("wiki_id")) for page in pages]
+        }
+
     def predict(
         self, inputs: dict[str, Any], headers: dict[str, str] = None
     ) -> dict[str, list[dict[str, Any]]]:
-        wiki_id = inputs["wiki_id"]
-        page_id = inputs["page_id"]
-        suggestions = self.editing_suggestions.get(wiki_id, {}).get(page_id, [])
-        return {"suggestions": suggestions}
+        # Read the index once so a hot reload cannot split a batch across indexes.
+        index = self.index
+        if "pages" not in inputs:
+            suggestions = index.lookup(inputs["wiki_id"], inputs["page_id"])
+            return {"suggestions": suggestions}
+
+        return {
+            "pages": [
+                {**page, "suggestions": index.lookup(page["wiki_id"], page["page_id"])}
+                for page in inputs["pages"]
+            ]
+        }
 
 
 if __name__ == "__main__":
     model_name = os.environ.get("MODEL_NAME", "editing-suggestions")
     model_path = os.environ.get("MODEL_PATH", "/mnt/models/suggestions.csv")
-    model = EditingSuggestionsModel(model_name, model_path)
+    reload_interval = float(os.environ.get("RELOAD_INTERVAL_SECONDS", 60))
+    max_pages = int(os.environ.get("MAX_PAGES", 100))
+    model = EditingSuggestionsModel(model_name, model_path, reload_interval, max_pages)
     ModelServer(workers=1).start([model])
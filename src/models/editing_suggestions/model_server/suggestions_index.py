@@ -0,0 +1,208 @@
+"""
+Compact on-disk index of editing suggestions keyed by (wiki_id, page_id).
+
+The suggestions CSV is converted offline into a directory with:
+
+* index.json: the CSV column names and {wiki_id: [start, end]}, the range of
+  each wiki in the arrays below
+* page_ids.npy: int64 page ids, sorted within each wiki range
+* offsets.npy: int64 byte offsets into suggestions.jsonl, one more than page_ids
+* suggestions.jsonl: one JSON list per (wiki_id, page_id) of the column values
+  of its suggestions
+
+The server memory-maps the arrays and the JSON lines, so opening the index is
+instant and only the pages that are looked up are ever read from disk.
+
+The index path is a symlink to a hidden sibling directory holding the files,
+which build_index swaps atomically when the index is rebuilt.
+
+Usage:
+    python -m src.models.editing_suggestions.model_server.suggestions_index \
+        suggestions.csv /path/to/index
+"""
+
+import argparse
+import csv
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+from typing import Any
+
+import numpy as np
+
+INDEX_FILE = "index.json"
+PAGE_IDS_FILE = "page_ids.npy"
+OFFSETS_FILE = "offsets.npy"
+SUGGESTIONS_FILE = "suggestions.jsonl"
+INT64_MIN, INT64_MAX = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+
+
+def parse_suggestion(row: dict[str, str]) -> dict[str, Any]:
+    return {
+        **row,
+        "revision_id": int(row["revision_id"]),
+        "page_id": int(row["page_id"]),
+    }
+
+
+def load_from_csv(path: str) -> dict[str, dict[int, list[dict[str, Any]]]]:
+    """
+    Read a suggestions CSV into {wiki_id: {page_id: suggestions}}, the mapping
+    that an index built from it looks up.
+    """
+    editing_suggestions: dict[str, dict[int, list[dict[str, Any]]]] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            suggestion = parse_suggestion(row)
+            pages = editing_suggestions.setdefault(suggestion["wiki_id"], {})
+            pages.setdefault(suggestion["page_id"], []).append(suggestion)
+    return editing_suggestions
+
+
+def build_index(csv_path: str, index_path: str) -> None:
+    """
+    Build the index of a suggestions CSV into index_path.
+
+    Suggestions of a page keep their CSV order. The index is written to a
+    new directory next to index_path and a symlink to it atomically replaces
+    index_path, so a reader always finds a complete index there, the old one
+    or the new one. The directory of the old index is then removed.
+    """
+    rows = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        for position, row in enumerate(reader):
+            suggestion = parse_suggestion(row)
+            values = [suggestion[column] for column in columns]
+            rows.append(
+                (suggestion["wiki_id"], suggestion["page_id"], position, values)
+            )
+    rows.sort(key=lambda row: row[:3])
+
+    index_path = os.path.abspath(index_path)
+    parent, name = os.path.split(index_path)
+    tmp_path = tempfile.mkdtemp(prefix=f".{name}-", dir=parent)
+    try:
+        wikis: dict[str, list[int]] = {}
+        page_ids = []
+        offsets = [0]
+        with open(os.path.join(tmp_path, SUGGESTIONS_FILE), "wb") as f:
+            start = 0
+            while start < len(rows):
+                wiki_id, page_id = rows[start][:2]
+                end = start
+                while end < len(rows) and rows[end][:2] == (wiki_id, page_id):
+                    end += 1
+                suggestions = [row[3] for row in rows[start:end]]
+                line = json.dumps(suggestions, ensure_ascii=False) + "\n"
+                offsets.append(offsets[-1] + f.write(line.encode("utf-8")))
+                wikis.setdefault(wiki_id, [len(page_ids), len(page_ids)])[1] += 1
+                page_ids.append(page_id)
+                start = end
+        np.save(os.path.join(tmp_path, PAGE_IDS_FILE), np.array(page_ids, np.int64))
+        np.save(os.path.join(tmp_path, OFFSETS_FILE), np.array(offsets, np.int64))
+        with open(os.path.join(tmp_path, INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump({"columns": columns, "wikis": wikis}, f)
+        old_path = swap_index(tmp_path, index_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    if old_path is not None:
+        # Open memory maps of the old index stay valid after its files are removed.
+        shutil.rmtree(old_path, ignore_errors=True)
+    logging.info("Built suggestions index of %s pages in %s", len(page_ids), index_path)
+
+
+def swap_index(new_path: str, index_path: str) -> str | None:
+    """
+    Point index_path at the index directory new_path, a sibling of it, and
+    return the directory of the index it replaced, if any.
+    """
+    old_path = None
+    if os.path.islink(index_path):
+        old_path = os.path.realpath(index_path)
+    elif os.path.isdir(index_path):
+        # An index directory written in place cannot be swapped atomically:
+        # move it aside, this leaves index_path missing until the link below.
+        old_path = tempfile.mkdtemp(
+            prefix=f".{os.path.basename(index_path)}-old-",
+            dir=os.path.dirname(new_path),
+        )
+        os.rename(index_path, os.path.join(old_path, "index"))
+    link_path = new_path + ".link"
+    # Relative, so that the index can be moved or mounted elsewhere.
+    os.symlink(os.path.basename(new_path), link_path)
+    os.replace(link_path, index_path)
+    return old_path
+
+
+def source_signature(path: str) -> tuple[int, int, int]:
+    """
+    Identify the current version of an index directory or suggestions CSV.
+
+    build_index swaps a complete index into place, so the index.json of a new
+    index is always a new file.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, INDEX_FILE)
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class SuggestionsIndex:
+    """Read-only view of an index built by build_index."""
+
+    def __init__(self, index_path: str) -> None:
+        self.index_path = index_path
+        # Read every file of the same index even if index_path is swapped.
+        index_path = os.path.realpath(index_path)
+        with open(os.path.join(index_path, INDEX_FILE), encoding="utf-8") as f:
+            metadata = json.load(f)
+        self.columns: list[str] = metadata["columns"]
+        self.wikis: dict[str, tuple[int, int]] = {
+            wiki_id: tuple(bounds) for wiki_id, bounds in metadata["wikis"].items()
+        }
+        self.page_ids = np.load(os.path.join(index_path, PAGE_IDS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_path, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(index_path, SUGGESTIONS_FILE), "rb") as f:
+            # mmap cannot map an empty file.
+            self.suggestions = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if self.offsets[-1]
+                else b""
+            )
+
+    def __len__(self) -> int:
+        return len(self.page_ids)
+
+    def lookup(self, wiki_id: str, page_id: int) -> list[dict[str, Any]]:
+        """Return the suggestions of a page, or an empty list if it has none."""
+        if wiki_id not in self.wikis or not INT64_MIN <= page_id <= INT64_MAX:
+            return []
+        start, end = self.wikis[wiki_id]
+        position = start + int(
+            np.searchsorted(self.page_ids[start:end], page_id, side="left")
+        )
+        if position == end or self.page_ids[position] != page_id:
+            return []
+        line = self.suggestions[self.offsets[position] : self.offsets[position + 1]]
+        return [dict(zip(self.columns, values)) for values in json.loads(line)]
+
+    def close(self) -> None:
+        if isinstance(self.suggestions, mmap.mmap):
+            self.suggestions.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Build the editing suggestions index from a suggestions CSV."
+    )
+    parser.add_argument("csv_path", help="Path to the suggestions CSV.")
+    parser.add_argument("index_path", help="Directory to write the index to.")
+    args = parser.parse_args()
+    build_index(args.csv_path, args.index_path)
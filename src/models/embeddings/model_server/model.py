@@ -3,11 +3,21 @@ import os
 from distutils.util import strtobool
 
 import kserve
+import numpy as np
 import torch
 import torch.nn.functional as F
 from kserve.errors import InferenceError, InvalidInput
 from vllm import LLM
 
+from python.batching_utils import MicroBatcher, estimate_tokens
+from python.embedding_utils import (
+    EmbeddingCache,
+    encode_embeddings,
+    get_encoding_format,
+    get_truncate_dim,
+    truncate_embeddings,
+)
+
 logging.basicConfig(level=kserve.constants.KSERVE_LOGLEVEL)
 
 
@@ -26,6 +36,9 @@ class EmbeddingModel(kserve.Model):
         enforce_eager: bool = False,
         vllm_runner: str = "",
         pooling_type: str = "",
+        cache_max_bytes: int = 0,
+        batch_wait_ms: float = 10.0,
+        batch_max_tokens: int = 8192,
     ) -> None:
         super().__init__(name)
         self.name = name
@@ -40,6 +53,16 @@ class EmbeddingModel(kserve.Model):
         self.enforce_eager = enforce_eager
         self.vllm_runner = vllm_runner
         self.pooling_type = pooling_type
+        self.cache = EmbeddingCache(name, max_bytes=cache_max_bytes)
+        # Inputs from concurrent requests are packed into shared vLLM calls.
+        self.batcher = MicroBatcher(
+            self.embed,
+            max_wait_ms=batch_wait_ms,
+            max_batch_cost=batch_max_tokens,
+            cost=estimate_tokens,
+            name="embeddings",
+            model_name=name,
+        )
         self.model = None
         self.ready = False
 
@@ -93,10 +116,13 @@ class EmbeddingModel(kserve.Model):
             logging.critical(error_message)
             raise kserve.errors.InferenceError(error_message)
 
-    def preprocess(self, payload: dict, headers: dict[str, str]) -> list[str]:
+    def preprocess(self, payload: dict, headers: dict[str, str]) -> dict:
         """
         Preprocess the input data. vLLM expects a list of strings.
         Supports OpenAI-compatible API request format. (see T412338#11482782)
+        Optional "encoding_format" ("float", "base64" or "base64_float16")
+        selects how the vectors are serialized in the response, and optional
+        "truncate_dim" returns only the leading (Matryoshka) dimensions.
         """
         if "input" in payload:
             inputs = payload["input"]
@@ -109,50 +135,74 @@ class EmbeddingModel(kserve.Model):
         if isinstance(inputs, str):
             inputs = [inputs]
 
-        return inputs
+        return {
+            "input": inputs,
+            "encoding_format": get_encoding_format(payload),
+            "truncate_dim": get_truncate_dim(payload),
+        }
+
+    def embed(self, inputs: list[str]) -> np.ndarray:
+        """
+        Run vLLM on the inputs and return their L2-normalized embeddings as a
+        float32 numpy matrix (one row per input).
+        """
+        # Pooling runner (e.g. Jina) may require encode(); prefer embed() otherwise.
+        if self.vllm_runner == "pooling" and hasattr(self.model, "encode"):
+            logging.info("Using encode() for inference...")
+            outputs = self.model.encode(inputs, pooling_task="embed")
+            logging.info("outputs created")
+            # encode() returns torch.Tensor in PoolingOutput.data (possibly [1, D]).
+            # Keep device/dtype; F.normalize + .cpu() handle host transfer.
+            tensor_embeddings = torch.stack(
+                [output.outputs.data.reshape(-1) for output in outputs]
+            )
+            logging.info("tensor_embeddings created")
+        else:
+            outputs = self.model.embed(inputs)
+            # Extract embeddings from vLLM output
+            # Each output has an `outputs` attribute which contains the `embedding`
+            raw_embeddings = [output.outputs.embedding for output in outputs]
+
+            # Convert to tensor for normalization
+            # We use the device of the first embedding (likely CPU return from vLLM)
+            # or force to CPU for F.normalize calculation
+            tensor_embeddings = torch.tensor(raw_embeddings)
+
+        # Normalize embeddings (Important for cosine similarity)
+        # vLLM returns raw embeddings, so normalization is still required manually
+        normalized_embeddings = F.normalize(tensor_embeddings, p=2, dim=1)
+        logging.info("normalized_embeddings created")
+        # Move the whole batch to host memory once, so that it can be cached
+        # and encoded without per-float Python lists.
+        return normalized_embeddings.float().cpu().numpy()
 
-    def predict(self, inputs: list[str], headers: dict[str, str] = None) -> dict:
+    async def predict(self, request: dict, headers: dict[str, str] = None) -> dict:
         """
         Perform inference using vLLM to generate embeddings.
         Supports OpenAI-compatible API response format. (see T412338#11482782)
+        Full-dimension vectors are served from the embedding cache when possible,
+        and truncated afterwards if the request asks for a truncate_dim. Cache
+        misses go through the cross-request batcher, which runs vLLM off the
+        event loop.
         """
         try:
             logging.info("Performing inference...")
-
-            # Pooling runner (e.g. Jina) may require encode(); prefer embed() otherwise.
-            if self.vllm_runner == "pooling" and hasattr(self.model, "encode"):
-                logging.info("Using encode() for inference...")
-                outputs = self.model.encode(inputs, pooling_task="embed")
-                logging.info("outputs created")
-                # encode() returns torch.Tensor in PoolingOutput.data (possibly [1, D]).
-                # Keep device/dtype; F.normalize + .tolist() handle host transfer.
-                tensor_embeddings = torch.stack(
-                    [output.outputs.data.reshape(-1) for output in outputs]
-                )
-                logging.info("tensor_embeddings created")
-            else:
-                outputs = self.model.embed(inputs)
-                # Extract embeddings from vLLM output
-                # Each output has an `outputs` attribute which contains the `embedding`
-                raw_embeddings = [output.outputs.embedding for output in outputs]
-
-                # Convert to tensor for normalization
-                # We use the device of the first embedding (likely CPU return from vLLM)
-                # or force to CPU for F.normalize calculation
-                tensor_embeddings = torch.tensor(raw_embeddings)
-
-            # Normalize embeddings (Important for cosine similarity)
-            # vLLM returns raw embeddings, so normalization is still required manually
-            normalized_embeddings = F.normalize(tensor_embeddings, p=2, dim=1)
-            logging.info("normalized_embeddings created")
+            embeddings = await self.cache.embed(
+                request["input"], None, self.batcher.submit
+            )
+            embeddings = truncate_embeddings(embeddings, request.get("truncate_dim"))
             # Format response in OpenAI API format
             data = [
                 {
                     "object": "embedding",
-                    "embedding": embedding.tolist(),
+                    "embedding": embedding,
                     "index": idx,
                 }
-                for idx, embedding in enumerate(normalized_embeddings)
+                for idx, embedding in enumerate(
+                    encode_embeddings(
+                        embeddings, request.get("encoding_format", "float")
+                    )
+                )
             ]
 
             return {
@@ -186,6 +236,12 @@ if __name__ == "__main__":
 
     vllm_runner = os.environ.get("VLLM_RUNNER", "").strip()
     pooling_type = os.environ.get("POOLING_TYPE", "").strip()
+    # Memory budget of the full-dimension embedding cache (0 disables it).
+    cache_max_bytes = int(os.environ.get("EMBEDDING_CACHE_SIZE_MB", 256)) * 1024**2
+    # Cross-request batching: how long to wait for more inputs, and the
+    # (estimated) token budget of a single vLLM call.
+    batch_wait_ms = float(os.environ.get("BATCH_WAIT_MS", 10))
+    batch_max_tokens = int(os.environ.get("BATCH_MAX_TOKENS", max_num_batched_tokens))
 
     model = EmbeddingModel(
         name=model_name,
@@ -200,6 +256,9 @@ if __name__ == "__main__":
         enforce_eager=enforce_eager,
         vllm_runner=vllm_runner,
         pooling_type=pooling_type,
+        cache_max_bytes=cache_max_bytes,
+        batch_wait_ms=batch_wait_ms,
+        batch_max_tokens=batch_max_tokens,
     )
     model.load()
     kserve.ModelServer().start([model])
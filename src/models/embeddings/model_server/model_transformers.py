@@ -2,10 +2,20 @@ import logging
 import os
 
 import kserve
+import numpy as np
 import torch
 from kserve.errors import InferenceError, InvalidInput
 from sentence_transformers import SentenceTransformer
 
+from python.batching_utils import MicroBatcher, estimate_tokens
+from python.embedding_utils import (
+    EmbeddingCache,
+    encode_embeddings,
+    get_encoding_format,
+    get_truncate_dim,
+    truncate_embeddings,
+)
+
 logging.basicConfig(level=kserve.constants.KSERVE_LOGLEVEL)
 
 
@@ -28,6 +38,16 @@ class EmbeddingModel(kserve.Model):
     encode() is called with normalize_embeddings=True so the returned vectors are
     L2-normalized (consistent with the vLLM backend and ready for cosine/dot
     similarity).
+
+    Matryoshka truncation: the model is loaded at full dimension and vectors are
+    cached per (model, prompt_name, text) before truncation, so a per-request
+    "truncate_dim" (default TRUNCATE_DIM) is applied after the cache lookup and
+    requests with different dimensions share one cache entry.
+
+    Batching: cache misses from concurrent requests are collected for up to
+    BATCH_WAIT_MS and packed (by prompt_name, sorted by length) into encode()
+    calls of at most BATCH_MAX_TOKENS estimated tokens, which run off the event
+    loop one at a time.
     """
 
     def __init__(
@@ -39,6 +59,9 @@ class EmbeddingModel(kserve.Model):
         attn_implementation: str,
         default_prompt_name: str,
         truncate_dim: int | None,
+        cache_max_bytes: int = 0,
+        batch_wait_ms: float = 10.0,
+        batch_max_tokens: int = 8192,
     ) -> None:
         super().__init__(name)
         self.name = name
@@ -51,6 +74,17 @@ class EmbeddingModel(kserve.Model):
         self.attn_implementation = attn_implementation
         self.default_prompt_name = default_prompt_name
         self.truncate_dim = truncate_dim
+        self.cache = EmbeddingCache(name, max_bytes=cache_max_bytes)
+        # Items are (prompt_name, sentence) pairs; a batch shares one prompt.
+        self.batcher = MicroBatcher(
+            self.encode,
+            max_wait_ms=batch_wait_ms,
+            max_batch_cost=batch_max_tokens,
+            cost=lambda item: estimate_tokens(item[1]),
+            group_key=lambda item: item[0],
+            name="embeddings",
+            model_name=name,
+        )
 
     def load(self) -> None:
         """
@@ -64,7 +98,6 @@ class EmbeddingModel(kserve.Model):
                 trust_remote_code=True,
                 model_kwargs={"dtype": self.dtype},
                 config_kwargs={"_attn_implementation": self.attn_implementation},
-                truncate_dim=self.truncate_dim,
             )
             self.model.eval()
             self.ready = True
@@ -79,6 +112,9 @@ class EmbeddingModel(kserve.Model):
         Validate the input and resolve the retrieval prompt.
         Supports OpenAI-compatible API request format. (see T412338#11482782)
         Optional "prompt_name" (e.g. "query" or "document") overrides the default.
+        Optional "encoding_format" ("float", "base64" or "base64_float16")
+        selects how the vectors are serialized in the response, and optional
+        "truncate_dim" overrides the default Matryoshka dimension.
         """
         if "input" not in payload:
             error_message = "Invalid payload format. Use {'input': ['text1', 'text2']}"
@@ -91,29 +127,57 @@ class EmbeddingModel(kserve.Model):
             inputs = [inputs]
 
         prompt_name = payload.get("prompt_name", self.default_prompt_name) or None
-        return {"sentences": inputs, "prompt_name": prompt_name}
-
-    def predict(self, request: dict, headers: dict[str, str] = None) -> dict:
+        return {
+            "sentences": inputs,
+            "prompt_name": prompt_name,
+            "encoding_format": get_encoding_format(payload),
+            "truncate_dim": get_truncate_dim(payload, self.truncate_dim),
+        }
+
+    def encode(self, items: list[tuple[str | None, str]]) -> np.ndarray:
+        """
+        Encode a batch of (prompt_name, sentence) pairs that share the same
+        prompt_name into L2-normalized full-dimension embeddings.
+        """
+        return self.model.encode(
+            sentences=[sentence for _, sentence in items],
+            prompt_name=items[0][0],
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            # The batcher already packed the batch by token budget.
+            batch_size=len(items),
+        )
+
+    async def predict(self, request: dict, headers: dict[str, str] = None) -> dict:
         """
         Perform inference to generate embeddings.
         Supports OpenAI-compatible API response format. (see T412338#11482782)
         """
         try:
             logging.info("Performing inference...")
-            embeddings = self.model.encode(
-                sentences=request["sentences"],
-                prompt_name=request["prompt_name"],
-                normalize_embeddings=True,
-                convert_to_numpy=True,
+            prompt_name = request["prompt_name"]
+            embeddings = await self.cache.embed(
+                request["sentences"],
+                prompt_name,
+                lambda sentences: self.batcher.submit(
+                    [(prompt_name, sentence) for sentence in sentences]
+                ),
+            )
+            # One row per input sentence, truncated after the cache lookup.
+            embeddings = truncate_embeddings(
+                embeddings, request.get("truncate_dim", self.truncate_dim)
             )
-            # encode() returns a 2D array (one row per input sentence).
             data = [
                 {
                     "object": "embedding",
-                    "embedding": embedding.tolist(),
+                    "embedding": embedding,
                     "index": idx,
                 }
-                for idx, embedding in enumerate(embeddings)
+                for idx, embedding in enumerate(
+                    encode_embeddings(
+                        embeddings, request.get("encoding_format", "float")
+                    )
+                )
             ]
             return {
                 "object": "list",
@@ -140,6 +204,12 @@ if __name__ == "__main__":
     # Optional Matryoshka truncation of the embedding dim (Jina v5 supports it).
     _truncate_dim = os.environ.get("TRUNCATE_DIM", "").strip()
     truncate_dim = int(_truncate_dim) if _truncate_dim else None
+    # Memory budget of the full-dimension embedding cache (0 disables it).
+    cache_max_bytes = int(os.environ.get("EMBEDDING_CACHE_SIZE_MB", 256)) * 1024**2
+    # Cross-request batching: how long to wait for more inputs, and the
+    # (estimated) token budget of a single encode() call.
+    batch_wait_ms = float(os.environ.get("BATCH_WAIT_MS", 10))
+    batch_max_tokens = int(os.environ.get("BATCH_MAX_TOKENS", 8192))
 
     model = EmbeddingModel(
         name=model_name,
@@ -149,6 +219,9 @@ if __name__ == "__main__":
         attn_implementation=attn_implementation,
         default_prompt_name=default_prompt_name,
         truncate_dim=truncate_dim,
+        cache_max_bytes=cache_max_bytes,
+        batch_wait_ms=batch_wait_ms,
+        batch_max_tokens=batch_max_tokens,
     )
     model.load()
     kserve.ModelServer().start([model])
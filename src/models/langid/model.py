@@ -16,6 +16,11 @@ class LanguageIdentificationModel(Model):
         super().__init__(name)
         self.name = name
         self.max_text_length = int(os.environ.get("MAX_TEXT_LENGTH", 100))
+        self.max_instances = int(os.environ.get("MAX_INSTANCES", 1000))
+        self.max_input_length = int(os.environ.get("MAX_INPUT_LENGTH", 5_000_000))
+        self.max_total_input_length = int(
+            os.environ.get("MAX_TOTAL_INPUT_LENGTH", self.max_input_length)
+        )
         self.ready = False
         self.languages: dict[str, str] = self.create_language_lookup()
         self.model = self.load()
@@ -47,38 +52,120 @@ class LanguageIdentificationModel(Model):
 
         This resolves T377751 by enabling passing of a single line string to the fasttext model as per:
         https://github.com/facebookresearch/fastText/issues/1079#issuecomment-637440314
-        """
-
-        return re.sub(r"[\n\r\v\t ]+", " ", text).strip()[: self.max_text_length]
 
-    def preprocess(
-        self, inputs: dict[str, Any], headers: dict[str, str] = None
-    ) -> dict[str, Any]:
-        inputs = validate_json_input(inputs)
-        text = inputs.get("text", None)
+        Only a prefix of the text is cleaned up, so long inputs cost the same as
+        short ones. The prefix starts at a few times {max_text_length} to leave a
+        margin for the removed whitespace and is doubled until it yields enough
+        characters, which gives the same result as cleaning up the full text.
+        """
+        end = max(4 * self.max_text_length, 1)
+        while True:
+            # Collapsing whitespace in a prefix gives a prefix of the collapsed text.
+            normalized_text = re.sub(r"[\n\r\v\t ]+", " ", text[:end]).lstrip()
+            if end >= len(text) or len(normalized_text.rstrip()) > self.max_text_length:
+                return normalized_text.strip()[: self.max_text_length]
+            end *= 2
+
+    def get_normalized_text(self, instance: Any) -> str:
+        """
+        Validates a single {"text": ...} instance and returns its normalized text.
+        """
+        if not isinstance(instance, dict):
+            error_message = "Each instance should be an object with a 'text' key."
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        text = instance.get("text", None)
         check_input_param(text=text)
 
         if not isinstance(text, str):
             error_message = "The input 'text' should be a string."
             logging.error(error_message)
             raise InvalidInput(error_message)
+        elif len(text) > self.max_input_length:
+            error_message = (
+                f"The input 'text' is too long ({len(text)} characters). "
+                f"It should have at most {self.max_input_length} characters."
+            )
+            logging.error(error_message)
+            raise InvalidInput(error_message)
         else:
             normalized_text = self.normalize_text(text)
 
         return normalized_text
 
+    def preprocess(
+        self, inputs: dict[str, Any], headers: dict[str, str] = None
+    ) -> dict[str, Any]:
+        """
+        Accepts either a single {"text": ...} or a batch of
+        {"instances": [{"text": ...}, ...]}. Invalid instances of a batch do not
+        fail the whole request, their error is returned in their place.
+        """
+        inputs = validate_json_input(inputs)
+        if "instances" not in inputs:
+            return {"texts": [self.get_normalized_text(inputs)], "batch": False}
+
+        instances = inputs["instances"]
+        if not isinstance(instances, list) or not instances:
+            error_message = "The input 'instances' should be a non-empty list."
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        if len(instances) > self.max_instances:
+            error_message = (
+                f"The input 'instances' should have at most {self.max_instances} items."
+            )
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        total_length = sum(
+            len(instance["text"])
+            for instance in instances
+            if isinstance(instance, dict) and isinstance(instance.get("text"), str)
+        )
+        if total_length > self.max_total_input_length:
+            error_message = (
+                f"The input 'instances' are too long ({total_length} characters). "
+                f"They should have at most {self.max_total_input_length} characters "
+                "in total."
+            )
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+
+        texts = []
+        for instance in instances:
+            try:
+                texts.append(self.get_normalized_text(instance))
+            except InvalidInput as e:
+                texts.append(e)
+        return {"texts": texts, "batch": True}
+
     def predict(
-        self, normalized_text: str, headers: dict[str, str] = None
+        self, request: dict[str, Any], headers: dict[str, str] = None
     ) -> dict[str, Any]:
-        label, score = self.model.predict(normalized_text)
-        language = label[0].replace("__label__", "")
-
-        return {
-            "language": language,
-            "wikicode": self.languages.get(language).get("wikicode"),
-            "languagename": self.languages.get(language).get("languagename"),
-            "score": score[0],
-        }
+        texts = request["texts"]
+        valid_texts = [text for text in texts if isinstance(text, str)]
+        # fasttext natively predicts a list of texts in a single call.
+        labels, scores = self.model.predict(valid_texts) if valid_texts else ([], [])
+        results = iter(zip(labels, scores))
+
+        predictions = []
+        for text in texts:
+            if isinstance(text, InvalidInput):
+                predictions.append({"error": text.reason})
+                continue
+            label, score = next(results)
+            language = label[0].replace("__label__", "")
+            predictions.append(
+                {
+                    "language": language,
+                    "wikicode": self.languages.get(language).get("wikicode"),
+                    "languagename": self.languages.get(language).get("languagename"),
+                    "score": float(score[0]),
+                }
+            )
+
+        if not request["batch"]:
+            return predictions[0]
+        return {"predictions": predictions}
 
 
 if __name__ == "__main__":
@@ -2,23 +2,35 @@ import logging
 import os
 from typing import Any
 
-from kserve.errors import InferenceError
+from kserve.errors import InferenceError, InvalidInput
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 
-from python.preprocess_utils import validate_json_input
+from python.preprocess_utils import check_input_param, validate_json_input
 from src.models.llm.model import LLM
+from src.models.llm.nllb.translation_memory import (
+    TranslationMemory,
+    join_sentences,
+    split_sentences,
+)
 
 
 class NLLB(LLM):
     def __init__(self, model_name: str):
-        self.src_lang = os.environ.get("SRC_LANG", "eng_Latn")
+        self.default_src_lang = os.environ.get("SRC_LANG", "eng_Latn")
         super().__init__(model_name)
+        self.translation_memory = TranslationMemory(
+            model_name,
+            max_entries=int(os.environ.get("TRANSLATION_MEMORY_SIZE", 100_000)),
+            disk_path=os.environ.get("TRANSLATION_MEMORY_PATH"),
+            disk_max_entries=int(
+                os.environ.get("TRANSLATION_MEMORY_DISK_SIZE", 1_000_000)
+            ),
+        )
 
     def load_tokenizer(self):
         tokenizer = AutoTokenizer.from_pretrained(
             self.model_path,
             local_files_only=True,
-            src_lang=self.src_lang,
             low_cpu_mem_usage=True,
         )
         return tokenizer
@@ -49,14 +61,17 @@ class NLLB(LLM):
             inputs = validate_json_input(inputs)
             prompt = inputs.get("prompt")
             tgt_lang = inputs.get("tgt_lang")
+            check_input_param(prompt=prompt, tgt_lang=tgt_lang)
             result_length = inputs.get("result_length", 0)
-            if "src_lang" in inputs:
-                self.src_lang = inputs["src_lang"]
-                self.tokenizer = self.load_tokenizer()
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
-            inputs["result_length"] = result_length + inputs["input_ids"].size()[1]
-            inputs["tgt_lang"] = tgt_lang
-            return inputs
+            src_lang = inputs.get("src_lang", self.default_src_lang)
+            self.lang_code_id(src_lang)
+            self.lang_code_id(tgt_lang)
+            return {
+                "lines": split_sentences(prompt),
+                "src_lang": src_lang,
+                "tgt_lang": tgt_lang,
+                "result_length": result_length,
+            }
         except RuntimeError:
             logging.exception("An error has occurred in preprocess.")
             raise InferenceError(
@@ -67,15 +82,56 @@ class NLLB(LLM):
     def predict(
         self, request: dict[str, Any], headers: dict[str, str] = None
     ) -> dict[str, Any]:
-        tgt_lang = request.get("tgt_lang")
-        logging.info(f"Translating from {self.src_lang} to {tgt_lang}")
-        translated_tokens = self.model.generate(
-            request["input_ids"],
-            forced_bos_token_id=self.tokenizer.lang_code_to_id[tgt_lang],
-            max_length=request["result_length"],
+        src_lang = request["src_lang"]
+        tgt_lang = request["tgt_lang"]
+        result_length = request["result_length"]
+        lines = request["lines"]
+        logging.info(f"Translating from {src_lang} to {tgt_lang}")
+        translations = self.translation_memory.translate(
+            [sentence for sentences in lines for sentence in sentences],
+            src_lang,
+            tgt_lang,
+            lambda sentences: self.translate_batch(
+                sentences, src_lang, tgt_lang, result_length
+            ),
+            options=(result_length,),
         )
-
-        response = self.tokenizer.batch_decode(
-            translated_tokens, skip_special_tokens=True
-        )[0]
+        response = join_sentences(lines, translations, tgt_lang)
         return {"model_name": self.model_name, "response": response}
+
+    def lang_code_id(self, lang_code: str) -> int:
+        if isinstance(lang_code, str):
+            token_id = self.tokenizer.convert_tokens_to_ids(lang_code)
+            if token_id != self.tokenizer.unk_token_id:
+                return token_id
+        error_message = f"Unsupported language code: {lang_code}."
+        logging.error(error_message)
+        raise InvalidInput(error_message)
+
+    def tokenize(self, sentences: list[str], src_lang: str) -> dict[str, Any]:
+        """
+        Tokenize sentences of src_lang with the shared tokenizer. Setting the
+        tokenizer's src_lang would change it for concurrent requests, so the
+        language code and </s> are added here the way NllbTokenizer does.
+        """
+        lang_code_id = self.lang_code_id(src_lang)
+        eos_token_id = self.tokenizer.eos_token_id
+        encoded = self.tokenizer(sentences, add_special_tokens=False)["input_ids"]
+        if self.tokenizer.legacy_behaviour:
+            input_ids = [ids + [eos_token_id, lang_code_id] for ids in encoded]
+        else:
+            input_ids = [[lang_code_id] + ids + [eos_token_id] for ids in encoded]
+        return self.tokenizer.pad({"input_ids": input_ids}, return_tensors="pt").to(
+            self.device
+        )
+
+    def translate_batch(
+        self, sentences: list[str], src_lang: str, tgt_lang: str, result_length: int
+    ) -> list[str]:
+        inputs = self.tokenize(sentences, src_lang)
+        translated_tokens = self.model.generate(
+            **inputs,
+            forced_bos_token_id=self.lang_code_id(tgt_lang),
+            max_length=result_length + inputs["input_ids"].size()[1],
+        )
+        return self.tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)
@@ -1,14 +1,17 @@
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import ctranslate2 as ctr2
 import sentencepiece as spm
 from kserve.errors import InferenceError
 
-from python.preprocess_utils import validate_json_input
+from python.batching_utils import MicroBatcher
+from python.preprocess_utils import check_input_param, validate_json_input
 from python.resource_utils import get_cpu_count
 from src.models.llm.nllb.nllb import NLLB
+from src.models.llm.nllb.translation_memory import join_sentences, split_sentences
 
 
 class NLLBCTranslate(NLLB):
@@ -16,6 +19,20 @@ class NLLBCTranslate(NLLB):
         self.inter_threads = int(os.environ.get("CT2_INTER_THREADS", get_cpu_count()))
         self.intra_threads = int(os.environ.get("CT2_INTRA_THREADS", 0))
         super().__init__(model_name)
+        # Sentences of concurrent requests are batched together, per target
+        # language and beam size since both apply to a whole ctranslate2 call.
+        # Batches run one at a time in a dedicated thread so the event loop
+        # stays responsive, ctranslate2 parallelizes within a batch.
+        self.batcher = MicroBatcher(
+            self.translate_tokenized,
+            max_wait_ms=float(os.environ.get("BATCH_WAIT_MS", 10)),
+            max_batch_cost=int(os.environ.get("BATCH_MAX_TOKENS", 4096)),
+            cost=lambda item: len(item[0]),
+            group_key=lambda item: item[1:],
+            executor=ThreadPoolExecutor(max_workers=1, thread_name_prefix="ct2"),
+            name="translation",
+            model_name=model_name,
+        )
 
     def load_tokenizer(self):
         tokenizer = spm.SentencePieceProcessor()
@@ -48,9 +65,9 @@ class NLLBCTranslate(NLLB):
         try:
             inputs = validate_json_input(inputs)
             prompt = inputs.get("prompt")
-            if "src_lang" in inputs:
-                self.src_lang = inputs["src_lang"]
-            inputs["sentences"] = prompt.strip().splitlines()
+            check_input_param(prompt=prompt, tgt_lang=inputs.get("tgt_lang"))
+            inputs["lines"] = split_sentences(prompt)
+            inputs.setdefault("src_lang", self.default_src_lang)
             return inputs
         except RuntimeError:
             logging.exception("An error has occurred in preprocess.")
@@ -62,15 +79,23 @@ class NLLBCTranslate(NLLB):
     async def predict(
         self, request: dict[str, Any], headers: dict[str, str] = None
     ) -> dict[str, Any]:
+        src_lang = request.get("src_lang")
         tgt_lang = request.get("tgt_lang")
-        sentences = request.get("sentences")
+        lines = request.get("lines")
         num_beams = request.get("num_beams", 1)
         logging.info(
-            f"Translating from {self.src_lang} to {tgt_lang} using {num_beams} beams."
+            f"Translating from {src_lang} to {tgt_lang} using {num_beams} beams."
         )
-        response = await self.translate_sentences(
-            sentences, self.src_lang, tgt_lang, num_beams
+        translations = await self.translation_memory.atranslate(
+            [sentence for sentences in lines for sentence in sentences],
+            src_lang,
+            tgt_lang,
+            lambda sentences: self.translate_sentences(
+                sentences, src_lang, tgt_lang, num_beams
+            ),
+            options=(num_beams,),
         )
+        response = join_sentences(lines, translations, tgt_lang)
         return {"model_name": self.model_name, "response": response}
 
     def encode_sentence(self, sentence: list[str], src_lang: str) -> list[str]:
@@ -82,11 +107,21 @@ class NLLBCTranslate(NLLB):
 
     async def translate_sentences(
         self, sentences: list[str], src_lang: str, tgt_lang: str, num_beams: int
-    ):
-        tokenized_sentences = [
-            self.encode_sentence(sentence, src_lang) for sentence in sentences
-        ]
-        target_prefix = [[tgt_lang] for _ in sentences]
+    ) -> list[str]:
+        return await self.batcher.submit(
+            [
+                (self.encode_sentence(sentence, src_lang), tgt_lang, num_beams)
+                for sentence in sentences
+            ]
+        )
+
+    def translate_tokenized(self, items: list[tuple[list[str], str, int]]) -> list[str]:
+        """
+        Translate a batch of (tokenized sentence, tgt_lang, num_beams) that all
+        share the same tgt_lang and num_beams.
+        """
+        tokenized_sentences = [tokens for tokens, _, _ in items]
+        target_prefix = [[tgt_lang] for _, tgt_lang, _ in items]
 
         results = self.model.translate_iterable(
             tokenized_sentences,
@@ -94,8 +129,7 @@ class NLLBCTranslate(NLLB):
             asynchronous=True,
             batch_type="tokens",
             max_batch_size=1024,
-            beam_size=num_beams,
+            beam_size=items[0][2],
         )
 
-        translations = [self.decode_result(result) for result in results]
-        return "\n".join(translations)
+        return [self.decode_result(result) for result in results]
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from python.cache_utils import DiskCache, LRUCache
+
+T = TypeVar("T")
+
+# Sentence ends followed by whitespace. Conservative on purpose: a missed split
+# only costs a cache hit, a wrong one changes the translation.
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。！？])\s+")
+
+# Scripts of the NLLB languages (the suffix of codes like zho_Hans) written
+# without spaces between sentences.
+UNSPACED_SCRIPTS = frozenset({"Hans", "Hant", "Jpan"})
+
+
+def split_sentences(text: str) -> list[list[str]]:
+    """Split a text into lines and each line into sentences."""
+    return [
+        SENTENCE_BOUNDARY.split(line.strip()) if line.strip() else []
+        for line in text.strip().splitlines()
+    ]
+
+
+def sentence_separator(lang: str | None) -> str:
+    """Separator between sentences in lang, an NLLB code like zho_Hans."""
+    return "" if lang and lang.rpartition("_")[2] in UNSPACED_SCRIPTS else " "
+
+
+def join_sentences(
+    lines: list[list[str]], translations: list[str], tgt_lang: str | None = None
+) -> str:
+    """
+    Rebuild the text of split_sentences from the translations of its flattened
+    sentences, separated as is usual in tgt_lang rather than by the whitespace
+    of the source.
+    """
+    translations = iter(translations)
+    separator = sentence_separator(tgt_lang)
+    return "\n".join(
+        separator.join(next(translations) for _ in sentences) for sentences in lines
+    )
+
+
+class TranslationMemory:
+    """
+    Sentence-level cache of translations keyed by (src_lang, tgt_lang,
+    sentence, options), where options holds anything else that changes the
+    output such as the number of beams.
+
+    Lookups go to a bounded in-memory LRUCache first and then, if disk_path is
+    set, to a DiskCache whose hits are promoted to memory. Identical sentences
+    within a request are translated once and empty sentences are never sent to
+    the model. Hit rates are exported as the cache_hits/cache_misses metrics
+    with cache="translation_memory" and "translation_memory_disk".
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int,
+        disk_path: str | None = None,
+        disk_max_entries: int | None = None,
+    ) -> None:
+        self.cache = LRUCache(
+            "translation_memory", model_name=model_name, max_entries=max_entries
+        )
+        self.disk = (
+            DiskCache(
+                disk_path,
+                "translation_memory_disk",
+                model_name=model_name,
+                max_entries=disk_max_entries,
+            )
+            if disk_path
+            else None
+        )
+        if self.disk is not None:
+            logging.info(f"Using on-disk translation memory at {disk_path}")
+
+    def key(
+        self, src_lang: str, tgt_lang: str, sentence: str, options: tuple = ()
+    ) -> str:
+        data = json.dumps([src_lang, tgt_lang, sentence, options], ensure_ascii=False)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self,
+        sentences: list[str],
+        src_lang: str,
+        tgt_lang: str,
+        options: tuple = (),
+    ) -> tuple[list[str], dict[str, str], dict[str, str]]:
+        """
+        Return the key of each sentence, the translations found by key and the
+        unique sentences still to translate by key.
+        """
+        keys = [self.key(src_lang, tgt_lang, s, options) for s in sentences]
+        found: dict[str, str] = {}
+        missing: dict[str, str] = {}
+        for key, sentence in zip(keys, sentences):
+            if key in found or key in missing:
+                continue
+            if not sentence.strip():
+                found[key] = ""
+                continue
+            translation = self.cache.get(key) if self.cache.enabled else None
+            if translation is None:
+                missing[key] = sentence
+            else:
+                found[key] = translation
+        if self.disk is not None and missing:
+            for key, translation in self.disk.get_many(list(missing)).items():
+                found[key] = translation
+                self.cache.put(key, translation)
+                del missing[key]
+        return keys, found, missing
+
+    def store(self, translations: dict[str, str]) -> None:
+        for key, translation in translations.items():
+            self.cache.put(key, translation)
+        if self.disk is not None:
+            self.disk.put_many(translations)
+
+    def translate(
+        self,
+        sentences: list[str],
+        src_lang: str,
+        tgt_lang: str,
+        translate: Callable[[list[str]], list[str]],
+        options: tuple = (),
+    ) -> list[str]:
+        """
+        Translate sentences, calling translate at most once with the unique
+        sentences that are not in the memory.
+        """
+        keys, found, missing = self.lookup(sentences, src_lang, tgt_lang, options)
+        if missing:
+            translations = dict(zip(missing, translate(list(missing.values()))))
+            self.store(translations)
+            found.update(translations)
+        return [found[key] for key in keys]
+
+    async def atranslate(
+        self,
+        sentences: list[str],
+        src_lang: str,
+        tgt_lang: str,
+        translate: Callable[[list[str]], Awaitable[list[str]]],
+        options: tuple = (),
+    ) -> list[str]:
+        """
+        Same as translate, for an async translate function. The disk tier, if
+        any, is read and written in the loop's default executor so that the
+        event loop is not blocked on disk I/O.
+        """
+        keys, found, missing = await self._run(
+            self.lookup, sentences, src_lang, tgt_lang, options
+        )
+        if missing:
+            translations = dict(zip(missing, await translate(list(missing.values()))))
+            await self._run(self.store, translations)
+            found.update(translations)
+        return [found[key] for key in keys]
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.disk is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
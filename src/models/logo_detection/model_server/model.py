@@ -1,18 +1,18 @@
-import asyncio
 import base64
+import hashlib
 import logging
 import os
-import shutil
-import tempfile
 import time
 from typing import Any
 
-import aiohttp
 import keras
 import kserve
+import numpy as np
+import tensorflow as tf
 from kserve.errors import InferenceError, InvalidInput
-from tensorflow.data import Dataset
 
+from python.cache_utils import LRUCache
+from python.metric_utils import CACHE_HITS, get_cache_labels
 from python.preprocess_utils import validate_json_input
 
 logging.basicConfig(level=kserve.constants.KSERVE_LOGLEVEL)
@@ -28,9 +28,16 @@ class LogoDetectionModel(kserve.Model):
         self.image_width = int(os.environ.get("IMAGE_WIDTH", 224))
         self.image_size = (self.image_height, self.image_width)
         self.target = "logo"
-        self.chunk_size = int(os.environ.get("CHUNK_SIZE", 1024))
         self.images_max_num = int(os.environ.get("IMAGES_MAX_NUM", 50))
         self.image_max_size = int(os.environ.get("IMAGE_MAX_SIZE", 4194304))  # 4MBs
+        # Scores of previously seen images, keyed by the sha256 of their bytes.
+        self.result_cache = LRUCache(
+            "results",
+            model_name=name,
+            max_entries=int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 10000)),
+        )
+        # Images in a request that were perceptual duplicates of another one.
+        self.dedup_hits_metric = CACHE_HITS.labels(**get_cache_labels(name, "dedup"))
         self.ready = False
         self.model = self.load()
 
@@ -41,136 +48,107 @@ class LogoDetectionModel(kserve.Model):
 
     async def preprocess(
         self, payload: dict[str, Any], headers: dict[str, str] = None
-    ) -> tuple[Dataset, str]:
+    ) -> dict[str, Any]:
         latency = {}
         preprocess_start_time = time.time()
         payload = validate_json_input(payload)
         self.validate_input_data(payload)
-        # Create a request-specific temporary directory to store images
-        temp_dir = tempfile.mkdtemp()
-        # Save base64 images to a temporary directory
-        await self.save_base64_images(payload.get("instances"), temp_dir)
-        dataset = self.create_image_dataset(temp_dir)
-        # Return dataset, request-specific temp_dir, and latency
+        # Images are decoded straight from the request bytes, keeping the
+        # filename order that the previous directory-based pipeline returned.
+        input_data = sorted(payload.get("instances"), key=lambda data: data["filename"])
+        content_keys, scores, image_indexes, images = [], [], [], []
+        dedup_keys = {}
+        for data in input_data:
+            image_bytes = self.decode_base64(data)
+            content_key = hashlib.sha256(image_bytes).digest()
+            content_keys.append(content_key)
+            # Cross-request cache hit: no need to decode the image at all.
+            score = self.result_cache.get(content_key)
+            scores.append(score)
+            if score is not None:
+                image_indexes.append(None)
+                continue
+            image = self.decode_image(data["filename"], image_bytes)
+            # In-request dedup: perceptually identical images are scored once.
+            # dHash ignores absolute colors (e.g. every flat image hashes to 0),
+            # so the coarse mean color is part of the key as well.
+            dedup_key = (self.perceptual_hash(image), self.mean_color(image))
+            if dedup_key in dedup_keys:
+                self.dedup_hits_metric.inc()
+            else:
+                dedup_keys[dedup_key] = len(images)
+                images.append(image)
+            image_indexes.append(dedup_keys[dedup_key])
         latency["preprocess (s)"] = time.time() - preprocess_start_time
         debug = payload.get("debug", False)  # default to non debug mode
-        return dataset, temp_dir, latency, debug
+        return {
+            "filenames": [data["filename"] for data in input_data],
+            "content_keys": content_keys,
+            "scores": scores,
+            "image_indexes": image_indexes,
+            "images": images,
+            "latency": latency,
+            "debug": debug,
+        }
 
     def predict(
-        self, preprocess_results: tuple[Dataset, str], headers: dict[str, str] = None
+        self, preprocess_results: dict[str, Any], headers: dict[str, str] = None
     ) -> dict[str, Any]:
         predict_start_time = time.time()
-        dataset, temp_dir, latency, debug = preprocess_results
-        predictions = self.generate_predictions(dataset, temp_dir)
-        # Delete the temporary directory after use
-        shutil.rmtree(temp_dir)
+        latency = preprocess_results["latency"]
+        predictions = self.generate_predictions(preprocess_results)
         latency["predict (s)"] = time.time() - predict_start_time
         latency["total (s)"] = latency["preprocess (s)"] + latency["predict (s)"]
-        if debug:
+        if preprocess_results["debug"]:
             predictions["latency"] = latency
         return predictions
 
-    def generate_predictions(self, dataset: Dataset, temp_dir: str) -> dict[str, Any]:
+    def generate_predictions(
+        self, preprocess_results: dict[str, Any]
+    ) -> dict[str, Any]:
         """
-        Generates predictions for the given dataset using the specified
-        model.
+        Generates predictions for the unique decoded images using the
+        specified model, batch_size images at a time, and fills in the
+        scores of cached and duplicate images.
         """
         try:
-            predictions_response = []
+            images = preprocess_results["images"]
             raw_predictions = []
-            # Iterate through the dataset and make batched predictions
-            # NOTE The dataset is small enough for unbatched predictions,
-            #      but the model expects inputs with a batch dimension anyway.
-            for batch in dataset:
+            for start in range(0, len(images), self.batch_size):
+                batch = tf.stack(images[start : start + self.batch_size])
                 raw_predictions.extend(self.model(batch))
-            for raw_prediction, file_path in zip(raw_predictions, dataset.file_paths):
+            image_scores = [
+                (float(raw_prediction[1]), float(raw_prediction[0]))
+                for raw_prediction in raw_predictions
+            ]
+            predictions_response = []
+            for filename, content_key, score, image_index in zip(
+                preprocess_results["filenames"],
+                preprocess_results["content_keys"],
+                preprocess_results["scores"],
+                preprocess_results["image_indexes"],
+            ):
+                if score is None:
+                    score = image_scores[image_index]
+                    self.result_cache.put(content_key, score)
                 prediction = {
-                    "filename": os.path.basename(file_path),
+                    "filename": filename,
                     "target": self.target,
-                    "prediction": round(float(raw_prediction[1]), ndigits=4),
-                    "out_of_domain": round(float(raw_prediction[0]), ndigits=4),
+                    "prediction": round(score[0], ndigits=4),
+                    "out_of_domain": round(score[1], ndigits=4),
                 }
                 predictions_response.append(prediction)
             predictions = {"predictions": predictions_response}
             return predictions
         except Exception as e:
             error_message = f"Error generating predictions: {e}"
-            self.cleanup_temp_dir_on_error(temp_dir, error_message)
-
-    def create_image_dataset(self, temp_dir: str) -> Dataset:
-        """
-        Creates an image dataset based on the specified directory,
-        batch_size, and image_size.
-        """
-        try:
-            dataset = keras.utils.image_dataset_from_directory(
-                temp_dir,
-                labels=None,
-                label_mode=None,
-                batch_size=self.batch_size,
-                image_size=self.image_size,
-                shuffle=False,
-            )
-            return dataset
-        except Exception as e:
-            error_message = f"Error creating image dataset: {e}"
-            self.cleanup_temp_dir_on_error(temp_dir, error_message)
-
-    async def download_image(
-        self,
-        session: aiohttp.ClientSession,
-        image_url: str,
-        image_filename: str,
-        temp_dir: str,
-    ) -> None:
-        """
-        Downloads an image from the specified URL asynchronously and
-        saves it to the given filename, reading the image data in chunks
-        of 1024 bytes i.e defined chunk size.
-        """
-        try:
-            async with session.get(image_url) as response:
-                response.raise_for_status()  # Raise an exception for HTTP errors
-                # Confirm content length size before downloading the image.
-                # This is a safety net to prevent the download of big images.
-                content_length = response.headers.get("Content-Length")
-                if content_length is None:
-                    error_message = "Content-Length header is missing"
-                    self.cleanup_temp_dir_on_error(temp_dir, error_message)
-                elif int(content_length) > self.image_max_size:
-                    error_message = f"Image: {image_url} \
-                        exceeds the maximum allowed size of {self.image_max_size} bytes."
-                    self.cleanup_temp_dir_on_error(temp_dir, error_message)
-                with open(image_filename, "wb") as f:
-                    while True:
-                        chunk = await response.content.read(self.chunk_size)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-        except aiohttp.ClientError as e:
-            error_message = f"Error downloading image from {image_url}: {e}"
-            self.cleanup_temp_dir_on_error(temp_dir, error_message)
-
-    async def download_images_to_temp_dir(
-        self, input_data: list[dict[str, str]], temp_dir: str
-    ) -> None:
-        """
-        Downloads images from URLs provided in the input data asynchronously
-        and saves them to the specified temporary directory.
-        """
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for data in input_data:
-                image_url = data["url"]
-                image_filename = os.path.join(temp_dir, data["filename"])
-                task = self.download_image(session, image_url, image_filename, temp_dir)
-                tasks.append(task)
-            await asyncio.gather(*tasks)
+            logging.error(error_message)
+            raise InferenceError(error_message)
 
-    async def save_base64_image(self, data: dict[str, str], temp_dir: str) -> None:
+    def decode_base64(self, data: dict[str, str]) -> bytes:
         """
-        Saves base64 encoded image from input data to the specified
-        temporary directory.
+        Decodes the base64 encoded image from input data into bytes,
+        checking the maximum allowed image size.
         """
         image_name = data["filename"]
 
@@ -179,39 +157,53 @@ class LogoDetectionModel(kserve.Model):
             image_bytes = base64.b64decode(data["image"])
         except Exception as e:
             error_message = f"Error decoding image {image_name}: {e}"
-            self.cleanup_temp_dir_on_error(temp_dir, error_message)
+            logging.error(error_message)
+            raise InferenceError(error_message)
 
-        # Check image size before saving
+        # Check image size before decoding
         if len(image_bytes) > self.image_max_size:
             error_message = f"Image: {image_name} \
                 exceeds the maximum allowed size of {self.image_max_size} bytes."
-            self.cleanup_temp_dir_on_error(temp_dir, error_message)
+            logging.error(error_message)
+            raise InferenceError(error_message)
+        return image_bytes
 
-        image_path = os.path.join(temp_dir, image_name)
-        with open(image_path, "wb") as f:
-            f.write(image_bytes)
+    def decode_image(self, image_name: str, image_bytes: bytes) -> tf.Tensor:
+        """
+        Decodes image bytes into an RGB float32 tensor of image_size, the
+        same way that keras.utils.image_dataset_from_directory loads images
+        from disk.
+        """
+        try:
+            image = tf.io.decode_image(image_bytes, channels=3, expand_animations=False)
+            image = tf.image.resize(image, self.image_size, method="bilinear")
+        except Exception as e:
+            error_message = f"Error decoding image {image_name}: {e}"
+            logging.error(error_message)
+            raise InferenceError(error_message)
+        return image
 
-    async def save_base64_images(
-        self, input_data: list[dict[str, str]], temp_dir: str
-    ) -> None:
+    @staticmethod
+    def perceptual_hash(image: tf.Tensor) -> int:
         """
-        Saves base64 encoded images from input data to the specified
-        temporary directory asynchronously.
+        Computes the 64-bit difference hash (dHash) of an image: the image
+        is reduced to 9x8 grayscale pixels and each bit records whether a
+        pixel is brighter than its left neighbour. Re-encoded copies and
+        thumbnails of the same image get the same hash.
         """
-        tasks = []
-        for data in input_data:
-            tasks.append(self.save_base64_image(data, temp_dir))
-        await asyncio.gather(*tasks)
+        grayscale = tf.image.rgb_to_grayscale(image)
+        pixels = tf.image.resize(grayscale, (8, 9), method="area")[..., 0].numpy()
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
 
-    def cleanup_temp_dir_on_error(self, temp_dir: str, error_message: str) -> None:
+    @staticmethod
+    def mean_color(image: tf.Tensor) -> tuple[int, ...]:
         """
-        Cleans up the temporary directory, logs and raises the provided error.
+        Computes the mean RGB color of an image, quantized to 16 levels
+        per channel.
         """
-        # First, delete the temporary directory to avoid accumulation
-        # of unused temp_dirs in the pod.
-        shutil.rmtree(temp_dir)
-        logging.error(error_message)
-        raise InferenceError(error_message)
+        mean = tf.reduce_mean(image, axis=(0, 1)).numpy()
+        return tuple(int(channel) // 16 for channel in mean)
 
     def validate_input_data(self, payload: dict[str, Any]) -> None:
         """
@@ -1,16 +1,28 @@
+import asyncio
 import logging
 import os
+import uuid
 from distutils.util import strtobool
 
 import kserve
 from kserve.errors import InferenceError, InvalidInput
-from vllm import LLM, SamplingParams
+from vllm import SamplingParams
+from vllm.engine.arg_utils import AsyncEngineArgs
+from vllm.engine.async_llm_engine import AsyncLLMEngine
+from vllm.inputs import TokensPrompt
+
+from python.cache_utils import LRUCache
+from python.policy_utils import get_policies, normalize_policy, record_prefix_cache
 
 logging.basicConfig(level=kserve.constants.KSERVE_LOGLEVEL)
 
 DEFAULT_MAX_MODEL_LEN = 8192
+DEFAULT_POLICY_CACHE_SIZE = 128
+DEFAULT_MAX_POLICIES = 32
 
-PROMPT_TEMPLATE = """\
+# The prompt is split at the content to share the policy prefix of requests
+# (see python/policy_utils.py).
+PROMPT_PREFIX = """\
 INSTRUCTIONS
 ============
 
@@ -24,6 +36,9 @@ POLICY
 
 CONTENT
 =======
+"""
+
+PROMPT_SUFFIX = """\
 {content}
 
 ANSWER
@@ -31,6 +46,14 @@ ANSWER
 """
 
 
+def render_prefix(policy: str) -> str:
+    return PROMPT_PREFIX.format(policy=normalize_policy(policy))
+
+
+def render_suffix(content: str) -> str:
+    return PROMPT_SUFFIX.format(content=content)
+
+
 class CoPEModel(kserve.Model):
     def __init__(
         self,
@@ -41,6 +64,8 @@ class CoPEModel(kserve.Model):
         quantization: str | None = None,
         max_model_len: int = DEFAULT_MAX_MODEL_LEN,
         disable_log_stats: bool = False,
+        policy_cache_size: int = DEFAULT_POLICY_CACHE_SIZE,
+        max_policies: int = DEFAULT_MAX_POLICIES,
     ) -> None:
         super().__init__(name)
         self.name = name
@@ -50,22 +75,31 @@ class CoPEModel(kserve.Model):
         self.quantization = quantization
         self.max_model_len = max_model_len
         self.disable_log_stats = disable_log_stats
+        self.max_policies = max_policies
         self.model = None
+        self.tokenizer = None
+        # Rendered prompt prefix of recently used policies.
+        self.policy_prefixes = LRUCache(
+            "policy_prefixes", model_name=name, max_entries=policy_cache_size
+        )
         self.ready = False
 
     def load(self) -> None:
         """Load the vLLM engine with the CoPE-A-9B model."""
         try:
-            logging.info("Loading vLLM model...")
-            self.model = LLM(
+            logging.info("Loading Async vLLM engine...")
+            engine_args = AsyncEngineArgs(
                 model=self.model_path,
                 trust_remote_code=self.trust_remote_code,
                 dtype=self.dtype,
                 max_model_len=self.max_model_len,
                 quantization=self.quantization,
+                enable_prefix_caching=True,
                 served_model_name=self.name,
                 disable_log_stats=self.disable_log_stats,
             )
+            self.model = AsyncLLMEngine.from_engine_args(engine_args)
+            self.tokenizer = self.model.tokenizer
 
             self.ready = True
             logging.info("Model loaded successfully!")
@@ -75,21 +109,32 @@ class CoPEModel(kserve.Model):
             raise kserve.errors.ModelMissingError(error_message)
 
     def preprocess(self, payload: dict, headers: dict[str, str] = None) -> dict:
-        """Validate the payload and build the CoPE prompt."""
+        """Validate the payload and build one CoPE prompt per policy."""
         if "content" not in payload:
             raise InvalidInput(
                 "Invalid payload format. Must contain a 'content' field."
             )
 
-        if "policy" not in payload:
-            raise InvalidInput("Invalid payload format. Must contain a 'policy' field.")
-
         content = payload["content"]
-        policy = payload["policy"]
+        if not isinstance(content, str):
+            error_message = "'content' must be a string."
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        policies, batch = get_policies(payload, self.max_policies)
         max_tokens = int(payload.get("max_tokens", 1))
         temperature = float(payload.get("temperature", 0.0))
 
-        prompt = PROMPT_TEMPLATE.format(policy=policy, content=content)
+        # Each prompt is tokenized whole, so that the tokens at the boundary
+        # between the policy and the content are the ones the model expects.
+        suffix = render_suffix(content)
+        prompts = [
+            TokensPrompt(
+                prompt_token_ids=self.tokenizer.encode(
+                    self.render_prefix(policy) + suffix
+                )
+            )
+            for policy in policies
+        ]
 
         sampling_params = SamplingParams(
             max_tokens=max_tokens,
@@ -97,22 +142,49 @@ class CoPEModel(kserve.Model):
         )
 
         return {
-            "prompt": prompt,
+            "prompts": prompts,
             "sampling_params": sampling_params,
+            "batch": batch,
         }
 
-    def predict(self, inputs: dict, headers: dict[str, str] = None) -> dict:
+    def render_prefix(self, policy: str) -> str:
+        """Render the prompt prefix of a policy, cached per policy."""
+        policy = normalize_policy(policy)
+        prefix = self.policy_prefixes.get(policy)
+        if prefix is None:
+            prefix = render_prefix(policy)
+            self.policy_prefixes.put(policy, prefix)
+        return prefix
+
+    async def generate(self, prompt: TokensPrompt, sampling_params: SamplingParams):
+        """Generate the completion of a prompt."""
+        final_output = None
+        async for request_output in self.model.generate(
+            prompt=prompt,
+            sampling_params=sampling_params,
+            request_id=uuid.uuid4().hex,
+        ):
+            final_output = request_output
+        record_prefix_cache(self.name, final_output)
+        return final_output.outputs[0]
+
+    async def predict(self, inputs: dict, headers: dict[str, str] = None) -> dict:
         """Perform inference using vLLM."""
         try:
             logging.info("Performing inference...")
 
-            output = self.model.generate(
-                prompts=[inputs["prompt"]],
-                sampling_params=inputs["sampling_params"],
+            # The prompts of all policies are submitted together so that the
+            # engine schedules them in the same batches.
+            completions = await asyncio.gather(
+                *(
+                    self.generate(prompt, inputs["sampling_params"])
+                    for prompt in inputs["prompts"]
+                )
             )
-
-            generated_text = output[0].outputs[0].text.strip()
-            return {"generated_text": generated_text}
+            return {
+                "generated_texts": [c.text.strip() for c in completions],
+                "batch": inputs["batch"],
+            }
 
         except Exception as e:
             error_message = f"Error during inference: {e}"
@@ -120,23 +192,22 @@ class CoPEModel(kserve.Model):
             raise InferenceError(error_message)
 
     def postprocess(self, inputs: dict, headers: dict[str, str] = None) -> dict:
-        """Parse the model output into a binary verdict."""
+        """Parse the model output into a binary verdict per policy."""
         try:
-            generated_text = inputs["generated_text"]
-
-            # CoPE outputs "0" or "1"
-            if generated_text in ("0", "1"):
-                violation = int(generated_text)
-            else:
-                logging.warning(
-                    "Unexpected model output: '%s', defaulting to raw text",
-                    generated_text,
-                )
-                violation = None
-
-            return {
-                "violation": violation,
-            }
+            verdicts = []
+            for generated_text in inputs["generated_texts"]:
+                # CoPE outputs "0" or "1"
+                if generated_text in ("0", "1"):
+                    violation = int(generated_text)
+                else:
+                    logging.warning(
+                        "Unexpected model output: '%s', defaulting to raw text",
+                        generated_text,
+                    )
+                    violation = None
+                verdicts.append({"violation": violation})
+
+            return {"verdicts": verdicts} if inputs["batch"] else verdicts[0]
 
         except Exception as e:
             error_message = f"Error during post-processing: {e}"
@@ -152,6 +223,10 @@ if __name__ == "__main__":
     quantization = os.environ.get("QUANTIZATION", None) or None
     max_model_len = int(os.environ.get("MAX_MODEL_LEN", DEFAULT_MAX_MODEL_LEN))
     disable_log_stats = strtobool(os.environ.get("DISABLE_LOG_STATS", "False"))
+    policy_cache_size = int(
+        os.environ.get("POLICY_CACHE_SIZE", DEFAULT_POLICY_CACHE_SIZE)
+    )
+    max_policies = int(os.environ.get("MAX_POLICIES", DEFAULT_MAX_POLICIES))
 
     model = CoPEModel(
         name=model_name,
@@ -161,6 +236,8 @@ if __name__ == "__main__":
         quantization=quantization,
         max_model_len=max_model_len,
         disable_log_stats=disable_log_stats,
+        policy_cache_size=policy_cache_size,
+        max_policies=max_policies,
     )
 
     model.load()
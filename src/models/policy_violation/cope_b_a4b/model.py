@@ -1,14 +1,25 @@
+import asyncio
 import logging
 import math
 import os
+import uuid
 from distutils.util import strtobool
 
 import kserve
 from kserve.errors import InferenceError, InvalidInput
-from vllm import LLM, SamplingParams
+from vllm import SamplingParams
+from vllm.engine.arg_utils import AsyncEngineArgs
+from vllm.engine.async_llm_engine import AsyncLLMEngine
+from vllm.inputs import TokensPrompt
+
+from python.cache_utils import LRUCache
+from python.policy_utils import get_policies, normalize_policy, record_prefix_cache
 
 logging.basicConfig(level=kserve.constants.KSERVE_LOGLEVEL)
 
+DEFAULT_POLICY_CACHE_SIZE = 128
+DEFAULT_MAX_POLICIES = 32
+
 # Number of top-token logprobs to request for the generated position. CoPE-B
 # emits a single 0/1 token, so both classes are virtually always in the top
 # few; 20 is a generous margin to ensure both "0" and "1" appear.
@@ -17,6 +28,8 @@ LOGPROBS_TOP_K = 20
 # CoPE-B prompt body. Unlike CoPE-A, there is NO "INSTRUCTIONS" header and NO
 # "ANSWER" footer: the Gemma-4 chat template's role markers replace them. This
 # string is passed as the user-turn content and rendered via the chat template.
+# It is split at the content to share the policy prefix of requests (see
+# python/policy_utils.py).
 PROMPT_TEMPLATE = """\
 Examine the given POLICY and determine if the given CONTENT meets the criteria \
 for ANY of the LABELS. Answer "1" if yes, and "0" if no.
@@ -34,6 +47,10 @@ CONTENT
 {content}
 """
 
+# Stands in for the content when rendering the chat template of a policy, so the
+# rendered conversation can be split into the text before and after the content.
+CONTENT_PLACEHOLDER = "<<<CONTENT>>>"
+
 
 class CoPEBModel(kserve.Model):
     def __init__(
@@ -45,6 +62,8 @@ class CoPEBModel(kserve.Model):
         quantization: str,
         max_model_len: int,
         disable_log_stats: bool,
+        policy_cache_size: int = DEFAULT_POLICY_CACHE_SIZE,
+        max_policies: int = DEFAULT_MAX_POLICIES,
     ) -> None:
         super().__init__(name)
         self.name = name
@@ -54,22 +73,31 @@ class CoPEBModel(kserve.Model):
         self.quantization = quantization
         self.max_model_len = max_model_len
         self.disable_log_stats = disable_log_stats
+        self.max_policies = max_policies
         self.model = None
+        self.tokenizer = None
+        # Rendered chat prompt of recently used policies, split at the content.
+        self.policy_prompts = LRUCache(
+            "policy_prompts", model_name=name, max_entries=policy_cache_size
+        )
         self.ready = False
 
     def load(self) -> None:
         """Load the vLLM engine with the CoPE-B-A4B model."""
         try:
-            logging.info("Loading vLLM model...")
-            self.model = LLM(
+            logging.info("Loading Async vLLM engine...")
+            engine_args = AsyncEngineArgs(
                 model=self.model_path,
                 trust_remote_code=self.trust_remote_code,
                 dtype=self.dtype,
                 max_model_len=self.max_model_len,
                 quantization=self.quantization,
+                enable_prefix_caching=True,
                 served_model_name=self.name,
                 disable_log_stats=self.disable_log_stats,
             )
+            self.model = AsyncLLMEngine.from_engine_args(engine_args)
+            self.tokenizer = self.model.tokenizer
 
             self.ready = True
             logging.info("Model loaded successfully!")
@@ -79,17 +107,18 @@ class CoPEBModel(kserve.Model):
             raise kserve.errors.ModelMissingError(error_message)
 
     def preprocess(self, payload: dict, headers: dict[str, str] = None) -> dict:
-        """Validate the payload and build the CoPE-B chat conversation."""
+        """Validate the payload and build one CoPE-B chat prompt per policy."""
         if "content" not in payload:
             raise InvalidInput(
                 "Invalid payload format. Must contain a 'content' field."
             )
 
-        if "policy" not in payload:
-            raise InvalidInput("Invalid payload format. Must contain a 'policy' field.")
-
         content = payload["content"]
-        policy = payload["policy"]
+        if not isinstance(content, str):
+            error_message = "'content' must be a string."
+            logging.error(error_message)
+            raise InvalidInput(error_message)
+        policies, batch = get_policies(payload, self.max_policies)
         max_tokens = int(payload.get("max_tokens", 1))
         temperature = float(payload.get("temperature", 0.0))
 
@@ -105,15 +134,22 @@ class CoPEBModel(kserve.Model):
                 f"'temperature' must be between 0.0 and 2.0, got {temperature}."
             )
 
-        prompt = PROMPT_TEMPLATE.format(policy=policy, content=content)
-
-        # CoPE-B requires the Gemma-4 chat template: the prompt is a user turn
-        # and the verdict comes back as the assistant turn. Passing a messages
-        # list to LLM.chat() makes vLLM apply the model's chat template (the
-        # role markers that replace CoPE-A's INSTRUCTIONS/ANSWER text), unlike
-        # the CoPE-A server which raw-concatenates its prompt for LLM.generate().
-        # See: https://huggingface.co/zentropi-ai/cope-b-a4b#1-cope-b-uses-the-gemma-4-chat-template
-        messages = [{"role": "user", "content": prompt}]
+        # Each prompt is tokenized whole, so that the tokens at the boundary
+        # between the policy and the content are the ones the model expects.
+        prompts = []
+        for policy in policies:
+            prefix, suffix = self.render_policy(policy)
+            # The chat template trims the user turn, which ends with the
+            # content.
+            text = (prefix + content).rstrip() + suffix
+            # The rendered text already holds the template's special tokens.
+            prompts.append(
+                TokensPrompt(
+                    prompt_token_ids=self.tokenizer.encode(
+                        text, add_special_tokens=False
+                    )
+                )
+            )
 
         # Request top-k logprobs so postprocess can derive the class
         # probabilities from the verdict token. These probabilities are only
@@ -127,50 +163,99 @@ class CoPEBModel(kserve.Model):
         )
 
         return {
-            "messages": messages,
+            "prompts": prompts,
             "sampling_params": sampling_params,
+            "batch": batch,
+        }
+
+    def render_policy(self, policy: str) -> tuple[str, str]:
+        """
+        Render the chat prompt of a policy as the text before and after its
+        content.
+
+        CoPE-B requires the Gemma-4 chat template: the prompt is a user turn and
+        the verdict comes back as the assistant turn. The template is applied
+        here (the role markers that replace CoPE-A's INSTRUCTIONS/ANSWER text)
+        rather than by LLM.chat(), so that it is rendered once per policy.
+        See: https://huggingface.co/zentropi-ai/cope-b-a4b#1-cope-b-uses-the-gemma-4-chat-template
+        """
+        policy = normalize_policy(policy)
+        rendered = self.policy_prompts.get(policy)
+        if rendered is None:
+            messages = [
+                {
+                    "role": "user",
+                    "content": PROMPT_TEMPLATE.format(
+                        policy=policy, content=CONTENT_PLACEHOLDER
+                    ),
+                }
+            ]
+            text = self.tokenizer.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
+            )
+            # The content follows the policy, so the last placeholder is the
+            # content even if the policy itself contains one.
+            prefix, _, suffix = text.rpartition(CONTENT_PLACEHOLDER)
+            rendered = (prefix, suffix)
+            self.policy_prompts.put(policy, rendered)
+        return rendered
+
+    async def generate(
+        self, prompt: TokensPrompt, sampling_params: SamplingParams
+    ) -> dict:
+        """Generate the verdict of a prompt along with its class logprobs."""
+        final_output = None
+        async for request_output in self.model.generate(
+            prompt=prompt,
+            sampling_params=sampling_params,
+            request_id=uuid.uuid4().hex,
+        ):
+            final_output = request_output
+        record_prefix_cache(self.name, final_output)
+
+        completion = final_output.outputs[0]
+        generated_text = completion.text.strip()
+
+        # logprobs is a list with one entry per generated token. CoPE-B
+        # generates a single verdict token, so the first position holds the
+        # class logprobs: {token_id: Logprob(logprob=..., decoded_token=...)}.
+        # vLLM output object (CompletionOutput.logprobs / Logprob):
+        # https://docs.vllm.ai/en/latest/api/vllm/outputs.html
+        first_token_logprobs = completion.logprobs[0] if completion.logprobs else None
+
+        # Extract the logprob for the "0" and "1" tokens, if present. These
+        # are used internally to compute p_safe / p_violation; the raw
+        # logprobs are not returned in the response.
+        logprob_0 = None
+        logprob_1 = None
+        if first_token_logprobs:
+            for logprob_obj in first_token_logprobs.values():
+                token = (logprob_obj.decoded_token or "").strip()
+                if token == "0":
+                    logprob_0 = logprob_obj.logprob
+                elif token == "1":
+                    logprob_1 = logprob_obj.logprob
+
+        return {
+            "generated_text": generated_text,
+            "logprob_0": logprob_0,
+            "logprob_1": logprob_1,
         }
 
-    def predict(self, inputs: dict, headers: dict[str, str] = None) -> dict:
+    async def predict(self, inputs: dict, headers: dict[str, str] = None) -> dict:
         """Perform inference using vLLM."""
         try:
             logging.info("Performing inference...")
 
-            output = self.model.chat(
-                messages=inputs["messages"],
-                sampling_params=inputs["sampling_params"],
-            )
-
-            completion = output[0].outputs[0]
-            generated_text = completion.text.strip()
-
-            # logprobs is a list with one entry per generated token. CoPE-B
-            # generates a single verdict token, so the first position holds the
-            # class logprobs: {token_id: Logprob(logprob=..., decoded_token=...)}.
-            # vLLM output object (CompletionOutput.logprobs / Logprob):
-            # https://docs.vllm.ai/en/latest/api/vllm/outputs.html
-            first_token_logprobs = (
-                completion.logprobs[0] if completion.logprobs else None
+            # The prompts of all policies are submitted together so that the
+            # engine schedules them in the same batches.
+            outputs = await asyncio.gather(
+                *(
+                    self.generate(prompt, inputs["sampling_params"])
+                    for prompt in inputs["prompts"]
+                )
             )
-
-            # Extract the logprob for the "0" and "1" tokens, if present. These
-            # are used internally to compute p_safe / p_violation; the raw
-            # logprobs are not returned in the response.
-            logprob_0 = None
-            logprob_1 = None
-            if first_token_logprobs:
-                for logprob_obj in first_token_logprobs.values():
-                    token = (logprob_obj.decoded_token or "").strip()
-                    if token == "0":
-                        logprob_0 = logprob_obj.logprob
-                    elif token == "1":
-                        logprob_1 = logprob_obj.logprob
-
-            return {
-                "generated_text": generated_text,
-                "logprob_0": logprob_0,
-                "logprob_1": logprob_1,
-            }
+            return {"outputs": list(outputs), "batch": inputs["batch"]}
 
         except Exception as e:
             error_message = f"Error during inference: {e}"
@@ -178,47 +263,56 @@ class CoPEBModel(kserve.Model):
             raise InferenceError(error_message)
 
     def postprocess(self, inputs: dict, headers: dict[str, str] = None) -> dict:
-        """Parse the model output into a binary verdict plus class probabilities."""
+        """
+        Parse the model outputs into a binary verdict plus class probabilities
+        per policy.
+        """
         try:
-            generated_text = inputs["generated_text"]
-            logprob_0 = inputs.get("logprob_0")
-            logprob_1 = inputs.get("logprob_1")
-
-            # CoPE-B outputs "0" or "1". If the output is unexpectedly not "0"
-            # or "1", log a warning and return None.
-            if generated_text in ("0", "1"):
-                violation = int(generated_text)
-            else:
-                logging.warning(
-                    "Unexpected model output: '%s', defaulting to raw text",
-                    generated_text,
-                )
-                violation = None
-
-            result = {"violation": violation}
-
-            # Expose the per-class probabilities so callers can threshold both
-            # positive and negative cases to trade recall for precision. Both
-            # are returned (rather than just one) because CoPE-B is highly
-            # peaked: at extreme confidence the winning class saturates toward
-            # 1.0 and loses resolution to rounding, while the losing class still
-            # carries usable precision. Probabilities should be calibrated
-            # against a labeled sample of the caller's own traffic; using the
-            # output token probability as a confidence signal, and the need to
-            # recalibrate it, are described in the CoPE-B model card:
-            # https://huggingface.co/zentropi-ai/cope-b-a4b#2-recalibrate-confidence-thresholds
-            if logprob_1 is not None:
-                result["p_violation"] = math.exp(logprob_1)
-            if logprob_0 is not None:
-                result["p_safe"] = math.exp(logprob_0)
-
-            return result
+            verdicts = [self.verdict(output) for output in inputs["outputs"]]
+            return {"verdicts": verdicts} if inputs["batch"] else verdicts[0]
 
         except Exception as e:
             error_message = f"Error during post-processing: {e}"
             logging.error(error_message)
             raise InferenceError(error_message)
 
+    @staticmethod
+    def verdict(output: dict) -> dict:
+        """Build the verdict of one policy from its model output."""
+        generated_text = output["generated_text"]
+        logprob_0 = output.get("logprob_0")
+        logprob_1 = output.get("logprob_1")
+
+        # CoPE-B outputs "0" or "1". If the output is unexpectedly not "0"
+        # or "1", log a warning and return None.
+        if generated_text in ("0", "1"):
+            violation = int(generated_text)
+        else:
+            logging.warning(
+                "Unexpected model output: '%s', defaulting to raw text",
+                generated_text,
+            )
+            violation = None
+
+        result = {"violation": violation}
+
+        # Expose the per-class probabilities so callers can threshold both
+        # positive and negative cases to trade recall for precision. Both
+        # are returned (rather than just one) because CoPE-B is highly
+        # peaked: at extreme confidence the winning class saturates toward
+        # 1.0 and loses resolution to rounding, while the losing class still
+        # carries usable precision. Probabilities should be calibrated
+        # against a labeled sample of the caller's own traffic; using the
+        # output token probability as a confidence signal, and the need to
+        # recalibrate it, are described in the CoPE-B model card:
+        # https://huggingface.co/zentropi-ai/cope-b-a4b#2-recalibrate-confidence-thresholds
+        if logprob_1 is not None:
+            result["p_violation"] = math.exp(logprob_1)
+        if logprob_0 is not None:
+            result["p_safe"] = math.exp(logprob_0)
+
+        return result
+
 
 if __name__ == "__main__":
     model_name = os.environ.get("MODEL_NAME", "cope-b-a4b")
@@ -228,6 +322,10 @@ if __name__ == "__main__":
     quantization = os.environ.get("QUANTIZATION", None)
     max_model_len = int(os.environ.get("MAX_MODEL_LEN", 8192))
     disable_log_stats = strtobool(os.environ.get("DISABLE_LOG_STATS", "False"))
+    policy_cache_size = int(
+        os.environ.get("POLICY_CACHE_SIZE", DEFAULT_POLICY_CACHE_SIZE)
+    )
+    max_policies = int(os.environ.get("MAX_POLICIES", DEFAULT_MAX_POLICIES))
 
     model = CoPEBModel(
         name=model_name,
@@ -237,6 +335,8 @@ if __name__ == "__main__":
         quantization=quantization,
         max_model_len=max_model_len,
         disable_log_stats=disable_log_stats,
+        policy_cache_size=policy_cache_size,
+        max_policies=max_policies,
     )
 
     model.load()
@@ -0,0 +1,635 @@
+"""
+CPU load test of the Qwen36Model Python layers against a stub vLLM engine.
+
+StubAsyncLLMEngine stands in for vLLM's AsyncLLMEngine and streams a fixed
+completion at a configurable rate, so everything the server does around the
+engine (chat template rendering, reasoning and tool-call parsing, SSE chunk
+building) runs as in production while the GPU work only costs a sleep. The
+load driver calls create_chat_completion in-process at each concurrency and
+reports the usual vllm-bench metrics together with the server-side CPU time
+per output token and per request, writing one c<N>.json per run and a
+summary.md in the format of benchmarks/results/*/summary.md.
+
+When vLLM is installed (e.g. the qwen36-27b-cpu image) the real OpenAI
+protocol types and parsers are used; pass --tokenizer to render the real chat
+template. Otherwise (the CI test image) pydantic-free stand-ins are registered
+for the vLLM modules the server imports, so numbers are only comparable with
+other stand-in runs.
+
+Usage:
+    python load_test.py --tokenizer /mnt/models --result-dir ./results/stub
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+import types
+import uuid
+from typing import Any
+from unittest.mock import patch
+
+SUMMARY_HEADER = [
+    "conc",
+    "req/s",
+    "out tok/s",
+    "tot tok/s",
+    "TTFT p50",
+    "TTFT p99",
+    "TPOT p50",
+    "TPOT p99",
+    "E2EL p50",
+    "E2EL p99",
+    "fail",
+    "CPU/tok µs",
+    "CPU/req ms",
+]
+PROMPT_WORDS = (
+    "the of and to in is was for on as with by he at from his an were are which "
+    "this also be had or has its first after new who they two her she been other"
+).split()
+
+
+class StandInModel:
+    """Pydantic-free stand-in for the vLLM OpenAI protocol models."""
+
+    def __init__(self, **fields: Any) -> None:
+        self.__dict__.update(fields)
+
+    def __getattr__(self, name: str) -> Any:
+        # Optional fields that were not set.
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
+
+    def model_dump(self, exclude_none: bool = False, **kwargs: Any) -> dict:
+        def convert(value):
+            if isinstance(value, StandInModel):
+                return value.model_dump(exclude_none=exclude_none)
+            if isinstance(value, list):
+                return [convert(item) for item in value]
+            return value
+
+        return {
+            key: convert(value)
+            for key, value in self.__dict__.items()
+            if not (exclude_none and value is None)
+        }
+
+    def model_dump_json(self, exclude_none: bool = False, **kwargs: Any) -> str:
+        return json.dumps(self.model_dump(exclude_none=exclude_none))
+
+
+class StandInModule(types.ModuleType):
+    """Module whose missing attributes are StandInModel subclasses."""
+
+    __path__: list[str] = []
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        cls = type(name, (StandInModel,), {})
+        setattr(self, name, cls)
+        return cls
+
+
+class StandInReasoningParser:
+    """Qwen3-style reasoning parser: reasoning ends at </think>."""
+
+    def __init__(self, tokenizer: Any) -> None:
+        self.tokenizer = tokenizer
+
+    def extract_reasoning(self, text: str, request: Any) -> tuple[str | None, str]:
+        reasoning, end, content = text.partition("</think>")
+        if not end:
+            return None, text
+        return reasoning.replace("<think>", "").strip(), content.lstrip()
+
+    def extract_reasoning_streaming(
+        self, previous_text: str, current_text: str, delta_text: str, *args: Any
+    ) -> StandInModel | None:
+        delta_message = sys.modules["vllm.entrypoints.openai.engine.protocol"]
+        if "</think>" in previous_text:
+            return delta_message.DeltaMessage(content=delta_text)
+        if "</think>" in current_text:
+            reasoning, _, content = delta_text.partition("</think>")
+            return delta_message.DeltaMessage(
+                reasoning=reasoning or None, content=content or None
+            )
+        return delta_message.DeltaMessage(reasoning=delta_text.replace("<think>", ""))
+
+
+class StandInToolParser:
+    """Hermes-style tool parser for <tool_call>{json}</tool_call> blocks."""
+
+    TOOL_CALL = re.compile(r"<tool_call>(.*?)</tool_call>", re.DOTALL)
+    tool_call_start_token = "<tool_call>"
+
+    def __init__(self, tokenizer: Any) -> None:
+        self.tokenizer = tokenizer
+        self.streamed = 0
+
+    @staticmethod
+    def tool_call(payload: str, index: int | None = None) -> StandInModel:
+        call = json.loads(payload)
+        protocol = sys.modules["vllm.entrypoints.openai.engine.protocol"]
+        return protocol.ToolCall(
+            index=index,
+            id=f"call_{uuid.uuid4().hex[:8]}",
+            type="function",
+            function=protocol.FunctionCall(
+                name=call["name"], arguments=json.dumps(call["arguments"])
+            ),
+        )
+
+    def extract_tool_calls(self, text: str, request: Any) -> StandInModel:
+        calls = [self.tool_call(m) for m in self.TOOL_CALL.findall(text)]
+        content = self.TOOL_CALL.sub("", text).strip() or None
+        return StandInModel(tools_called=bool(calls), tool_calls=calls, content=content)
+
+    def extract_tool_calls_streaming(
+        self,
+        previous_text: str,
+        current_text: str,
+        delta_text: str,
+        *args: Any,
+    ) -> StandInModel | None:
+        protocol = sys.modules["vllm.entrypoints.openai.engine.protocol"]
+        calls = self.TOOL_CALL.findall(current_text)
+        if len(calls) > self.streamed:
+            self.streamed += 1
+            return protocol.DeltaMessage(
+                tool_calls=[self.tool_call(calls[-1], index=self.streamed - 1)]
+            )
+        if "<tool_call>" in current_text.rpartition("</tool_call>")[2]:
+            return None
+        return protocol.DeltaMessage(content=delta_text)
+
+
+def install_vllm_stand_ins() -> None:
+    """Register stand-ins for the vLLM modules imported by the server."""
+    for name in [
+        "vllm",
+        "vllm.engine",
+        "vllm.engine.arg_utils",
+        "vllm.engine.async_llm_engine",
+        "vllm.entrypoints",
+        "vllm.entrypoints.chat_utils",
+        "vllm.entrypoints.openai",
+        "vllm.entrypoints.openai.chat_completion",
+        "vllm.entrypoints.openai.chat_completion.protocol",
+        "vllm.entrypoints.openai.completion",
+        "vllm.entrypoints.openai.completion.protocol",
+        "vllm.entrypoints.openai.engine",
+        "vllm.entrypoints.openai.engine.protocol",
+        "vllm.entrypoints.pooling",
+        "vllm.entrypoints.pooling.embed",
+        "vllm.entrypoints.pooling.embed.protocol",
+        "vllm.entrypoints.pooling.scoring",
+        "vllm.entrypoints.pooling.scoring.protocol",
+        "vllm.entrypoints.utils",
+        "vllm.reasoning",
+        "vllm.sampling_params",
+        "vllm.tool_parsers",
+    ]:
+        sys.modules[name] = StandInModule(name)
+    sys.modules["vllm.entrypoints.utils"].with_cancellation = lambda handler: handler
+    sys.modules["vllm.reasoning"].ReasoningParserManager = types.SimpleNamespace(
+        get_reasoning_parser=lambda name: StandInReasoningParser
+    )
+    sys.modules["vllm.tool_parsers"].ToolParserManager = types.SimpleNamespace(
+        get_tool_parser=lambda name: StandInToolParser
+    )
+
+
+class StubTokenizer:
+    """
+    Word-level tokenizer with a ChatML chat template, used when no real
+    tokenizer is given.
+    """
+
+    TOKEN = re.compile(r"</?think>|</?tool_call>|<\|im_(?:start|end)\|>|\s*[^\s<]+|\s+")
+
+    def __init__(self) -> None:
+        self.vocab: dict[str, int] = {}
+        self.tokens: list[str] = []
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> list[int]:
+        ids = []
+        for token in self.TOKEN.findall(text):
+            if token not in self.vocab:
+                self.vocab[token] = len(self.tokens)
+                self.tokens.append(token)
+            ids.append(self.vocab[token])
+        return ids
+
+    def decode(self, ids: list[int], **kwargs: Any) -> str:
+        return "".join(self.tokens[i] for i in ids)
+
+    def apply_chat_template(
+        self,
+        messages: list[dict],
+        tokenize: bool = False,
+        add_generation_prompt: bool = True,
+        enable_thinking: bool = True,
+        tools: list | None = None,
+    ) -> str:
+        text = ""
+        if tools:
+            text += (
+                "<|im_start|>system\n# Tools\n<tools>\n"
+                + "\n".join(json.dumps(tool) for tool in tools)
+                + "\n</tools><|im_end|>\n"
+            )
+        for message in messages:
+            text += f"<|im_start|>{message['role']}\n{message['content']}<|im_end|>\n"
+        if add_generation_prompt:
+            text += "<|im_start|>assistant\n"
+            if not enable_thinking:
+                text += "<think>\n\n</think>\n\n"
+        return text
+
+
+class StubAsyncLLMEngine:
+    """
+    Stand-in for vLLM's AsyncLLMEngine that streams the same completion of
+    output_len tokens for every request: it waits ttft_ms before the first
+    token and itl_ms between tokens. With reasoning the completion opens
+    with a <think> block, with tool_call it ends with a hermes tool call.
+
+    The CPU time spent in the stub itself is accumulated in cpu_seconds, so
+    that it can be told apart from the server's overhead.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        output_len: int,
+        itl_ms: float = 0.0,
+        ttft_ms: float = 0.0,
+        reasoning: bool = False,
+        tool_call: bool = False,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.itl = itl_ms / 1000
+        self.ttft = ttft_ms / 1000
+        self.cpu_seconds = 0.0
+        self.requests = 0
+        prefix = "<think>\nThe user wants a long answer.\n</think>\n\n" * reasoning
+        suffix = (
+            '\n<tool_call>\n{"name": "get_weather", "arguments": {"city": "Kampala"}}'
+            "\n</tool_call>"
+        ) * tool_call
+        prefix_ids = tokenizer.encode(prefix, add_special_tokens=False)
+        suffix_ids = tokenizer.encode(suffix, add_special_tokens=False)
+        filler_ids = tokenizer.encode(" the", add_special_tokens=False)
+        filler = max(output_len - len(prefix_ids) - len(suffix_ids), 0) // len(
+            filler_ids
+        )
+        self.token_ids = prefix_ids + filler_ids * filler + suffix_ids
+        self.texts = [
+            tokenizer.decode(self.token_ids[: i + 1], skip_special_tokens=False)
+            for i in range(len(self.token_ids))
+        ]
+
+    async def generate(self, prompt: Any, sampling_params: Any, request_id: str):
+        start = time.process_time()
+        self.requests += 1
+        if isinstance(prompt, str):
+            prompt_token_ids = self.tokenizer.encode(prompt)
+        else:
+            prompt_token_ids = prompt["prompt_token_ids"]
+        length = min(
+            len(self.token_ids), sampling_params.max_tokens or len(self.token_ids)
+        )
+        self.cpu_seconds += time.process_time() - start
+        await asyncio.sleep(self.ttft)
+        for i in range(length):
+            start = time.process_time()
+            finished = i == length - 1
+            output = types.SimpleNamespace(
+                index=0,
+                text=self.texts[i],
+                token_ids=self.token_ids[: i + 1],
+                finish_reason="length" if finished else None,
+            )
+            request_output = types.SimpleNamespace(
+                request_id=request_id,
+                prompt_token_ids=prompt_token_ids,
+                outputs=[output],
+                finished=finished,
+            )
+            self.cpu_seconds += time.process_time() - start
+            yield request_output
+            if not finished:
+                await asyncio.sleep(self.itl)
+
+
+def import_model_module() -> types.ModuleType:
+    try:
+        import vllm  # noqa: F401
+    except ImportError:
+        install_vllm_stand_ins()
+    try:
+        from src.models.qwen36.model_server import model
+    except ModuleNotFoundError:
+        # In the model-server image this file sits next to model.py.
+        import model
+    return model
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Linearly interpolated percentile, as numpy.percentile."""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+async def send_request(
+    model: Any, request_cls: type, prompt: str, args: argparse.Namespace
+) -> dict | None:
+    """Send one chat completion and return its timings, or None on failure."""
+    kwargs: dict[str, Any] = dict(
+        model=model.name,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=args.output_len,
+        stream=args.stream,
+        n=1,
+    )
+    if args.reasoning:
+        kwargs["chat_template_kwargs"] = {"enable_thinking": True}
+    if args.tool_call:
+        kwargs["tools"] = [
+            {
+                "type": "function",
+                "function": {
+                    "name": "get_weather",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {"city": {"type": "string"}},
+                    },
+                },
+            }
+        ]
+    start = time.perf_counter()
+    ttft = None
+    try:
+        response = await model.create_chat_completion(request_cls(**kwargs))
+        if args.stream:
+            last = None
+            async for chunk in response:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                if chunk.startswith('data: {"error"'):
+                    return None
+                if chunk != "data: [DONE]\n\n":
+                    last = chunk
+            usage = json.loads(last[len("data: ") :])["usage"]
+        else:
+            usage = response.usage.model_dump()
+    except Exception as e:
+        print(f"Request failed: {e!r}", file=sys.stderr)
+        return None
+    e2el = time.perf_counter() - start
+    output_tokens = usage["completion_tokens"]
+    return {
+        "ttft": ttft,
+        "tpot": (
+            (e2el - ttft) / (output_tokens - 1)
+            if ttft is not None and output_tokens > 1
+            else None
+        ),
+        "e2el": e2el,
+        "input_tokens": usage["prompt_tokens"],
+        "output_tokens": output_tokens,
+    }
+
+
+async def run_concurrency(
+    model: Any,
+    engine: StubAsyncLLMEngine,
+    request_cls: type,
+    prompts: list[str],
+    concurrency: int,
+    args: argparse.Namespace,
+) -> dict:
+    """Send all prompts with at most concurrency in flight and return metrics."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(prompt):
+        async with semaphore:
+            return await send_request(model, request_cls, prompt, args)
+
+    engine_cpu = engine.cpu_seconds
+    cpu = time.process_time()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(limited(prompt) for prompt in prompts))
+    duration = time.perf_counter() - start
+    server_cpu = time.process_time() - cpu - (engine.cpu_seconds - engine_cpu)
+
+    done = [r for r in results if r is not None]
+    input_tokens = sum(r["input_tokens"] for r in done)
+    output_tokens = sum(r["output_tokens"] for r in done)
+    result: dict[str, Any] = {
+        "backend": "stub-engine",
+        "model_id": model.name,
+        "num_prompts": len(prompts),
+        "completed": len(done),
+        "max_concurrency": concurrency,
+        "duration": duration,
+        "total_input_tokens": input_tokens,
+        "total_output_tokens": output_tokens,
+        "request_throughput": len(done) / duration,
+        "output_throughput": output_tokens / duration,
+        "total_token_throughput": (input_tokens + output_tokens) / duration,
+        "stub_itl_ms": args.itl_ms,
+        "stub_ttft_ms": args.ttft_ms,
+        "stream_flush_ms": args.stream_flush_ms,
+        "server_cpu_seconds": server_cpu,
+        "cpu_us_per_token": server_cpu / output_tokens * 1e6 if output_tokens else None,
+        "cpu_ms_per_request": server_cpu / len(done) * 1e3 if done else None,
+    }
+    for metric in ("ttft", "tpot", "e2el"):
+        values = [r[metric] * 1000 for r in done if r[metric] is not None]
+        result[f"mean_{metric}_ms"] = sum(values) / len(values) if values else None
+        for q in (50, 90, 99):
+            result[f"p{q}_{metric}_ms"] = percentile(values, q)
+    return result
+
+
+def summary_rows(result_dir: str) -> list[list]:
+    files = sorted(
+        glob.glob(os.path.join(result_dir, "c*.json")),
+        key=lambda p: int(os.path.basename(p)[1:-5]),
+    )
+    rows = []
+    for f in files:
+        with open(f) as fh:
+            r = json.load(fh)
+        rows.append(
+            [
+                r["max_concurrency"],
+                r["request_throughput"],
+                r["output_throughput"],
+                r["total_token_throughput"],
+                r["p50_ttft_ms"],
+                r["p99_ttft_ms"],
+                r["p50_tpot_ms"],
+                r["p99_tpot_ms"],
+                r["p50_e2el_ms"],
+                r["p99_e2el_ms"],
+                r["num_prompts"] - r["completed"],
+                r["cpu_us_per_token"],
+                r["cpu_ms_per_request"],
+            ]
+        )
+    return rows
+
+
+def fmt(v: Any) -> str:
+    if v is None:
+        return "-"
+    if isinstance(v, float):
+        return f"{v:,.2f}"
+    return f"{v:,}"
+
+
+def write_summary(result_dir: str) -> str:
+    """Print the summary table of result_dir and write it to summary.md."""
+    rows = summary_rows(result_dir)
+    print("\n" + " | ".join(f"{h:>10}" for h in SUMMARY_HEADER))
+    print("-" * (len(SUMMARY_HEADER) * 13))
+    for row in rows:
+        print(" | ".join(f"{fmt(c):>10}" for c in row))
+
+    path = os.path.join(result_dir, "summary.md")
+    with open(path, "w") as out:
+        out.write("| " + " | ".join(SUMMARY_HEADER) + " |\n")
+        out.write("|" + "|".join(["---"] * len(SUMMARY_HEADER)) + "|\n")
+        for row in rows:
+            out.write("| " + " | ".join(fmt(c) for c in row) + " |\n")
+    print(f"\nMarkdown summary written to {path}")
+    return path
+
+
+def load_tokenizer(path: str | None) -> Any:
+    if path is None:
+        if not isinstance(sys.modules["vllm"], StandInModule):
+            # vLLM's parsers look up their marker tokens in a real vocabulary.
+            raise SystemExit("--tokenizer is required when vLLM is installed")
+        return StubTokenizer()
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(path)
+
+
+async def main(args: argparse.Namespace) -> None:
+    model_module = import_model_module()
+    tokenizer = load_tokenizer(args.tokenizer)
+    engine = StubAsyncLLMEngine(
+        tokenizer,
+        args.output_len,
+        itl_ms=args.itl_ms,
+        ttft_ms=args.ttft_ms,
+        reasoning=args.reasoning,
+        tool_call=args.tool_call,
+    )
+    model = model_module.Qwen36Model(
+        name=args.model,
+        model_path=args.tokenizer or "stub",
+        trust_remote_code=True,
+        gpu_memory_utilization=0.85,
+        max_model_len=32768,
+        tensor_parallel_size=1,
+        dtype="auto",
+        language_model_only_flag=True,
+        skip_mm_profiling_flag=True,
+        tool_calling_enabled=args.tool_call,
+        stream_flush_interval_ms=args.stream_flush_ms,
+    )
+    with patch.object(
+        model_module.AsyncLLMEngine,
+        "from_engine_args",
+        return_value=engine,
+        create=True,
+    ):
+        model.load()
+
+    rng = random.Random(args.seed)
+    os.makedirs(args.result_dir, exist_ok=True)
+    print(f"==> Results dir : {args.result_dir}")
+    # Warmup (discarded).
+    await run_concurrency(
+        model, engine, model_module.ChatCompletionRequest, ["warmup"] * 8, 8, args
+    )
+    for concurrency in args.concurrencies:
+        prompts = [
+            " ".join(rng.choice(PROMPT_WORDS) for _ in range(args.input_len))
+            for _ in range(args.num_prompts)
+        ]
+        print(f"==> Concurrency {concurrency} …")
+        result = await run_concurrency(
+            model,
+            engine,
+            model_module.ChatCompletionRequest,
+            prompts,
+            concurrency,
+            args,
+        )
+        with open(os.path.join(args.result_dir, f"c{concurrency}.json"), "w") as f:
+            json.dump(result, f, indent=2)
+    write_summary(args.result_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test the qwen36 model-server against a stub vLLM engine."
+    )
+    parser.add_argument(
+        "--tokenizer",
+        default=os.environ.get("TOKENIZER"),
+        help="Local tokenizer dir; a word-level ChatML stub is used if unset.",
+    )
+    parser.add_argument("--model", default=os.environ.get("MODEL", "qwen36-27b"))
+    parser.add_argument("--concurrencies", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--num-prompts", type=int, default=200)
+    parser.add_argument("--input-len", type=int, default=1024)
+    parser.add_argument("--output-len", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--itl-ms", type=float, default=0.0, help="Stub engine inter-token latency."
+    )
+    parser.add_argument(
+        "--ttft-ms", type=float, default=0.0, help="Stub engine time to first token."
+    )
+    parser.add_argument(
+        "--stream-flush-ms",
+        type=float,
+        default=0.0,
+        help="Server STREAM_FLUSH_INTERVAL_MS (0 sends a chunk per token).",
+    )
+    parser.add_argument(
+        "--no-stream", dest="stream", action="store_false", help="Non-streaming."
+    )
+    parser.add_argument(
+        "--reasoning", action="store_true", help="Enable thinking and parse it."
+    )
+    parser.add_argument(
+        "--tool-call", action="store_true", help="Send tools and parse a tool call."
+    )
+    parser.add_argument(
+        "--result-dir",
+        default=os.path.join(
+            "results", time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "_stub"
+        ),
+    )
+    asyncio.run(main(parser.parse_args()))
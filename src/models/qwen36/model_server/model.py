@@ -1,13 +1,16 @@
+import hashlib
 import json
 import logging
 import os
 import time
 import uuid
-from collections.abc import AsyncGenerator
-from dataclasses import dataclass, replace
+from collections.abc import AsyncGenerator, AsyncIterator
+from dataclasses import asdict, dataclass, is_dataclass, replace
+from json.encoder import encode_basestring
 from typing import Any, Union
 
 import kserve
+from fastapi import HTTPException
 from kserve.errors import InferenceError, InvalidInput
 from kserve.protocol.rest.openai import ChatPrompt, OpenAIChatAdapterModel
 from kserve.protocol.rest.openai.types import (
@@ -33,6 +36,8 @@ from vllm.reasoning import ReasoningParserManager
 from vllm.sampling_params import StructuredOutputsParams
 from vllm.tool_parsers import ToolParserManager
 
+from python.admission_utils import AdmissionController, AdmissionRejected
+from python.cache_utils import LRUCache
 from python.type_utils import strtobool
 
 logging.basicConfig(level=kserve.constants.KSERVE_LOGLEVEL)
@@ -44,6 +49,25 @@ SAMPLING_DEFAULTS = {
     False: {"temperature": 0.7, "top_p": 0.8, "presence_penalty": 1.5},
 }
 
+# Admission lanes in priority order, selected with the X-Request-Priority
+# header. Interactive traffic is always admitted before batch traffic.
+PRIORITY_HEADER = "x-request-priority"
+PRIORITY_LANES = ("interactive", "batch")
+
+# Sampling params that, with the model name and the rendered prompt, determine
+# the output of a temperature-0 request (see Qwen36Model._start_generation).
+RESPONSE_CACHE_KEY_FIELDS = (
+    "max_tokens",
+    "temperature",
+    "top_p",
+    "top_k",
+    "presence_penalty",
+    "repetition_penalty",
+    "thinking_token_budget",
+    "structured_outputs",
+    "skip_special_tokens",
+)
+
 
 @dataclass(frozen=True)
 class PerRequestOptions:
@@ -59,12 +83,122 @@ class PerRequestOptions:
     # Derived (not client-sent): set to False when tool calls are active so
     # the tool-call special tokens survive decoding for the parser.
     skip_special_tokens: bool | None = None
+    # Admission lane, one of PRIORITY_LANES (from the X-Request-Priority header).
+    priority: str = "interactive"
+    # Derived (not client-sent): set to False when tools are sent, so that
+    # tool-calling requests are never served from the response cache.
+    cacheable: bool = True
+
+
+@dataclass(frozen=True)
+class CachedOutput:
+    index: int
+    text: str
+    token_ids: tuple[int, ...]
+    finish_reason: str
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Final engine output of a deterministic request, shaped like a vLLM
+    RequestOutput so it can be replayed through the normal serving paths."""
+
+    prompt_token_ids: tuple[int, ...]
+    outputs: tuple[CachedOutput, ...]
+    finished: bool = True
+
+    def nbytes(self) -> int:
+        output = self.outputs[0]
+        return len(output.text) + 8 * (
+            len(output.token_ids) + len(self.prompt_token_ids)
+        )
 
 
 # The raw /openai/v1/completions endpoint keeps its historical thinking
 # default; chat completions resolves its own options per request.
 RAW_COMPLETIONS_DEFAULTS = PerRequestOptions(enable_thinking=True)
 
+# Placeholders the pre-rendered chunk of a ChatChunkEnvelope is split at.
+CONTENT_PLACEHOLDER = "__qwen36_delta_content__"
+REASONING_PLACEHOLDER = "__qwen36_delta_reasoning__"
+
+
+class ChatChunkEnvelope:
+    """SSE events for the chunks of one streamed chat completion.
+
+    Per-token chunks of a response differ only in delta.content and
+    delta.reasoning, so the chunk is rendered through pydantic once with
+    placeholders in those fields and every event is spliced together from the
+    rendered pieces and the JSON-escaped delta. Chunks with tool calls or for
+    other outputs than the first are rendered through pydantic as before.
+    """
+
+    def __init__(self, request_id: str, created: int, model: str, role: str):
+        self.request_id = request_id
+        self.created = created
+        self.model = model
+        self.role = role
+        rendered = self.render(
+            content=CONTENT_PLACEHOLDER, reasoning=REASONING_PLACEHOLDER
+        )
+        content = json.dumps(CONTENT_PLACEHOLDER)
+        reasoning = json.dumps(REASONING_PLACEHOLDER)
+        self.parts = None
+        if rendered.count(content) == 1 and rendered.count(reasoning) == 1:
+            self.content_first = rendered.index(content) < rendered.index(reasoning)
+            first, second = (
+                (content, reasoning) if self.content_first else (reasoning, content)
+            )
+            head, _, rest = rendered.partition(first)
+            middle, _, tail = rest.partition(second)
+            self.parts = (head, middle, tail)
+
+    def render(
+        self,
+        index: int = 0,
+        content: str | None = None,
+        reasoning: str | None = None,
+        tool_calls: list[dict[str, Any]] | None = None,
+    ) -> str:
+        delta_kwargs: dict[str, Any] = {
+            "role": self.role,
+            "content": content,
+            "reasoning": reasoning,
+        }
+        if tool_calls:
+            delta_kwargs["tool_calls"] = tool_calls
+        chunk = ChatCompletionChunk(
+            id=self.request_id,
+            created=self.created,
+            model=self.model,
+            object="chat.completion.chunk",
+            choices=[
+                ChunkChoice(
+                    index=index,
+                    delta=ChoiceDelta(**delta_kwargs),
+                    finish_reason=None,
+                )
+            ],
+            usage=None,
+        )
+        return f"data: {chunk.model_dump_json()}\n\n"
+
+    def event(
+        self,
+        index: int = 0,
+        content: str | None = None,
+        reasoning: str | None = None,
+        tool_calls: list[dict[str, Any]] | None = None,
+    ) -> str:
+        if self.parts is None or index or tool_calls:
+            return self.render(index, content, reasoning, tool_calls)
+        content = "null" if content is None else encode_basestring(content)
+        reasoning = "null" if reasoning is None else encode_basestring(reasoning)
+        if not self.content_first:
+            content, reasoning = reasoning, content
+        head, middle, tail = self.parts
+        return f"{head}{content}{middle}{reasoning}{tail}"
+
 
 class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
     def __init__(
@@ -88,6 +222,15 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
         disable_log_stats: bool = False,
         tool_calling_enabled: bool = False,
         tool_call_parser: str = "hermes",
+        admission_max_running: int | None = None,
+        admission_max_queued: int = 256,
+        interactive_wait_budget: float = 10.0,
+        batch_wait_budget: float = 300.0,
+        response_cache_size: int = 0,
+        response_cache_max_bytes: int | None = None,
+        response_cache_ttl: float | None = None,
+        stream_flush_interval_ms: float = 0.0,
+        stream_flush_max_chars: int = 512,
     ) -> None:
         super().__init__(name)
         self.name = name
@@ -109,6 +252,30 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
         self.disable_log_stats = disable_log_stats
         self.tool_calling_enabled = tool_calling_enabled
         self.tool_call_parser = tool_call_parser
+        # Requests beyond the engine's max_num_seqs would only queue inside
+        # vLLM, where they cannot be prioritised or turned away early.
+        self.admission = AdmissionController(
+            max_running=admission_max_running or max_num_seqs,
+            max_queued=admission_max_queued,
+            wait_budgets={
+                "interactive": interactive_wait_budget,
+                "batch": batch_wait_budget,
+            },
+            model_name=name,
+        )
+        # Opt-in (response_cache_size > 0) cache of temperature-0 responses.
+        self.response_cache = LRUCache(
+            "responses",
+            model_name=name,
+            max_entries=response_cache_size,
+            max_bytes=response_cache_max_bytes,
+            sizeof=CachedResponse.nbytes,
+            ttl=response_cache_ttl,
+        )
+        # Streamed chat deltas are coalesced for up to this long, or until
+        # this many characters are pending (see _stream_chat_completion).
+        self.stream_flush_interval = stream_flush_interval_ms / 1000
+        self.stream_flush_max_chars = stream_flush_max_chars
         self.model = None
         self.tokenizer = None
         self.reasoning_parser = None
@@ -267,8 +434,21 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
             "functions are not supported"
         )
 
+    @staticmethod
+    def _resolve_priority(headers: dict[str, str] | None) -> str:
+        """Resolve the admission lane from the X-Request-Priority header."""
+        for key, value in (headers or {}).items():
+            if key.lower() == PRIORITY_HEADER:
+                priority = value.strip().lower()
+                if priority not in PRIORITY_LANES:
+                    raise InvalidInput(
+                        f"{PRIORITY_HEADER} must be one of {', '.join(PRIORITY_LANES)}"
+                    )
+                return priority
+        return PRIORITY_LANES[0]
+
     def _resolve_request_options(
-        self, request: ChatCompletionRequest
+        self, request: ChatCompletionRequest, context: dict[str, Any] | None = None
     ) -> PerRequestOptions:
         """Resolve the per-request thinking / structured-output options once."""
         enable_thinking = self._resolve_enable_thinking(request)
@@ -280,8 +460,25 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
             enable_thinking=enable_thinking,
             thinking_token_budget=thinking_token_budget,
             structured_outputs=structured_outputs,
+            priority=self._resolve_priority((context or {}).get("headers")),
         )
 
+    async def _admit(self, priority: str) -> float:
+        """Wait for an engine slot in the priority lane.
+
+        Returns the admission time to release the slot with. Raises a 429
+        with a Retry-After header when the lane is full or the estimated
+        wait exceeds its budget, so clients back off instead of timing out.
+        """
+        try:
+            return await self.admission.acquire(priority)
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)},
+            )
+
     def _apply_chat_template(
         self, messages: list, enable_thinking: bool = True, tools: list | None = None
     ) -> str:
@@ -377,6 +574,91 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
             params["skip_special_tokens"] = options.skip_special_tokens
         return SamplingParams(**params)
 
+    def _response_cache_key(self, prompt: str, sampling_params: SamplingParams) -> str:
+        params = {
+            field: getattr(sampling_params, field, None)
+            for field in RESPONSE_CACHE_KEY_FIELDS
+        }
+        data = json.dumps(
+            [self.name, prompt, params],
+            sort_keys=True,
+            default=lambda value: asdict(value) if is_dataclass(value) else repr(value),
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    async def _start_generation(
+        self,
+        prompt: str,
+        sampling_params: SamplingParams,
+        request_id: str,
+        options: PerRequestOptions,
+    ) -> tuple[AsyncIterator[RequestOutput], float | None]:
+        """Start generating, through the response cache when possible.
+
+        With the response cache enabled, a cacheable request sampled at
+        temperature 0 is keyed by (model, prompt, sampling params). A hit
+        replays the cached final output without taking an engine slot; a miss
+        waits for a slot, is generated as usual and its final output cached if
+        it completed. Returns the results and the admission time to release
+        the slot with, or None for a hit.
+        """
+        key = None
+        if (
+            self.response_cache.enabled
+            and options.cacheable
+            and sampling_params.temperature == 0
+        ):
+            key = self._response_cache_key(prompt, sampling_params)
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return self._replay_response(cached), None
+
+        admitted_at = await self._admit(options.priority)
+        try:
+            results_generator = self.model.generate(
+                prompt=prompt, sampling_params=sampling_params, request_id=request_id
+            )
+        except Exception as e:
+            self.admission.release(admitted_at)
+            logging.error("Error during inference: %s", e)
+            raise InferenceError(f"Error during inference: {e}")
+        if key is not None:
+            results_generator = self._record_response(results_generator, key)
+        return results_generator, admitted_at
+
+    @staticmethod
+    async def _replay_response(
+        cached: CachedResponse,
+    ) -> AsyncIterator[CachedResponse]:
+        yield cached
+
+    async def _record_response(
+        self, results_generator: AsyncIterator[RequestOutput], key: str
+    ) -> AsyncIterator[RequestOutput]:
+        final_output = None
+        async for request_output in results_generator:
+            final_output = request_output
+            yield request_output
+        if final_output is None:
+            return
+        output = final_output.outputs[0]
+        # Aborted requests are not cached.
+        if output.finish_reason in ("stop", "length"):
+            self.response_cache.put(
+                key,
+                CachedResponse(
+                    prompt_token_ids=tuple(final_output.prompt_token_ids),
+                    outputs=(
+                        CachedOutput(
+                            index=output.index,
+                            text=output.text,
+                            token_ids=tuple(output.token_ids),
+                            finish_reason=output.finish_reason,
+                        ),
+                    ),
+                ),
+            )
+
     async def _collect_generator(self, results_generator) -> RequestOutput:
         """Consume the async generator and return the final RequestOutput."""
         final_output = None
@@ -449,7 +731,7 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
 
         tool_choice = self._resolve_tool_choice(request)
 
-        options = self._resolve_request_options(request)
+        options = self._resolve_request_options(request, context)
         if options.thinking_token_budget is not None and not options.enable_thinking:
             logging.warning(
                 "thinking_token_budget=%s received with thinking disabled; "
@@ -479,19 +761,33 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
             )
             parse_tool_calls = False
 
+        if request.tools:
+            options = replace(options, cacheable=False)
+
         if parse_tool_calls:
             # Tool-call tags are special tokens in some tokenizers and would
             # be stripped from the decoded output before the parser sees them.
             options = replace(options, skip_special_tokens=False)
 
         if request.stream:
-            return self._stream_chat_completion(
+            request_id = completion_request.request_id or uuid.uuid4().hex
+            results_generator, admitted_at = await self._start_generation(
+                completion_request.prompt,
+                self._build_sampling_params_from_request(completion_request, options),
+                request_id,
+                options,
+            )
+            stream = self._stream_chat_completion(
                 request,
                 chat_prompt,
-                completion_request,
+                results_generator,
+                request_id,
                 parse_tool_calls,
                 options=options,
             )
+            if admitted_at is None:
+                return stream
+            return self.admission.release_after(stream, admitted_at)
 
         completion = await self.create_completion(
             completion_request,
@@ -544,62 +840,84 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
         self,
         request: ChatCompletionRequest,
         chat_prompt: ChatPrompt,
-        completion_request: CompletionRequest,
+        results_generator: AsyncIterator[RequestOutput],
+        request_id: str,
         parse_tool_calls: bool = False,
         *,
         options: PerRequestOptions,
     ) -> AsyncGenerator[str, None]:
         """Stream chat completions as ``object:"chat.completion.chunk"`` chunks.
 
-        Per-token chunks carry ``delta.content`` (and ``delta.reasoning`` when
-        thinking is enabled) with ``finish_reason=None``.  With tool calling
+        Per-token chunks (merged per ``stream_flush_interval`` when set and
+        neither reasoning nor tool calls are parsed) carry
+        ``delta.content`` (and ``delta.reasoning`` when thinking is enabled)
+        with ``finish_reason=None``.  With tool calling
         active, streamed tool calls arrive as incremental ``delta.tool_calls``
         deltas and the raw tool-call tag text is never emitted as content.
         Exactly one final chunk follows the stream, carrying usage and either
         finish_reason "tool_calls" (when a tool call was streamed) or the
         engine's finish_reason.
         """
-        request_id = completion_request.request_id or uuid.uuid4().hex
-        sampling_params = self._build_sampling_params_from_request(
-            completion_request,
-            options,
-        )
-
-        try:
-            results_generator = self.model.generate(
-                prompt=completion_request.prompt,
-                sampling_params=sampling_params,
-                request_id=request_id,
-            )
-        except Exception as e:
-            logging.error("Error during streaming inference: %s", e)
-            raise InferenceError(f"Error during streaming inference: {e}")
-
         previous_texts: list[str] = [""]
         previous_num_tokens: list[int] = [0]
-        previous_token_ids: list[list[int]] = [[]]
         previous_contents: list[str] = [""]
         created_time = int(time.time())
+        envelope = ChatChunkEnvelope(
+            request_id, created_time, request.model, chat_prompt.response_role
+        )
         prompt_tokens = 0
         final_finish_reason: str | None = None
         final_completion_tokens = 0
         tools_streamed = False
 
         parser = self.reasoning_parser if options.enable_thinking else None
+        # Indexes of the outputs whose reasoning has ended: the qwen3 parser
+        # returns everything after </think> (or an implicit <tool_call>) as
+        # content, so once it has returned content it is no longer called.
+        reasoning_ended: set[int] = set()
         tool_parser = self.tool_parser_cls(self.tokenizer) if parse_tool_calls else None
+        # Content without the first character of the parser's tool call tag
+        # cannot start a tool call and is streamed as is. The parser is only
+        # called from the first delta that could, and sees the content from
+        # there on as the whole text (previous_contents stays empty until then).
+        tool_call_start = getattr(tool_parser, "tool_call_start_token", None)
+        tool_call_start = (
+            tool_call_start[0]
+            if isinstance(tool_call_start, str) and tool_call_start
+            else None
+        )
+        # The streaming reasoning and tool-call parsers expect one engine
+        # output per call (they track tags by token and by delta), so streams
+        # that use either are never coalesced.
+        flush_interval = (
+            0.0
+            if parser is not None or tool_parser is not None
+            else self.stream_flush_interval
+        )
+        next_flush = 0.0
 
         try:
             async for request_output in results_generator:
+                if flush_interval:
+                    # Coalesce engine outputs (their text is cumulative) into
+                    # one chunk per flush_interval, so that a delta waits at
+                    # most one inter-token interval longer. The first chunk
+                    # and the last output are always sent at once.
+                    if (
+                        time.monotonic() < next_flush
+                        and not request_output.finished
+                        and sum(len(o.text) for o in request_output.outputs)
+                        - sum(map(len, previous_texts))
+                        < self.stream_flush_max_chars
+                    ):
+                        continue
+
                 for output in request_output.outputs:
                     i = output.index
-                    track_tokens = parser is not None or tool_parser is not None
                     self._ensure_output_capacity(
                         previous_texts,
                         previous_num_tokens,
                         i,
-                        previous_token_ids=(
-                            previous_token_ids if track_tokens else None
-                        ),
                         previous_contents=(
                             previous_contents if tool_parser is not None else None
                         ),
@@ -609,6 +927,7 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
                     curr_text = output.text
                     delta_text = curr_text[len(prev_text) :]
                     curr_tokens = output.token_ids
+                    num_prev_tokens = previous_num_tokens[i]
 
                     previous_texts[i] = curr_text
                     previous_num_tokens[i] = len(curr_tokens)
@@ -618,15 +937,13 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
                         final_finish_reason = output.finish_reason
                         final_completion_tokens = len(curr_tokens)
 
-                    if track_tokens:
-                        prev_tokens = previous_token_ids[i]
-                        delta_tokens = curr_tokens[len(prev_tokens) :]
-                        previous_token_ids[i] = list(curr_tokens)
-                    else:
-                        prev_tokens = None
-                        delta_tokens = None
+                    # Sliced only for the parsers that are actually called.
+                    prev_tokens = None
+                    delta_tokens = None
 
-                    if parser is not None:
+                    if parser is not None and i not in reasoning_ended:
+                        prev_tokens = curr_tokens[:num_prev_tokens]
+                        delta_tokens = curr_tokens[num_prev_tokens:]
                         d = parser.extract_reasoning_streaming(
                             prev_text,
                             curr_text,
@@ -639,12 +956,28 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
                             continue
                         delta_reasoning = d.reasoning
                         delta_content = d.content
+                        if delta_content is not None:
+                            reasoning_ended.add(i)
+                    elif parser is not None and not delta_text:
+                        # Nothing the parser would have returned a delta for.
+                        continue
                     else:
                         delta_reasoning = None
                         delta_content = delta_text
 
                     tool_calls = None
-                    if tool_parser is not None and delta_content:
+                    if (
+                        tool_parser is not None
+                        and delta_content
+                        and (
+                            tool_call_start is None
+                            or previous_contents[i]
+                            or tool_call_start in delta_content
+                        )
+                    ):
+                        if prev_tokens is None:
+                            prev_tokens = curr_tokens[:num_prev_tokens]
+                            delta_tokens = curr_tokens[num_prev_tokens:]
                         prev_content = previous_contents[i]
                         curr_content = prev_content + delta_content
                         previous_contents[i] = curr_content
@@ -675,29 +1008,8 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
                                     for tc in raw_tool_calls
                                 ]
 
-                    delta_kwargs: dict[str, Any] = {
-                        "role": chat_prompt.response_role,
-                        "content": delta_content,
-                        "reasoning": delta_reasoning,
-                    }
-                    if tool_calls:
-                        delta_kwargs["tool_calls"] = tool_calls
-
-                    chunk = ChatCompletionChunk(
-                        id=request_id,
-                        created=created_time,
-                        model=request.model,
-                        object="chat.completion.chunk",
-                        choices=[
-                            ChunkChoice(
-                                index=i,
-                                delta=ChoiceDelta(**delta_kwargs),
-                                finish_reason=None,
-                            )
-                        ],
-                        usage=None,
-                    )
-                    yield f"data: {chunk.model_dump_json()}\n\n"
+                    next_flush = time.monotonic() + flush_interval
+                    yield envelope.event(i, delta_content, delta_reasoning, tool_calls)
         except Exception as e:
             logging.error("Error during streaming inference: %s", e)
             yield f"data: {json.dumps({'error': {'message': str(e), 'type': 'server_error'}})}\n\n"
@@ -737,7 +1049,10 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
         options: PerRequestOptions | None = None,
     ) -> Union[AsyncGenerator[str, None], Completion]:
         if options is None:
-            options = RAW_COMPLETIONS_DEFAULTS
+            options = replace(
+                RAW_COMPLETIONS_DEFAULTS,
+                priority=self._resolve_priority((context or {}).get("headers")),
+            )
         prompt = request.prompt
         if isinstance(prompt, list):
             prompt = self.tokenizer.decode(prompt)
@@ -745,20 +1060,17 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
         sampling_params = self._build_sampling_params_from_request(request, options)
         request_id = request.request_id or uuid.uuid4().hex
 
-        try:
-            results_generator = self.model.generate(
-                prompt=prompt,
-                sampling_params=sampling_params,
-                request_id=request_id,
-            )
-        except Exception as e:
-            logging.error("Error during inference: %s", e)
-            raise InferenceError(f"Error during inference: {e}")
+        results_generator, admitted_at = await self._start_generation(
+            prompt, sampling_params, request_id, options
+        )
 
         if request.stream:
-            return self._stream_completion(
+            stream = self._stream_completion(
                 results_generator, request_id, int(time.time()), request.model
             )
+            if admitted_at is None:
+                return stream
+            return self.admission.release_after(stream, admitted_at)
 
         try:
             final_output = await self._collect_generator(results_generator)
@@ -766,6 +1078,9 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
             if options.structured_outputs is not None:
                 raise InvalidInput(f"Invalid structured output request: {e}") from e
             raise
+        finally:
+            if admitted_at is not None:
+                self.admission.release(admitted_at)
         return self._build_completion(
             final_output, request_id, int(time.time()), request.model
         )
@@ -775,7 +1090,6 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
         previous_texts: list,
         previous_num_tokens: list,
         index: int,
-        previous_token_ids: list | None = None,
         previous_contents: list | None = None,
     ) -> None:
         """Grow tracking lists to accommodate output at the given index.
@@ -787,8 +1101,6 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
             gap = index - len(previous_texts) + 1
             previous_texts.extend([""] * gap)
             previous_num_tokens.extend([0] * gap)
-            if previous_token_ids is not None:
-                previous_token_ids.extend([[]] * gap)
             if previous_contents is not None:
                 previous_contents.extend([""] * gap)
 
@@ -905,9 +1217,11 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
         return {
             "prompt": text,
             "sampling_params": sampling_params,
+            "priority": self._resolve_priority(headers),
         }
 
     async def predict(self, inputs: dict, headers: dict[str, str] = None) -> dict:
+        admitted_at = await self._admit(inputs.get("priority", PRIORITY_LANES[0]))
         try:
             prompt = inputs["prompt"]
             sampling_params = inputs["sampling_params"]
@@ -935,6 +1249,8 @@ class Qwen36Model(kserve.Model, OpenAIChatAdapterModel):
             error_message = f"Error during inference: {e}"
             logging.error(error_message)
             raise InferenceError(error_message)
+        finally:
+            self.admission.release(admitted_at)
 
 
 if __name__ == "__main__":
@@ -959,6 +1275,19 @@ if __name__ == "__main__":
     disable_log_stats = strtobool(os.environ.get("DISABLE_LOG_STATS", "False"))
     tool_calling_enabled = strtobool(os.environ.get("TOOL_CALLING_ENABLED", "False"))
     tool_call_parser = os.environ.get("TOOL_CALL_PARSER", "hermes")
+    admission_max_running = int(
+        os.environ.get("ADMISSION_MAX_RUNNING", str(max_num_seqs))
+    )
+    admission_max_queued = int(os.environ.get("ADMISSION_MAX_QUEUED", "256"))
+    interactive_wait_budget = float(os.environ.get("INTERACTIVE_WAIT_BUDGET", "10"))
+    batch_wait_budget = float(os.environ.get("BATCH_WAIT_BUDGET", "300"))
+    response_cache_size = int(os.environ.get("RESPONSE_CACHE_SIZE", "0"))
+    response_cache_max_bytes = int(
+        os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+    )
+    response_cache_ttl = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+    stream_flush_interval_ms = float(os.environ.get("STREAM_FLUSH_INTERVAL_MS", "0"))
+    stream_flush_max_chars = int(os.environ.get("STREAM_FLUSH_MAX_CHARS", "512"))
 
     model = Qwen36Model(
         name=model_name,
@@ -980,6 +1309,15 @@ if __name__ == "__main__":
         disable_log_stats=disable_log_stats,
         tool_calling_enabled=tool_calling_enabled,
         tool_call_parser=tool_call_parser,
+        admission_max_running=admission_max_running,
+        admission_max_queued=admission_max_queued,
+        interactive_wait_budget=interactive_wait_budget,
+        batch_wait_budget=batch_wait_budget,
+        response_cache_size=response_cache_size,
+        response_cache_max_bytes=response_cache_max_bytes,
+        response_cache_ttl=response_cache_ttl,
+        stream_flush_interval_ms=stream_flush_interval_ms,
+        stream_flush_max_chars=stream_flush_max_chars,
     )
 
     model.load()
@@ -0,0 +1,275 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pytest
+from aiohttp import web
+from catboost import CatBoostClassifier
+from kserve.errors import InferenceError
+
+from src.models.articlequality.model_server import model_v2
+from src.models.articlequality.model_server.model_v2 import ArticleQualityModelV2
+
+LABELS = ["Stub", "Start", "C", "B", "GA", "FA"]
+FEATURES = [1200, 4, 30, 2, 1, 3, 2, 300]
+ARTICLE_HTML = """<!DOCTYPE html>
+<html><head><base href="//en.wikipedia.org/wiki/"/><title>Test</title></head>
+<body>
+<section data-mw-section-id="0"><p>Hello <a rel="mw:WikiLink" href="./Foo">foo</a>
+world.</p></section>
+<section data-mw-section-id="1"><h2 id="History">History</h2><p>More text
+here<sup class="mw-ref reference" id="cite_ref-1" typeof="mw:Extension/ref">
+<a href="./Test#cite_note-1">[1]</a></sup>.</p></section>
+<link rel="mw:PageProp/Category" href="./Category:Tests"/>
+</body></html>"""
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    """A tiny catboost model trained on random features."""
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 100, size=(60, len(FEATURES)))
+    y = [LABELS[i % len(LABELS)] for i in range(len(X))]
+    model_dir = tmp_path_factory.mktemp("model")
+    classifier = CatBoostClassifier(
+        iterations=5,
+        class_names=LABELS,
+        verbose=False,
+        random_seed=0,
+        train_dir=str(model_dir),
+    )
+    classifier.fit(X, y)
+    path = str(model_dir / "catboost_model.cbm")
+    classifier.save_model(path)
+    return path
+
+
+class StubUpstream:
+    """Stands in for the HTML endpoint, answering each revision after a delay."""
+
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = failing
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fetched = []
+
+    async def get_article_html(self, session, host, lang, rev_id):
+        self.fetched.append((lang, rev_id))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[rev_id])
+        finally:
+            self.in_flight -= 1
+        if rev_id in self.failing:
+            raise InferenceError(f"Failed to get article revision with id: {rev_id}")
+        return f"<html>{rev_id}</html>"
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def install(delays, failing=()):
+        stub = StubUpstream(delays, failing)
+        monkeypatch.setattr(model_v2, "get_article_html", stub.get_article_html)
+        monkeypatch.setattr(
+            model_v2, "get_article_features_v2", lambda html: list(FEATURES)
+        )
+        return stub
+
+    return install
+
+
+def _request(rev_ids, lang="en"):
+    return {"instances": [{"lang": lang, "rev_id": rev_id} for rev_id in rev_ids]}
+
+
+async def _infer(model, inputs):
+    return model.predict(await model.preprocess(inputs))
+
+
+@pytest.mark.asyncio
+async def test_batch_takes_about_as_long_as_the_slowest_fetch(model_path, upstream):
+    delays = {rev_id: 0.1 + rev_id * 0.02 for rev_id in range(1, 6)}
+    stub = upstream(delays)
+    model = ArticleQualityModelV2("articlequality_v2", model_path)
+
+    start = time.perf_counter()
+    response = await _infer(model, _request(delays))
+    elapsed = time.perf_counter() - start
+
+    assert stub.max_in_flight == len(delays)
+    # Sequential fetches would take sum(delays) = 0.8s.
+    assert elapsed < max(delays.values()) + 0.15
+    assert [p["label"] in LABELS for p in response["predictions"]] == [True] * 5
+
+
+@pytest.mark.asyncio
+async def test_fetches_in_flight_are_bounded(model_path, upstream):
+    stub = upstream({rev_id: 0.01 for rev_id in range(1, 9)})
+    model = ArticleQualityModelV2(
+        "articlequality_v2", model_path, max_concurrent_fetches=3
+    )
+
+    await asyncio.gather(
+        _infer(model, _request(range(1, 5))), _infer(model, _request(range(5, 9)))
+    )
+
+    assert stub.max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_instance_does_not_fail_the_others(model_path, upstream):
+    upstream({1: 0.01, 2: 0.0, 3: 0.02}, failing={2})
+    model = ArticleQualityModelV2("articlequality_v2", model_path)
+
+    response = await _infer(model, _request([1, 2, 3]))
+
+    first, failed, last = response["predictions"]
+    assert failed == {"error": "Failed to get article revision with id: 2"}
+    assert first["features"] == dict(zip(model.feature_order, FEATURES))
+    assert last["label"] in LABELS
+
+
+@pytest.mark.asyncio
+async def test_request_fails_when_every_instance_does(model_path, upstream):
+    upstream({1: 0.0, 2: 0.0}, failing={1, 2})
+    model = ArticleQualityModelV2("articlequality_v2", model_path)
+
+    with pytest.raises(InferenceError, match="id: 1"):
+        await model.preprocess(_request([1, 2]))
+
+
+@asynccontextmanager
+async def local_wiki():
+    """A local HTML endpoint recording the connections it accepts."""
+    connections = set()
+    hosts = set()
+
+    async def revision_html(request):
+        connections.add(request.transport.get_extra_info("peername"))
+        hosts.add(request.headers["Host"])
+        await asyncio.sleep(0.02)
+        return web.Response(text=ARTICLE_HTML, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/w/rest.php/v1/revision/{rev_id}/html", revision_html)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        yield f"http://127.0.0.1:{port}", connections, hosts
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_connections_are_kept_alive_across_requests(model_path):
+    async with local_wiki() as (url, connections, hosts):
+        model = ArticleQualityModelV2(
+            "articlequality_v2",
+            model_path,
+            max_concurrent_fetches=4,
+            wiki_url=url,
+            feature_cache_size=0,
+        )
+
+        for rev_id in range(3):
+            await _infer(model, _request([rev_id]))
+        assert len(connections) == 1
+        for _ in range(3):
+            response = await _infer(model, _request(range(4)))
+        await model.close_http_client_sessions()
+
+    assert len(connections) <= 4
+    assert hosts == {"en.wikipedia.org"}
+    assert response["predictions"][0]["features"]["refs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_closes_the_sessions(model_path):
+    async with local_wiki() as (url, _, _):
+        model = ArticleQualityModelV2("articlequality_v2", model_path, wiki_url=url)
+        await _infer(model, _request([1]))
+        session = model.get_http_client_session(url)
+
+        model.stop()
+        await asyncio.sleep(0)
+
+    assert session.closed
+    assert not model.ready
+
+
+@pytest.mark.asyncio
+async def test_cached_revisions_are_not_fetched_again(model_path, upstream):
+    stub = upstream({rev_id: 0.0 for rev_id in range(1, 4)})
+    model = ArticleQualityModelV2("articlequality_v2", model_path)
+
+    first = await _infer(model, _request([1, 2]))
+    second = await _infer(model, _request([2, 3]))
+    await _infer(model, _request([1], lang="fr"))
+
+    assert sorted(stub.fetched) == [("en", 1), ("en", 2), ("en", 3), ("fr", 1)]
+    assert second["predictions"][0] == first["predictions"][1]
+    assert model.feature_cache.cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_revisions_are_not_cached(model_path, upstream):
+    stub = upstream({1: 0.0, 2: 0.0}, failing={2})
+    model = ArticleQualityModelV2("articlequality_v2", model_path)
+
+    for _ in range(2):
+        response = await _infer(model, _request([1, 2]))
+
+    assert stub.fetched.count(("en", 2)) == 2
+    assert "error" in response["predictions"][1]
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restarts(model_path, upstream, tmp_path):
+    path = str(tmp_path / "features.sqlite")
+    upstream({1: 0.0, 2: 0.0})
+    model = ArticleQualityModelV2(
+        "articlequality_v2", model_path, feature_cache_path=path
+    )
+    expected = await _infer(model, _request([1, 2]))
+
+    stub = upstream({1: 0.0, 2: 0.0})
+    restarted = ArticleQualityModelV2(
+        "articlequality_v2", model_path, feature_cache_path=path
+    )
+    response = await _infer(restarted, _request([1, 2]))
+
+    assert stub.fetched == []
+    assert response == expected
+    assert restarted.feature_cache.disk.hits == 2
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_runs_off_the_event_loop(model_path, upstream, tmp_path):
+    upstream({1: 0.0})
+    model = ArticleQualityModelV2(
+        "articlequality_v2", model_path, feature_cache_path=str(tmp_path / "f.sqlite")
+    )
+    disk = model.feature_cache.disk
+    threads = []
+    get, put = disk.get, disk.put
+
+    def record(func):
+        def wrapper(*args):
+            threads.append(threading.get_ident())
+            return func(*args)
+
+        return wrapper
+
+    disk.get, disk.put = record(get), record(put)
+
+    await _infer(model, _request([1]))
+
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+from mwparserfromhtml import Article
+from mwparserfromhtml.parse.utils import is_transcluded
+
+from src.models.articlequality.model_server.utils import (
+    _count_elements,
+    get_article_features,
+    get_article_features_v2,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Features of the saved Parsoid HTML, as computed by the previous
+# implementation, which walked the tree once per element type.
+EXPECTED_FEATURES_V2 = {
+    "lighthouse.html": [2147, 7, 28, 2, 7, 7, 6, 224],
+    "phare_fr.html": [380, 2, 7, 2, 1, 3, 1, 91],
+    "stub.html": [101, 0, 3, 1, 0, 0, 1, 101],
+}
+EXPECTED_FEATURES = {
+    "lighthouse.html": [2147, 7, 28, 2, 7, 7, 6, True, False],
+    "phare_fr.html": [380, 2, 7, 2, 1, 3, 2, True, False],
+    "stub.html": [101, 0, 3, 1, 0, 0, 0, False, True],
+}
+
+
+def _read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED_FEATURES_V2))
+def test_get_article_features_v2(name):
+    assert get_article_features_v2(_read_fixture(name)) == EXPECTED_FEATURES_V2[name]
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED_FEATURES))
+def test_get_article_features(name):
+    assert get_article_features(_read_fixture(name)) == EXPECTED_FEATURES[name]
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED_FEATURES))
+def test_counts_match_the_mwparserfromhtml_getters(name):
+    article = Article(_read_fixture(name))
+    wikistew = article.wikistew
+
+    counts = _count_elements(article)
+
+    assert counts["refs"] == len(wikistew.get_citations())
+    assert counts["sources"] == len(wikistew.get_references())
+    assert counts["wikilinks"] == len(
+        [
+            w
+            for w in wikistew.get_wikilinks()
+            if not is_transcluded(w.html_tag) and not w.link.endswith("redlink=1")
+        ]
+    )
+    assert counts["categories"] == len(
+        [c for c in wikistew.get_categories() if not is_transcluded(c.html_tag)]
+    )
+    assert counts["headings"] == len(
+        [h for h in wikistew.get_headings() if h.level <= 3]
+    )
+    assert counts["images"] == len(wikistew.get_images())
+    assert counts["media"] == (
+        len([i for i in wikistew.get_images() if i.height * i.width > 100 * 100])
+        + len(wikistew.get_video())
+        + len(wikistew.get_audio())
+    )
+    assert counts["messageboxes"] == len(wikistew.get_message_boxes())
+
+
+def test_html_that_is_not_from_parsoid():
+    features = get_article_features_v2("<html><body><p>Hi</p></body></html>")
+
+    assert features == (0,) * 8
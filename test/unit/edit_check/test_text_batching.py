@@ -0,0 +1,128 @@
+import asyncio
+import sys
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+
+def mock_modules(modules):
+    for mod in modules:
+        # Keep the mocks installed by the other edit_check tests, which patch them.
+        sys.modules.setdefault(mod, MagicMock())
+
+
+# Mocking the modules that are not available (or relevant) in the test environment
+mock_modules(
+    [
+        "kserve",
+        "kserve.errors",
+        "kserve.constants",
+        "fastapi.middleware.cors",
+        "torch",
+        "transformers",
+        "shap",
+    ]
+)
+
+import kserve  # noqa: E402
+
+kserve.Model = type("DummyKserveModel", (), {})
+kserve.constants.KSERVE_LOGLEVEL = 0
+
+from python.batching_utils import MicroBatcher  # noqa: E402
+from src.models.edit_check.model_server.model import EditCheckModel  # noqa: E402
+
+
+class TinyRandomClassifier:
+    """
+    Text-classification pipeline stand-in: a random linear layer over
+    character counts. Every call costs a fixed 10ms, like a forward pass.
+    """
+
+    def __init__(self, seed=0):
+        self.weights = np.random.default_rng(seed).normal(size=(128, 2))
+        self.calls = []
+
+    def _classify(self, text):
+        features = np.bincount([min(ord(c), 127) for c in text], minlength=128) / max(
+            len(text), 1
+        )
+        logits = features @ self.weights
+        probs = np.exp(logits) / np.exp(logits).sum()
+        label = int(probs.argmax())
+        return {"label": f"LABEL_{label}", "score": float(probs[label])}
+
+    def __call__(self, texts, truncation=True, max_length=512, batch_size=1):
+        self.calls.append(len(texts))
+        time.sleep(0.01)
+        return [self._classify(text) for text in texts]
+
+
+def _instances(n, prefix):
+    return {
+        "instances": [
+            {
+                "lang": "en",
+                "page_title": "Test_Page",
+                "check_type": "tone",
+                "original_text": f"{prefix} original {i}",
+                "modified_text": f"{prefix} the most brilliant {i}!",
+            }
+            for i in range(n)
+        ]
+    }
+
+
+@pytest.fixture
+def model():
+    m = EditCheckModel.__new__(EditCheckModel)
+    m.name = "edit-check"
+    m.use_metadata = False
+    m.model_pipeline = TinyRandomClassifier()
+    m.batcher = MicroBatcher(
+        m.classify, max_wait_ms=20, max_batch_size=600, name="edit_check"
+    )
+    return m
+
+
+async def _infer(model, inputs):
+    return await model.postprocess(await model.predict(await model.preprocess(inputs)))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_a_forward_pass(model):
+    requests = [_instances(i + 1, f"request {i}") for i in range(8)]
+
+    responses = await asyncio.gather(*(_infer(model, r) for r in requests))
+
+    # 8 requests with 36 pairs in all run in one pipeline call.
+    assert model.model_pipeline.calls == [72]
+    classifier = TinyRandomClassifier()
+    for request, response in zip(requests, responses):
+        instances = request["instances"]
+        assert len(response["predictions"]) == len(instances)
+        for instance, prediction in zip(instances, response["predictions"]):
+            modified = classifier._classify(instance["modified_text"])
+            assert prediction["probability"] == round(modified["score"], 3)
+
+
+@pytest.mark.asyncio
+async def test_batched_predictions_match_single_requests(model):
+    requests = [_instances(3, f"request {i}") for i in range(4)]
+
+    batched = await asyncio.gather(*(_infer(model, r) for r in requests))
+    single = [await _infer(model, r) for r in requests]
+
+    assert batched == single
+    assert model.model_pipeline.calls == [24, 6, 6, 6, 6]
+
+
+@pytest.mark.asyncio
+async def test_batches_are_capped_at_the_batch_size(model):
+    model.batcher.max_batch_size = 10
+
+    await asyncio.gather(*(_infer(model, _instances(3, str(i))) for i in range(5)))
+
+    assert sorted(model.model_pipeline.calls) == [10, 10, 10]
@@ -0,0 +1,144 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from prometheus_client import REGISTRY
+
+
+def mock_modules(modules):
+    for mod in modules:
+        # Keep the mocks installed by the other edit_check tests, which patch them.
+        sys.modules.setdefault(mod, MagicMock())
+
+
+# Mocking the modules that are not available (or relevant) in the test environment
+mock_modules(
+    [
+        "kserve",
+        "kserve.errors",
+        "kserve.constants",
+        "fastapi.middleware.cors",
+        "torch",
+        "transformers",
+        "shap",
+    ]
+)
+
+import kserve  # noqa: E402
+
+kserve.Model = type("DummyKserveModel", (), {})
+kserve.constants.KSERVE_LOGLEVEL = 0
+
+from python.batching_utils import MicroBatcher  # noqa: E402
+from src.models.edit_check.model_server.config import settings  # noqa: E402
+from src.models.edit_check.model_server.model import EditCheckModel  # noqa: E402
+
+
+def fake_pipeline(texts, **kwargs):
+    return [{"label": f"LABEL_{len(text) % 2}", "score": 0.9} for text in texts]
+
+
+class BlockingExplainer:
+    """SHAP explainer stand-in that runs until it is released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.max_evals = []
+
+    def __call__(self, texts, max_evals):
+        self.max_evals.append(max_evals)
+        self.started.set()
+        self.release.wait(5)
+        return [f"explanation of {text}" for text in texts]
+
+
+def _request(return_shap_values=False, approximate_shap_values=False):
+    return {
+        "instances": [
+            {
+                "lang": "en",
+                "page_title": "Test_Page",
+                "check_type": "tone",
+                "original_text": "original text",
+                "modified_text": "modified text",
+                "return_shap_values": return_shap_values,
+                "approximate_shap_values": approximate_shap_values,
+            }
+        ]
+    }
+
+
+def _metric(name, mode):
+    labels = {"model_name": "edit-check-explain", "mode": mode}
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def model():
+    m = EditCheckModel.__new__(EditCheckModel)
+    m.name = "edit-check-explain"
+    m.use_metadata = False
+    m.model_pipeline = fake_pipeline
+    m.batcher = MicroBatcher(m.classify, name="edit_check")
+    m.explainer = BlockingExplainer()
+    m.explanation_executor = ThreadPoolExecutor(max_workers=1)
+    yield m
+    m.explainer.release.set()
+    m.explanation_executor.shutdown()
+
+
+async def _predict(model, inputs):
+    return await model.predict(await model.preprocess(inputs))
+
+
+@pytest.mark.asyncio
+async def test_predictions_flow_while_an_explanation_runs(model):
+    explained = asyncio.create_task(_predict(model, _request(True)))
+    await asyncio.to_thread(model.explainer.started.wait, 5)
+
+    plain = await asyncio.wait_for(
+        asyncio.gather(*(_predict(model, _request()) for _ in range(5))), 1
+    )
+
+    assert all(explanations == [] for _, explanations, _ in plain)
+    assert not explained.done()
+    model.explainer.release.set()
+    predictions, explanations, _ = await explained
+    assert len(predictions) == 2
+    assert explanations == ["explanation of modified text"]
+
+
+@pytest.mark.asyncio
+async def test_approximate_explanations_get_a_smaller_budget(model):
+    model.explainer.release.set()
+    full = _metric("explanation_seconds_count", "full")
+    approximate = _metric("explanation_seconds_count", "approximate")
+
+    await _predict(model, _request(True))
+    await _predict(model, _request(True, approximate_shap_values=True))
+
+    assert model.explainer.max_evals == [
+        settings.shap_max_evals,
+        settings.shap_approximate_max_evals,
+    ]
+    assert _metric("explanation_seconds_count", "full") == full + 1
+    assert _metric("explanation_seconds_count", "approximate") == approximate + 1
+
+
+@pytest.mark.asyncio
+async def test_explanation_over_the_time_budget_is_dropped(model, monkeypatch):
+    monkeypatch.setattr(settings, "shap_timeout", 0.05)
+    timeouts = _metric("explanation_timeouts_total", "full")
+
+    output = await _predict(model, _request(True))
+    response = await model.postprocess(output)
+
+    assert output[1] == [None]
+    assert _metric("explanation_timeouts_total", "full") == timeouts + 1
+    (prediction,) = response["predictions"]
+    assert prediction["details"] == {"error": "SHAP explanation timed out"}
+    assert isinstance(prediction["prediction"], bool)
@@ -1,11 +1,16 @@
 import csv
+import os
+import threading
+import time
 from unittest.mock import patch
 
 import pytest
 from kserve.errors import InvalidInput
 
-from src.models.editing_suggestions.model_server.model import (
-    EditingSuggestionsModel,
+from src.models.editing_suggestions.model_server.model import EditingSuggestionsModel
+from src.models.editing_suggestions.model_server.suggestions_index import (
+    SuggestionsIndex,
+    build_index,
     load_from_csv,
 )
 
@@ -103,11 +108,24 @@ def test_load_reads_csv_from_model_path(suggestions_csv):
     assert all("title" in s for s in result["suggestions"])
 
 
+def test_load_opens_prebuilt_index(suggestions_csv, tmp_path):
+    index_path = str(tmp_path / "index")
+    build_index(str(suggestions_csv), index_path)
+
+    model = EditingSuggestionsModel("editing-suggestions", index_path)
+
+    assert model.index.index_path == index_path
+    result = model.predict({"wiki_id": "frwiki", "page_id": 200})
+    assert [s["suggestion_id"] for s in result["suggestions"]] == ["ghi-789"]
+
+
 @pytest.fixture
-def model(suggestions_csv):
+def model(suggestions_csv, tmp_path):
+    index_path = str(tmp_path / "index")
+    build_index(str(suggestions_csv), index_path)
     with patch.object(EditingSuggestionsModel, "load", return_value=None):
-        m = EditingSuggestionsModel("editing-suggestions", "/unused")
-        m.editing_suggestions = load_from_csv(str(suggestions_csv))
+        m = EditingSuggestionsModel("editing-suggestions", index_path)
+        m.index = SuggestionsIndex(index_path)
         m.ready = True
         return m
 
@@ -172,3 +190,150 @@ def test_preprocess_returns_inputs(model):
         "wiki_id": "enwiki",
         "page_id": 100,
     }
+
+
+def _write_suggestions(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_reload_picks_up_a_rebuilt_index(suggestions_csv, sample_rows, tmp_path):
+    index_path = str(tmp_path / "index")
+    build_index(str(suggestions_csv), index_path)
+    model = EditingSuggestionsModel("editing-suggestions", index_path)
+
+    assert model.reload_if_changed() is False
+
+    _write_suggestions(suggestions_csv, sample_rows[2:])
+    build_index(str(suggestions_csv), index_path)
+
+    assert model.reload_if_changed() is True
+    assert model.predict({"wiki_id": "enwiki", "page_id": 100}) == {"suggestions": []}
+    assert len(model.predict({"wiki_id": "frwiki", "page_id": 200})["suggestions"]) == 1
+
+
+def test_reload_of_a_csv_removes_the_previous_build(suggestions_csv, sample_rows):
+    model = EditingSuggestionsModel("editing-suggestions", str(suggestions_csv))
+    first_build_dir = model.build_dir
+
+    _write_suggestions(suggestions_csv, sample_rows[:1])
+
+    assert model.reload_if_changed() is True
+    assert model.build_dir != first_build_dir
+    assert not os.path.exists(first_build_dir)
+    assert len(model.predict({"wiki_id": "enwiki", "page_id": 100})["suggestions"]) == 1
+
+
+def test_failed_reload_keeps_the_current_index(suggestions_csv):
+    model = EditingSuggestionsModel("editing-suggestions", str(suggestions_csv))
+    suggestions_csv.write_text("page_id,wiki_id\nnot-a-number,enwiki\n")
+
+    with pytest.raises(KeyError):
+        model.reload_if_changed()
+
+    assert len(model.predict({"wiki_id": "enwiki", "page_id": 100})["suggestions"]) == 2
+
+
+def test_watcher_swaps_index_during_concurrent_reads(
+    suggestions_csv, sample_rows, tmp_path
+):
+    index_path = str(tmp_path / "index")
+    build_index(str(suggestions_csv), index_path)
+    model = EditingSuggestionsModel(
+        "editing-suggestions", index_path, reload_interval=0.01
+    )
+    old = model.predict({"wiki_id": "enwiki", "page_id": 100})
+    new_rows = [{**row, "description": "Updated"} for row in sample_rows]
+    results, errors = [], []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                results.append(model.predict({"wiki_id": "enwiki", "page_id": 100}))
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(3):
+            _write_suggestions(suggestions_csv, new_rows)
+            build_index(str(suggestions_csv), index_path)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            result = model.predict({"wiki_id": "enwiki", "page_id": 100})
+            if result != old:
+                break
+            time.sleep(0.01)
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+        model.stop_watching.set()
+
+    assert errors == []
+    assert result["suggestions"][0]["description"] == "Updated"
+    # Every read saw either the old or the new index in full.
+    new = result
+    assert all(r == old or r == new for r in results)
+
+
+def test_batch_lookup_of_pages_across_wikis(model):
+    inputs = model.preprocess(
+        {
+            "pages": [
+                {"wiki_id": "enwiki", "page_id": 100},
+                {"wiki_id": "frwiki", "page_id": "200"},
+                {"wiki_id": "enwiki", "page_id": 999},
+            ]
+        }
+    )
+
+    result = model.predict(inputs)
+
+    assert [(p["wiki_id"], p["page_id"]) for p in result["pages"]] == [
+        ("enwiki", 100),
+        ("frwiki", 200),
+        ("enwiki", 999),
+    ]
+    assert [len(p["suggestions"]) for p in result["pages"]] == [2, 1, 0]
+    single = model.predict({"wiki_id": "enwiki", "page_id": 100})
+    assert result["pages"][0]["suggestions"] == single["suggestions"]
+
+
+def test_batch_pages_default_to_top_level_wiki_id(model):
+    inputs = model.preprocess(
+        {
+            "wiki_id": "frwiki",
+            "pages": [{"page_id": 200}, {"wiki_id": "enwiki", "page_id": 100}],
+        }
+    )
+
+    assert inputs == {
+        "pages": [
+            {"wiki_id": "frwiki", "page_id": 200},
+            {"wiki_id": "enwiki", "page_id": 100},
+        ]
+    }
+
+
+@pytest.mark.parametrize(
+    "inputs",
+    [
+        {"pages": []},
+        {"pages": {"wiki_id": "enwiki", "page_id": 100}},
+        {"pages": [{"page_id": 100}]},
+        {"pages": ["enwiki:100"]},
+        {"pages": [{"wiki_id": "enwiki", "page_id": "abc"}]},
+        {"pages": [{"wiki_id": "enwiki", "page_id": 100}] * 4},
+    ],
+)
+def test_batch_preprocess_raises_for_invalid_pages(model, inputs):
+    model.max_pages = 3
+
+    with pytest.raises(InvalidInput):
+        model.preprocess(inputs)
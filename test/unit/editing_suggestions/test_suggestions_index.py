@@ -0,0 +1,134 @@
+import csv
+import os
+import random
+from unittest.mock import patch
+
+import pytest
+
+from src.models.editing_suggestions.model_server.suggestions_index import (
+    SuggestionsIndex,
+    build_index,
+    load_from_csv,
+)
+
+FIELDNAMES = ["revision_id", "page_title", "page_id", "wiki_id", "suggestion_id"]
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def random_csv(tmp_path):
+    rng = random.Random(0)
+    rows = [
+        {
+            "revision_id": str(rng.randint(1, 10**9)),
+            "page_title": f"Page_{index}_é",
+            "page_id": str(rng.randint(1, 300)),
+            "wiki_id": rng.choice(["enwiki", "frwiki", "jawiki"]),
+            "suggestion_id": f"s-{index}",
+        }
+        for index in range(2000)
+    ]
+    path = tmp_path / "suggestions.csv"
+    _write_csv(path, rows)
+    return path
+
+
+def test_index_matches_csv_lookup(random_csv, tmp_path):
+    index_path = str(tmp_path / "index")
+    build_index(str(random_csv), index_path)
+    index = SuggestionsIndex(index_path)
+    expected = load_from_csv(str(random_csv))
+
+    assert len(index) == sum(len(pages) for pages in expected.values())
+    for wiki_id, pages in expected.items():
+        for page_id in range(0, 302):
+            assert index.lookup(wiki_id, page_id) == pages.get(page_id, [])
+
+
+@pytest.mark.parametrize(
+    "wiki_id,page_id",
+    [("xxwiki", 1), ("enwiki", -1), ("enwiki", 10**30), ("enwiki", -(10**30))],
+)
+def test_lookup_of_unknown_pages_is_empty(random_csv, tmp_path, wiki_id, page_id):
+    index_path = str(tmp_path / "index")
+    build_index(str(random_csv), index_path)
+
+    assert SuggestionsIndex(index_path).lookup(wiki_id, page_id) == []
+
+
+def test_empty_csv(tmp_path):
+    csv_path = tmp_path / "suggestions.csv"
+    _write_csv(csv_path, [])
+    build_index(str(csv_path), str(tmp_path / "index"))
+
+    index = SuggestionsIndex(str(tmp_path / "index"))
+
+    assert len(index) == 0
+    assert index.lookup("enwiki", 1) == []
+
+
+def test_rebuild_replaces_the_index(random_csv, tmp_path):
+    index_path = str(tmp_path / "index")
+    build_index(str(random_csv), index_path)
+    _write_csv(
+        random_csv,
+        [{"revision_id": "1", "page_title": "A", "page_id": "1", "wiki_id": "xxwiki"}],
+    )
+
+    build_index(str(random_csv), index_path)
+
+    assert SuggestionsIndex(index_path).wikis == {"xxwiki": (0, 1)}
+    # Only the directory of the current index is left behind.
+    assert set(os.listdir(tmp_path)) == {
+        "index",
+        "suggestions.csv",
+        os.readlink(index_path),
+    }
+
+
+def test_rebuild_swaps_the_index_atomically(random_csv, tmp_path):
+    index_path = str(tmp_path / "index")
+    build_index(str(random_csv), index_path)
+    old_index = SuggestionsIndex(index_path)
+    expected = old_index.lookup("enwiki", 1)
+    replace = os.replace
+    seen = []
+
+    def check_replace(src, dst):
+        # The old index is in place until the link to the new one replaces it.
+        seen.append(len(SuggestionsIndex(dst)))
+        replace(src, dst)
+
+    with patch.object(os, "replace", check_replace):
+        build_index(str(random_csv), index_path)
+
+    assert seen == [len(old_index)]
+    assert os.path.islink(index_path)
+    # An index opened before the swap keeps working on its removed files.
+    assert old_index.lookup("enwiki", 1) == expected
+
+
+def test_rebuild_replaces_an_index_directory(random_csv, tmp_path):
+    index_path = str(tmp_path / "index")
+    build_index(str(random_csv), index_path)
+    # An index written in place, as a plain directory.
+    os.rename(os.path.realpath(index_path), index_path + ".dir")
+    os.remove(index_path)
+    os.rename(index_path + ".dir", index_path)
+
+    build_index(str(random_csv), index_path)
+
+    assert os.path.islink(index_path)
+    expected = load_from_csv(str(random_csv))
+    assert len(SuggestionsIndex(index_path)) == sum(map(len, expected.values()))
+    assert set(os.listdir(tmp_path)) == {
+        "index",
+        "suggestions.csv",
+        os.readlink(index_path),
+    }
@@ -3,6 +3,7 @@ import sys
 import types
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 from kserve.errors import InferenceError, InvalidInput
 
@@ -36,6 +37,9 @@ class _FakeTensor:
     def tolist(self):
         return self._data
 
+    def numpy(self):
+        return np.array(self._data)
+
     def __iter__(self):
         for item in self._data:
             yield item if isinstance(item, _FakeTensor) else _FakeTensor(item)
@@ -81,6 +85,7 @@ sys.modules["vllm"] = _make_mock_package("vllm")
 sys.modules["vllm.config"] = _make_mock_package("vllm.config")
 sys.modules["vllm.config.pooler"] = MagicMock()
 
+from python.embedding_utils import EmbeddingCache, decode_embedding  # noqa: E402
 from src.models.embeddings.model_server.model import EmbeddingModel  # noqa: E402
 
 
@@ -114,16 +119,32 @@ def model():
 class TestPreprocess:
     def test_list_input_unchanged(self, model):
         result = model.preprocess({"input": ["a", "b"]}, None)
-        assert result == ["a", "b"]
+        assert result == {
+            "input": ["a", "b"],
+            "encoding_format": "float",
+            "truncate_dim": None,
+        }
 
     def test_string_input_wrapped_in_list(self, model):
         result = model.preprocess({"input": "single"}, None)
-        assert result == ["single"]
+        assert result == {
+            "input": ["single"],
+            "encoding_format": "float",
+            "truncate_dim": None,
+        }
 
     def test_missing_input_raises_invalid_input(self, model):
         with pytest.raises(InvalidInput):
             model.preprocess({}, None)
 
+    def test_encoding_format_passed_through(self, model):
+        result = model.preprocess({"input": ["a"], "encoding_format": "base64"}, None)
+        assert result["encoding_format"] == "base64"
+
+    def test_unknown_encoding_format_raises_invalid_input(self, model):
+        with pytest.raises(InvalidInput):
+            model.preprocess({"input": ["a"], "encoding_format": "int8"}, None)
+
 
 class TestLoad:
     def _make_model(self, **overrides):
@@ -197,13 +218,14 @@ class TestPredict:
         output.outputs.data = _FakeTensor(data)
         return output
 
-    def test_embed_path_returns_openai_format_and_normalizes(self, model):
+    @pytest.mark.asyncio
+    async def test_embed_path_returns_openai_format_and_normalizes(self, model):
         model.model.embed.return_value = [
             self._embed_output([3.0, 4.0]),
             self._embed_output([0.0, 5.0]),
         ]
 
-        result = model.predict(["text1", "text2"])
+        result = await model.predict({"input": ["text1", "text2"]})
 
         model.model.embed.assert_called_once_with(["text1", "text2"])
         assert result["object"] == "list"
@@ -219,23 +241,26 @@ class TestPredict:
         assert second["index"] == 1
         assert second["embedding"] == pytest.approx([0.0, 1.0])
 
-    def test_model_version_used_when_set(self, model):
+    @pytest.mark.asyncio
+    async def test_model_version_used_when_set(self, model):
         model.model_version = "v1.2.3"
         model.model.embed.return_value = [self._embed_output([1.0, 0.0])]
 
-        result = model.predict(["text"])
+        result = await model.predict({"input": ["text"]})
 
         assert result["model"] == "v1.2.3"
 
-    def test_model_falls_back_to_name_when_version_empty(self, model):
+    @pytest.mark.asyncio
+    async def test_model_falls_back_to_name_when_version_empty(self, model):
         model.model_version = ""
         model.model.embed.return_value = [self._embed_output([1.0, 0.0])]
 
-        result = model.predict(["text"])
+        result = await model.predict({"input": ["text"]})
 
         assert result["model"] == "qwen3-embedding"
 
-    def test_pooling_path_uses_encode(self, model):
+    @pytest.mark.asyncio
+    async def test_pooling_path_uses_encode(self, model):
         model.vllm_runner = "pooling"
         model.model.encode.return_value = [
             self._encode_output([3.0, 4.0]),
@@ -243,7 +268,7 @@ class TestPredict:
         # Ensure hasattr(self.model, "encode") is True (MagicMock has it).
         model.model.embed = MagicMock()
 
-        result = model.predict(["text"])
+        result = await model.predict({"input": ["text"]})
 
         model.model.encode.assert_called_once_with(["text"], pooling_task="embed")
         model.model.embed.assert_not_called()
@@ -252,8 +277,47 @@ class TestPredict:
         assert result["data"][0]["index"] == 0
         assert result["data"][0]["embedding"] == pytest.approx([0.6, 0.8])
 
-    def test_inference_exception_raises_inference_error(self, model):
+    @pytest.mark.asyncio
+    async def test_inference_exception_raises_inference_error(self, model):
         model.model.embed.side_effect = RuntimeError("gpu failed")
 
         with pytest.raises(InferenceError):
-            model.predict(["text"])
+            await model.predict({"input": ["text"]})
+
+    @pytest.mark.parametrize(
+        "encoding_format,precision", [("base64", 1e-7), ("base64_float16", 1e-3)]
+    )
+    @pytest.mark.asyncio
+    async def test_base64_encoding_matches_float(
+        self, model, encoding_format, precision
+    ):
+        model.model.embed.return_value = [
+            self._embed_output([3.0, 4.0]),
+            self._embed_output([0.0, 5.0]),
+        ]
+
+        result = await model.predict(
+            {"input": ["text1", "text2"], "encoding_format": encoding_format}
+        )
+
+        embeddings = [
+            decode_embedding(item["embedding"], encoding_format)
+            for item in result["data"]
+        ]
+        assert all(isinstance(item["embedding"], str) for item in result["data"])
+        assert embeddings[0].tolist() == pytest.approx([0.6, 0.8], abs=precision)
+        assert embeddings[1].tolist() == pytest.approx([0.0, 1.0], abs=precision)
+
+    @pytest.mark.asyncio
+    async def test_cached_inputs_skip_the_engine(self, model):
+        model.cache = EmbeddingCache("qwen3-embedding", max_bytes=1024)
+        model.model.embed.side_effect = lambda inputs: [
+            self._embed_output([3.0, 4.0]) for _ in inputs
+        ]
+
+        await model.predict({"input": ["text1"]})
+        result = await model.predict({"input": ["text1", "text2"], "truncate_dim": 1})
+
+        assert model.model.embed.call_args_list[0].args == (["text1"],)
+        assert model.model.embed.call_args_list[1].args == (["text2"],)
+        assert result["data"][0]["embedding"] == pytest.approx([1.0])
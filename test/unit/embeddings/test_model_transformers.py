@@ -1,21 +1,12 @@
+import asyncio
 import sys
 import types
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 from kserve.errors import InferenceError, InvalidInput
 
-
-class _FakeRow:
-    """Minimal row stub so embedding.tolist() works without numpy."""
-
-    def __init__(self, data):
-        self._data = data
-
-    def tolist(self):
-        return self._data
-
-
 # Mock GPU-only deps before importing the model.
 _torch = types.ModuleType("torch")
 _torch.cuda = MagicMock()
@@ -29,6 +20,7 @@ _st = types.ModuleType("sentence_transformers")
 _st.SentenceTransformer = MagicMock()
 sys.modules["sentence_transformers"] = _st
 
+from python.embedding_utils import decode_embedding  # noqa: E402
 from src.models.embeddings.model_server.model_transformers import (  # noqa: E402
     EmbeddingModel,
 )
@@ -59,11 +51,21 @@ def model():
 class TestPreprocess:
     def test_list_input_unchanged(self, model):
         result = model.preprocess({"input": ["a", "b"]}, None)
-        assert result == {"sentences": ["a", "b"], "prompt_name": "query"}
+        assert result == {
+            "sentences": ["a", "b"],
+            "prompt_name": "query",
+            "encoding_format": "float",
+            "truncate_dim": None,
+        }
 
     def test_string_input_wrapped_in_list(self, model):
         result = model.preprocess({"input": "single"}, None)
-        assert result == {"sentences": ["single"], "prompt_name": "query"}
+        assert result == {
+            "sentences": ["single"],
+            "prompt_name": "query",
+            "encoding_format": "float",
+            "truncate_dim": None,
+        }
 
     def test_missing_input_raises_invalid_input(self, model):
         with pytest.raises(InvalidInput):
@@ -73,17 +75,34 @@ class TestPreprocess:
         result = model.preprocess(
             {"input": ["doc text"], "prompt_name": "document"}, None
         )
-        assert result == {"sentences": ["doc text"], "prompt_name": "document"}
+        assert result["sentences"] == ["doc text"]
+        assert result["prompt_name"] == "document"
 
     def test_empty_prompt_name_becomes_none(self, model):
         result = model.preprocess({"input": ["x"], "prompt_name": ""}, None)
-        assert result == {"sentences": ["x"], "prompt_name": None}
+        assert result["sentences"] == ["x"]
+        assert result["prompt_name"] is None
 
     def test_default_prompt_name_from_constructor(self):
         m = EmbeddingModel(**_default_kwargs(default_prompt_name="document"))
         result = m.preprocess({"input": ["x"]}, None)
         assert result["prompt_name"] == "document"
 
+    def test_truncate_dim_defaults_to_constructor(self):
+        m = EmbeddingModel(**_default_kwargs(truncate_dim=256))
+        assert m.preprocess({"input": ["x"]}, None)["truncate_dim"] == 256
+        result = m.preprocess({"input": ["x"], "truncate_dim": 64}, None)
+        assert result["truncate_dim"] == 64
+
+    @pytest.mark.parametrize("truncate_dim", [0, -1, "64", 1.5, True])
+    def test_invalid_truncate_dim_raises_invalid_input(self, model, truncate_dim):
+        with pytest.raises(InvalidInput):
+            model.preprocess({"input": ["x"], "truncate_dim": truncate_dim}, None)
+
+    def test_unknown_encoding_format_raises_invalid_input(self, model):
+        with pytest.raises(InvalidInput):
+            model.preprocess({"input": ["x"], "encoding_format": "binary"}, None)
+
 
 class TestLoad:
     def _make_model(self, **overrides):
@@ -105,11 +124,12 @@ class TestLoad:
             assert kwargs["trust_remote_code"] is True
             assert kwargs["model_kwargs"] == {"dtype": "bfloat16"}
             assert kwargs["config_kwargs"] == {"_attn_implementation": "eager"}
-            assert kwargs["truncate_dim"] is None
+            # Truncation happens after the embedding cache, not in the model.
+            assert "truncate_dim" not in kwargs
             mock_instance.eval.assert_called_once()
             assert m.ready is True
 
-    def test_attn_and_truncate_dim_passed_through(self):
+    def test_attn_passed_through(self):
         with patch(
             "src.models.embeddings.model_server.model_transformers.SentenceTransformer"
         ) as mock_st:
@@ -123,7 +143,7 @@ class TestLoad:
             assert kwargs["config_kwargs"] == {
                 "_attn_implementation": "flash_attention_2"
             }
-            assert kwargs["truncate_dim"] == 512
+            assert "truncate_dim" not in kwargs
 
     def test_sentence_transformer_failure_raises_inference_error(self):
         with patch(
@@ -137,13 +157,11 @@ class TestLoad:
 
 
 class TestPredict:
-    def test_returns_openai_format(self, model):
-        model.model.encode.return_value = [
-            _FakeRow([0.6, 0.8]),
-            _FakeRow([0.0, 1.0]),
-        ]
+    @pytest.mark.asyncio
+    async def test_returns_openai_format(self, model):
+        model.model.encode.return_value = np.array([[0.6, 0.8], [0.0, 1.0]])
 
-        result = model.predict(
+        result = await model.predict(
             {"sentences": ["text1", "text2"], "prompt_name": "query"}
         )
 
@@ -152,6 +170,7 @@ class TestPredict:
             prompt_name="query",
             normalize_embeddings=True,
             convert_to_numpy=True,
+            batch_size=2,
         )
         assert result["object"] == "list"
         assert result["model"] == "jina-embedding"
@@ -160,30 +179,180 @@ class TestPredict:
         first = result["data"][0]
         assert first["object"] == "embedding"
         assert first["index"] == 0
-        assert first["embedding"] == [0.6, 0.8]
+        assert first["embedding"] == pytest.approx([0.6, 0.8])
 
         second = result["data"][1]
         assert second["index"] == 1
-        assert second["embedding"] == [0.0, 1.0]
+        assert second["embedding"] == pytest.approx([0.0, 1.0])
 
-    def test_model_version_used_when_set(self, model):
+    @pytest.mark.asyncio
+    async def test_model_version_used_when_set(self, model):
         model.model_version = "v1.2.3"
-        model.model.encode.return_value = [_FakeRow([1.0, 0.0])]
+        model.model.encode.return_value = np.array([[1.0, 0.0]])
 
-        result = model.predict({"sentences": ["text"], "prompt_name": "query"})
+        result = await model.predict({"sentences": ["text"], "prompt_name": "query"})
 
         assert result["model"] == "v1.2.3"
 
-    def test_model_falls_back_to_name_when_version_empty(self, model):
+    @pytest.mark.asyncio
+    async def test_model_falls_back_to_name_when_version_empty(self, model):
         model.model_version = ""
-        model.model.encode.return_value = [_FakeRow([1.0, 0.0])]
+        model.model.encode.return_value = np.array([[1.0, 0.0]])
 
-        result = model.predict({"sentences": ["text"], "prompt_name": "document"})
+        result = await model.predict({"sentences": ["text"], "prompt_name": "document"})
 
         assert result["model"] == "jina-embedding"
 
-    def test_inference_exception_raises_inference_error(self, model):
+    @pytest.mark.asyncio
+    async def test_inference_exception_raises_inference_error(self, model):
         model.model.encode.side_effect = RuntimeError("gpu failed")
 
         with pytest.raises(InferenceError):
-            model.predict({"sentences": ["text"], "prompt_name": "query"})
+            await model.predict({"sentences": ["text"], "prompt_name": "query"})
+
+    @pytest.mark.asyncio
+    async def test_base64_returns_little_endian_float32(self, model):
+        vectors = np.array([[0.6, 0.8], [0.0, 1.0]], dtype=np.float32)
+        model.model.encode.return_value = vectors
+
+        result = await model.predict(
+            {
+                "sentences": ["text1", "text2"],
+                "prompt_name": "query",
+                "encoding_format": "base64",
+            }
+        )
+
+        for idx, item in enumerate(result["data"]):
+            assert isinstance(item["embedding"], str)
+            assert decode_embedding(item["embedding"]).tolist() == vectors[idx].tolist()
+
+    @pytest.mark.asyncio
+    async def test_base64_float16_halves_payload(self, model):
+        vectors = np.random.default_rng(0).random((4, 1024), dtype=np.float32)
+        model.model.encode.return_value = vectors
+
+        request = {"sentences": ["a", "b", "c", "d"], "prompt_name": "query"}
+        as_float32 = await model.predict({**request, "encoding_format": "base64"})
+        as_float16 = await model.predict(
+            {**request, "encoding_format": "base64_float16"}
+        )
+
+        for item32, item16 in zip(as_float32["data"], as_float16["data"]):
+            assert len(item16["embedding"]) < len(item32["embedding"]) * 0.51
+            np.testing.assert_allclose(
+                decode_embedding(item16["embedding"], "base64_float16"),
+                decode_embedding(item32["embedding"]),
+                atol=1e-3,
+            )
+
+
+class TestEmbeddingCache:
+    @pytest.fixture
+    def cached_model(self):
+        m = EmbeddingModel(**_default_kwargs(cache_max_bytes=1024**2))
+        m.model = MagicMock()
+        m.encoded = []
+        rng = np.random.default_rng(0)
+
+        def _encode(sentences, prompt_name, **kwargs):
+            # Counting stub: deterministic unit vectors per call.
+            m.encoded.extend(sentences)
+            vectors = rng.random((len(sentences), 8))
+            return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        m.model.encode.side_effect = _encode
+        m.ready = True
+        return m
+
+    def _request(self, sentences, **overrides):
+        return {"sentences": sentences, "prompt_name": "query", **overrides}
+
+    @pytest.mark.asyncio
+    async def test_repeated_texts_are_encoded_once(self, cached_model):
+        first = await cached_model.predict(self._request(["a", "b", "a"]))
+        second = await cached_model.predict(self._request(["b", " a "]))
+
+        assert cached_model.encoded == ["a", "b"]
+        assert first["data"][0]["embedding"] == first["data"][2]["embedding"]
+        assert second["data"][0]["embedding"] == first["data"][1]["embedding"]
+        assert second["data"][1]["embedding"] == first["data"][0]["embedding"]
+        assert cached_model.cache.cache.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_prompt_name_is_part_of_the_key(self, cached_model):
+        await cached_model.predict(self._request(["a"]))
+        await cached_model.predict(self._request(["a"], prompt_name="document"))
+
+        assert cached_model.encoded == ["a", "a"]
+
+    @pytest.mark.asyncio
+    async def test_truncate_dim_served_from_full_vector(self, cached_model):
+        full = await cached_model.predict(self._request(["a"]))
+        truncated = await cached_model.predict(self._request(["a"], truncate_dim=4))
+
+        assert cached_model.encoded == ["a"]
+        full_vector = np.array(full["data"][0]["embedding"])
+        expected = full_vector[:4] / np.linalg.norm(full_vector[:4])
+        assert len(truncated["data"][0]["embedding"]) == 4
+        assert truncated["data"][0]["embedding"] == pytest.approx(expected.tolist())
+
+    @pytest.mark.asyncio
+    async def test_cache_memory_is_bounded(self, cached_model):
+        cached_model.cache.cache.max_bytes = 3 * 8 * 4  # three float32 vectors
+        await cached_model.predict(self._request(["a", "b", "c", "d"]))
+
+        stats = cached_model.cache.cache.stats()
+        assert stats["entries"] == 3
+        assert stats["size_bytes"] == 3 * 8 * 4
+        await cached_model.predict(self._request(["a"]))
+        assert cached_model.encoded == ["a", "b", "c", "d", "a"]
+
+
+class TestBatching:
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_batched(self):
+        m = EmbeddingModel(**_default_kwargs(batch_wait_ms=50))
+        m.model = MagicMock()
+        m.model.encode.side_effect = lambda sentences, prompt_name, **kwargs: (
+            np.array([[float(len(s)), 1.0] for s in sentences])
+        )
+        m.ready = True
+        requests = [
+            {"sentences": [f"text {'x' * i}"], "prompt_name": "query"}
+            for i in range(20)
+        ]
+
+        results = await asyncio.gather(*(m.predict(r) for r in requests))
+
+        # One forward pass for the whole load instead of one per request.
+        assert m.model.encode.call_count == 1
+        for request, result in zip(requests, results):
+            # Every request gets back the row computed for its own text.
+            length = len(request["sentences"][0])
+            assert result["data"][0]["embedding"] == [length, 1.0]
+
+    @pytest.mark.asyncio
+    async def test_token_budget_splits_batches(self):
+        m = EmbeddingModel(**_default_kwargs(batch_wait_ms=50, batch_max_tokens=10))
+        m.model = MagicMock()
+        m.model.encode.side_effect = lambda sentences, prompt_name, **kwargs: (
+            np.ones((len(sentences), 2))
+        )
+        m.ready = True
+
+        await asyncio.gather(
+            m.predict({"sentences": ["a" * 24], "prompt_name": "query"}),
+            m.predict({"sentences": ["b" * 24], "prompt_name": "query"}),
+            m.predict({"sentences": ["c" * 24], "prompt_name": "document"}),
+        )
+
+        batches = [
+            (call.kwargs["prompt_name"], call.kwargs["sentences"])
+            for call in m.model.encode.call_args_list
+        ]
+        assert sorted(batches) == [
+            ("document", ["c" * 24]),
+            ("query", ["a" * 24]),
+            ("query", ["b" * 24]),
+        ]
@@ -0,0 +1,163 @@
+import random
+import re
+import sys
+import types
+
+import numpy as np
+import pytest
+from kserve.errors import InvalidInput
+
+ENGLISH = {"the", "of", "and", "it", "was", "is", "they", "are", "with", "his"}
+
+
+class _FakeFastText:
+    """
+    Stand-in for fasttext's _FastText: texts containing an English function
+    word are English, everything else is French. Like fasttext, predict takes
+    either a single text or a list of texts and records every call.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.calls = []
+
+    def _predict_one(self, text):
+        english = len(ENGLISH & set(text.split()))
+        if english:
+            return ("__label__eng_Latn",), np.array([0.5 + 0.1 * english])
+        return ("__label__fra_Latn",), np.array([0.9])
+
+    def predict(self, text, k=1):
+        self.calls.append(text)
+        if isinstance(text, str):
+            return self._predict_one(text)
+        labels, scores = zip(*map(self._predict_one, text))
+        return list(labels), [score.astype(np.float32) for score in scores]
+
+
+# Mock fasttext before importing the model.
+_fasttext = types.ModuleType("fasttext")
+_fasttext.FastText = types.ModuleType("fasttext.FastText")
+_fasttext.FastText._FastText = _FakeFastText
+sys.modules["fasttext"] = _fasttext
+sys.modules["fasttext.FastText"] = _fasttext.FastText
+
+from src.models.langid.model import LanguageIdentificationModel  # noqa: E402
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setenv("MAX_INSTANCES", "3")
+    monkeypatch.setenv("MAX_INPUT_LENGTH", "2000000")
+    return LanguageIdentificationModel("langid")
+
+
+def _predict(model, payload):
+    return model.predict(model.preprocess(payload))
+
+
+def test_single_text(model):
+    response = _predict(model, {"text": "the cat is on the table with his hat"})
+
+    assert response["language"] == "eng_Latn"
+    assert response["wikicode"] == "en"
+    assert response["languagename"] == "English"
+    assert isinstance(response["score"], float)
+
+
+def test_batch_matches_single_text_predictions(model):
+    texts = ["the of and it was", "le chat est dans la maison", "they are with his"]
+
+    response = _predict(model, {"instances": [{"text": text} for text in texts]})
+
+    assert response["predictions"] == [_predict(model, {"text": t}) for t in texts]
+    assert [p["wikicode"] for p in response["predictions"]] == ["en", "fr", "en"]
+
+
+def test_batch_uses_a_single_model_call(model):
+    _predict(model, {"instances": [{"text": "the of"}, {"text": "le la"}]})
+
+    assert model.model.calls == [["the of", "le la"]]
+
+
+def test_invalid_instances_do_not_fail_the_batch(model):
+    payload = {"instances": [{"text": "le la les"}, {"text": 42}, "not an object"]}
+
+    predictions = _predict(model, payload)["predictions"]
+
+    assert predictions[0]["wikicode"] == "fr"
+    assert set(predictions[1]) == {"error"}
+    assert set(predictions[2]) == {"error"}
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"text": 42},
+        {"instances": []},
+        {"instances": {"text": "the"}},
+        {"instances": [{"text": "the"}] * 4},
+    ],
+)
+def test_invalid_request_raises(model, payload):
+    with pytest.raises(InvalidInput):
+        model.preprocess(payload)
+
+
+def _normalize_full_text(text, max_text_length):
+    # Previous implementation: clean up the whole text, then truncate.
+    return re.sub(r"[\n\r\v\t ]+", " ", text).strip()[:max_text_length]
+
+
+def test_normalize_text_matches_full_text_cleanup(model):
+    rng = random.Random(0)
+    alphabet = ["a", "b", "é", " ", "  ", "\n", "\r\n", "\t", "\v", " \t \n "]
+    texts = ["", " ", "\n\t", "word", " padded text ", "a" * 500]
+    texts += [" " * 1000 + "late start", "x" * 99 + " " * 50 + "y"]
+    for _ in range(500):
+        texts.append("".join(rng.choices(alphabet, k=rng.randint(0, 400))))
+
+    for text in texts:
+        assert model.normalize_text(text) == _normalize_full_text(
+            text, model.max_text_length
+        )
+
+
+def test_normalize_text_only_cleans_up_a_prefix(model, monkeypatch):
+    text = "the quick\tbrown fox\n" * 50_000  # ~1MB
+    expected = _normalize_full_text(text, model.max_text_length)
+    cleaned_lengths = []
+    sub = re.sub
+
+    def recording_sub(pattern, repl, string, *args, **kwargs):
+        cleaned_lengths.append(len(string))
+        return sub(pattern, repl, string, *args, **kwargs)
+
+    monkeypatch.setattr("src.models.langid.model.re.sub", recording_sub)
+
+    assert model.normalize_text(text) == expected
+    assert sum(cleaned_lengths) <= 4 * model.max_text_length
+
+
+def test_long_text_is_identified(model):
+    response = _predict(model, {"text": "the cat\n\n" + "x" * 1_000_000})
+
+    assert response["wikicode"] == "en"
+
+
+def test_text_over_the_input_cap_is_rejected(model):
+    with pytest.raises(InvalidInput, match="too long"):
+        model.preprocess({"text": "a" * (model.max_input_length + 1)})
+
+
+def test_batch_over_the_total_input_cap_is_rejected(model):
+    # Each text is under the per-text cap, together they are over the total one.
+    text = "a" * (model.max_total_input_length // 2 + 1)
+
+    assert len(text) <= model.max_input_length
+    with pytest.raises(InvalidInput, match="in total"):
+        model.preprocess({"instances": [{"text": text}, {"text": text}]})
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,415 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+from kserve.errors import InvalidInput
+
+# Mock the heavy model deps before importing the model servers.
+_torch = types.ModuleType("torch")
+_torch.cuda = MagicMock()
+_torch.cuda.is_available.return_value = False
+_torch.device = MagicMock()
+sys.modules["torch"] = _torch
+for _module in ("transformers", "ctranslate2", "sentencepiece", "pyopencl"):
+    sys.modules[_module] = MagicMock()
+# src/models/llm/__init__.py imports its submodules relative to the llm
+# directory, which is the script directory of the model server.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../../src/models/llm"))
+
+from src.models.llm.nllb.nllb import NLLB  # noqa: E402
+from src.models.llm.nllb.nllb_cpu import NLLBCTranslate  # noqa: E402
+from src.models.llm.nllb.translation_memory import (  # noqa: E402
+    TranslationMemory,
+    join_sentences,
+    split_sentences,
+)
+
+LANG_CODES = ["eng_Latn", "fra_Latn", "deu_Latn", "spa_Latn"]
+
+
+def _translate(sentence, src_lang, tgt_lang):
+    return f"[{src_lang}>{tgt_lang}] {sentence}"
+
+
+class _StubTranslator:
+    """ctranslate2.Translator stand-in that records every batch it translates."""
+
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.batches = []
+        self.delay = delay
+
+    def translate_iterable(self, tokenized_sentences, target_prefix, **kwargs):
+        self.calls.append(len(tokenized_sentences))
+        targets = {prefix[0] for prefix in target_prefix}
+        self.batches.append((len(tokenized_sentences), targets, kwargs["beam_size"]))
+        time.sleep(self.delay)
+        for tokens, prefix in zip(tokenized_sentences, target_prefix):
+            # Tokens end with "</s>" and the source language code.
+            assert tokens[-2] == "</s>"
+            translation = _translate(" ".join(tokens[:-2]), tokens[-1], prefix[0])
+            yield types.SimpleNamespace(hypotheses=[prefix + translation.split()])
+
+
+class _StubSentencePiece:
+    def encode(self, sentence, out_type=str):
+        return sentence.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class _StubTensor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def size(self):
+        return (len(self.rows), max(len(row) for row in self.rows))
+
+
+class _StubTokenizer:
+    """
+    Word-level stand-in for NllbTokenizerFast. Language codes and </s> are
+    special tokens, and the src_lang setter counts as a state change.
+    """
+
+    unk_token_id = 0
+    eos_token_id = 1
+    legacy_behaviour = False
+
+    def __init__(self):
+        self.vocab = {"<unk>": 0, "</s>": 1}
+        self.vocab.update({code: 2 + i for i, code in enumerate(LANG_CODES)})
+        self.src_lang_changes = 0
+
+    @property
+    def src_lang(self):
+        return None
+
+    @src_lang.setter
+    def src_lang(self, value):
+        self.src_lang_changes += 1
+
+    def convert_tokens_to_ids(self, token):
+        return self.vocab.get(token, self.unk_token_id)
+
+    def __call__(self, sentences, add_special_tokens=True):
+        assert add_special_tokens is False
+        return {
+            "input_ids": [
+                [self.vocab.setdefault(word, len(self.vocab)) for word in s.split()]
+                for s in sentences
+            ]
+        }
+
+    def pad(self, encoded, return_tensors=None):
+        batch = {"input_ids": _StubTensor(encoded["input_ids"])}
+        return types.SimpleNamespace(to=lambda device: batch)
+
+    def decode(self, ids):
+        words = {token_id: word for word, token_id in self.vocab.items()}
+        return " ".join(words[token_id] for token_id in ids)
+
+    def batch_decode(self, outputs, skip_special_tokens=False):
+        return outputs
+
+
+class _StubSeq2Seq:
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.calls = []
+
+    def generate(self, input_ids, forced_bos_token_id, max_length):
+        self.calls.append(len(input_ids.rows))
+        outputs = []
+        for row in input_ids.rows:
+            # Non-legacy NLLB inputs are: src_lang code, tokens, </s>.
+            assert row[-1] == self.tokenizer.eos_token_id
+            src_lang, sentence = self.tokenizer.decode(row[:1]), row[1:-1]
+            tgt_lang = self.tokenizer.decode([forced_bos_token_id])
+            outputs.append(
+                _translate(self.tokenizer.decode(sentence), src_lang, tgt_lang)
+            )
+        return outputs
+
+
+@pytest.fixture
+def translation_memory_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("CT2_INTER_THREADS", "1")
+    monkeypatch.setenv("TRANSLATION_MEMORY_SIZE", "100")
+
+
+@pytest.fixture
+def ct2_model(translation_memory_env):
+    model = NLLBCTranslate("nllb-200")
+    model.model = _StubTranslator()
+    model.tokenizer = _StubSentencePiece()
+    return model
+
+
+@pytest.fixture
+def nllb_model(translation_memory_env):
+    tokenizer = _StubTokenizer()
+    with patch.object(NLLB, "load", return_value=(_StubSeq2Seq(tokenizer), tokenizer)):
+        return NLLB("nllb-200")
+
+
+async def _ct2_translate(model, payload):
+    return await model.predict(await model.preprocess(payload))
+
+
+def test_split_and_join_sentences():
+    text = "Early life. Born in Paris!\n\nCareer\n"
+    lines = split_sentences(text)
+
+    assert lines == [["Early life.", "Born in Paris!"], [], ["Career"]]
+    assert join_sentences(lines, ["A.", "B!", "C"]) == "A. B!\n\nC"
+
+
+@pytest.mark.parametrize("tgt_lang", ["zho_Hans", "zho_Hant", "yue_Hant", "jpn_Jpan"])
+def test_join_sentences_without_spaces_in_cjk_targets(tgt_lang):
+    lines = split_sentences("Early life. Born in Paris!\n\nCareer\n")
+
+    assert (
+        join_sentences(lines, ["早年。", "生于巴黎！", "生涯"], tgt_lang)
+        == "早年。生于巴黎！\n\n生涯"
+    )
+    assert join_sentences(lines, ["A.", "B!", "C"], "kor_Hang") == "A. B!\n\nC"
+
+
+def test_translation_memory_translates_each_unique_sentence_once():
+    memory = TranslationMemory("nllb-200", max_entries=10)
+    calls = []
+
+    def translate(sentences):
+        calls.append(list(sentences))
+        return [s.upper() for s in sentences]
+
+    first = memory.translate(["a", "b", "a", ""], "eng", "fra", translate)
+    second = memory.translate(["b", "c"], "eng", "fra", translate)
+    other_language = memory.translate(["a"], "eng", "deu", translate)
+
+    assert first == ["A", "B", "A", ""]
+    assert second == ["B", "C"]
+    assert other_language == ["A"]
+    assert calls == [["a", "b"], ["c"], ["a"]]
+    assert memory.cache.hits == 1
+
+
+def test_translation_memory_options_are_part_of_the_key():
+    memory = TranslationMemory("nllb-200", max_entries=10)
+    translate = MagicMock(side_effect=lambda sentences: sentences)
+
+    memory.translate(["a"], "eng", "fra", translate, options=(1,))
+    memory.translate(["a"], "eng", "fra", translate, options=(4,))
+
+    assert translate.call_count == 2
+
+
+def test_translation_memory_disk_tier_survives_restarts(tmp_path):
+    path = str(tmp_path / "memory.sqlite")
+    translate = MagicMock(side_effect=lambda sentences: [s[::-1] for s in sentences])
+    TranslationMemory("nllb-200", 10, disk_path=path).translate(
+        ["abc", "de"], "eng", "fra", translate
+    )
+
+    memory = TranslationMemory("nllb-200", 10, disk_path=path)
+    result = memory.translate(["de", "abc", "fg"], "eng", "fra", translate)
+
+    assert result == ["ed", "cba", "gf"]
+    assert translate.call_args_list[-1].args == (["fg"],)
+    assert memory.disk.hits == 2
+    # Disk hits are promoted to the in-memory tier.
+    assert memory.translate(["abc"], "eng", "fra", translate) == ["cba"]
+    assert memory.cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_translation_memory_disk_tier_runs_off_the_event_loop(tmp_path):
+    memory = TranslationMemory("nllb-200", 10, disk_path=str(tmp_path / "m.sqlite"))
+    loop_thread = threading.get_ident()
+    disk_threads = set()
+    get_many, put_many = memory.disk.get_many, memory.disk.put_many
+
+    def record(func):
+        def wrapper(*args):
+            disk_threads.add(threading.get_ident())
+            return func(*args)
+
+        return wrapper
+
+    memory.disk.get_many, memory.disk.put_many = record(get_many), record(put_many)
+
+    async def translate(sentences):
+        return [s.upper() for s in sentences]
+
+    assert await memory.atranslate(["a", "b"], "eng", "fra", translate) == ["A", "B"]
+    assert disk_threads and loop_thread not in disk_threads
+
+
+@pytest.mark.asyncio
+async def test_ct2_partial_hits_only_translate_new_sentences(ct2_model):
+    payload = {"prompt": "Early life. Career.", "tgt_lang": "fra_Latn"}
+    first = await _ct2_translate(ct2_model, payload)
+    payload["prompt"] = "Early life. Death.\nCareer."
+    second = await _ct2_translate(ct2_model, payload)
+
+    assert first["response"] == (
+        "[eng_Latn>fra_Latn] Early life. [eng_Latn>fra_Latn] Career."
+    )
+    assert second["response"] == (
+        "[eng_Latn>fra_Latn] Early life. [eng_Latn>fra_Latn] Death.\n"
+        "[eng_Latn>fra_Latn] Career."
+    )
+    assert ct2_model.model.calls == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_ct2_cache_is_keyed_by_number_of_beams(ct2_model):
+    payload = {"prompt": "History", "tgt_lang": "fra_Latn"}
+    await _ct2_translate(ct2_model, payload)
+    await _ct2_translate(ct2_model, {**payload, "num_beams": 4})
+    await _ct2_translate(ct2_model, payload)
+
+    assert ct2_model.model.calls == [1, 1]
+
+
+def test_transformers_nllb_uses_the_translation_memory(nllb_model):
+    payload = {"prompt": "See also. References.", "tgt_lang": "deu_Latn"}
+    first = nllb_model.predict(nllb_model.preprocess(payload))
+    payload["prompt"] = "References. External links."
+    second = nllb_model.predict(nllb_model.preprocess(payload))
+
+    assert first["response"] == (
+        "[eng_Latn>deu_Latn] See also. [eng_Latn>deu_Latn] References."
+    )
+    assert second["response"] == (
+        "[eng_Latn>deu_Latn] References. [eng_Latn>deu_Latn] External links."
+    )
+    assert nllb_model.model.calls == [2, 1]
+
+
+def test_transformers_nllb_interleaved_languages_use_one_tokenizer(nllb_model):
+    with patch.object(NLLB, "load_tokenizer") as load_tokenizer:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            requests = [
+                {
+                    "prompt": f"Sentence {i}.",
+                    "src_lang": LANG_CODES[i % 3],
+                    "tgt_lang": LANG_CODES[3],
+                }
+                for i in range(60)
+            ]
+            responses = list(
+                executor.map(
+                    lambda payload: nllb_model.predict(nllb_model.preprocess(payload)),
+                    requests,
+                )
+            )
+
+    for payload, response in zip(requests, responses):
+        expected = f"[{payload['src_lang']}>spa_Latn] {payload['prompt']}"
+        assert response["response"] == expected
+    load_tokenizer.assert_not_called()
+    assert nllb_model.tokenizer.src_lang_changes == 0
+
+
+def test_transformers_nllb_legacy_tokenization(nllb_model):
+    nllb_model.tokenizer.legacy_behaviour = True
+
+    inputs = nllb_model.tokenize(["a b"], "fra_Latn")
+
+    fra_latn = nllb_model.tokenizer.convert_tokens_to_ids("fra_Latn")
+    (row,) = inputs["input_ids"].rows
+    assert row[-2:] == [nllb_model.tokenizer.eos_token_id, fra_latn]
+
+
+@pytest.mark.parametrize("lang", ["xxx_Latn", 42])
+def test_transformers_nllb_rejects_unknown_languages(nllb_model, lang):
+    with pytest.raises(InvalidInput):
+        nllb_model.preprocess({"prompt": "a", "src_lang": lang, "tgt_lang": "fra_Latn"})
+    with pytest.raises(InvalidInput):
+        nllb_model.preprocess({"prompt": "a", "tgt_lang": lang})
+
+
+@pytest.mark.asyncio
+async def test_ct2_concurrent_requests_keep_their_source_language(ct2_model):
+    payloads = [
+        {"prompt": f"Sentence {i}.", "src_lang": LANG_CODES[i % 3], "tgt_lang": "x"}
+        for i in range(30)
+    ]
+
+    responses = await asyncio.gather(
+        *(_ct2_translate(ct2_model, payload) for payload in payloads)
+    )
+
+    for payload, response in zip(payloads, responses):
+        expected = f"[{payload['src_lang']}>x] {payload['prompt']}"
+        assert response["response"] == expected
+    assert ct2_model.default_src_lang == "eng_Latn"
+
+
+@pytest.mark.asyncio
+async def test_ct2_concurrent_requests_share_batches_per_target_language(ct2_model):
+    ct2_model.batcher.max_wait = 0.05
+    payloads = [
+        {
+            "prompt": f"Heading {i}. Text {i}.",
+            "tgt_lang": ["fra_Latn", "deu_Latn"][i % 2],
+        }
+        for i in range(10)
+    ]
+    payloads.append({"prompt": "Beams.", "tgt_lang": "fra_Latn", "num_beams": 4})
+
+    responses = await asyncio.gather(
+        *(_ct2_translate(ct2_model, payload) for payload in payloads)
+    )
+
+    assert responses[0]["response"] == (
+        "[eng_Latn>fra_Latn] Heading 0. [eng_Latn>fra_Latn] Text 0."
+    )
+    assert responses[1]["response"] == (
+        "[eng_Latn>deu_Latn] Heading 1. [eng_Latn>deu_Latn] Text 1."
+    )
+    assert sorted(ct2_model.model.batches, key=str) == sorted(
+        [(10, {"fra_Latn"}, 1), (10, {"deu_Latn"}, 1), (1, {"fra_Latn"}, 4)], key=str
+    )
+
+
+@pytest.mark.asyncio
+async def test_ct2_batches_are_bounded_by_tokens(ct2_model):
+    ct2_model.batcher.max_wait = 0.05
+    ct2_model.batcher.max_batch_cost = 10
+    prompt = " ".join(f"w{i} w w." for i in range(6))  # 6 sentences of 5 tokens
+
+    await _ct2_translate(ct2_model, {"prompt": prompt, "tgt_lang": "fra_Latn"})
+
+    assert ct2_model.model.calls == [2, 2, 2]
+
+
+@pytest.mark.asyncio
+async def test_ct2_translation_does_not_block_the_event_loop(ct2_model):
+    ct2_model.model.delay = 0.2
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    await _ct2_translate(ct2_model, {"prompt": "Slow.", "tgt_lang": "fra_Latn"})
+    task.cancel()
+
+    assert ticks >= 5
+
+
+if __name__ == "__main__":
+    pytest.main()
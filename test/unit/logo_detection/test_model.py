@@ -0,0 +1,220 @@
+import asyncio
+import base64
+import os
+
+import keras
+import numpy as np
+import pytest
+import tensorflow as tf
+from kserve.errors import InferenceError
+
+from src.models.logo_detection.model_server.model import LogoDetectionModel
+
+IMAGE_SIZE = 32
+
+
+def _encode(image: np.ndarray, image_format: str) -> bytes:
+    if image_format == "png":
+        return tf.io.encode_png(image).numpy()
+    return tf.io.encode_jpeg(image).numpy()
+
+
+@pytest.fixture(scope="module")
+def images():
+    """Random RGB images of various sizes, keyed by filename."""
+    rng = np.random.default_rng(0)
+    images = {}
+    for idx, (height, width) in enumerate([(40, 60), (32, 32), (100, 20), (17, 33)]):
+        image = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        image_format = "png" if idx % 2 else "jpg"
+        images[f"image_{3 - idx}.{image_format}"] = _encode(image, image_format)
+    return images
+
+
+@pytest.fixture(scope="module")
+def model(tmp_path_factory):
+    """LogoDetectionModel backed by a tiny random keras model."""
+    keras.utils.set_random_seed(0)
+    tiny_model = keras.Sequential(
+        [
+            keras.Input(shape=(IMAGE_SIZE, IMAGE_SIZE, 3)),
+            keras.layers.Rescaling(1.0 / 255),
+            keras.layers.Conv2D(4, 3, activation="relu"),
+            keras.layers.GlobalAveragePooling2D(),
+            keras.layers.Dense(2, activation="softmax"),
+        ]
+    )
+    model_path = str(tmp_path_factory.mktemp("model") / "tiny.keras")
+    tiny_model.save(model_path)
+    env = {
+        "MODEL_PATH": model_path,
+        "IMAGE_HEIGHT": str(IMAGE_SIZE),
+        "IMAGE_WIDTH": str(IMAGE_SIZE),
+        "BATCH_SIZE": "3",
+        "IMAGE_MAX_SIZE": "100000",
+    }
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in env.items():
+            mp.setenv(key, value)
+        yield LogoDetectionModel("logo-detection")
+
+
+def _payload(images):
+    return {
+        "instances": [
+            {
+                "filename": filename,
+                "image": base64.b64encode(image_bytes).decode("utf-8"),
+                "target": "logo",
+            }
+            for filename, image_bytes in images.items()
+        ]
+    }
+
+
+def _predict(model, payload):
+    return model.predict(asyncio.run(model.preprocess(payload)))
+
+
+class _CountingModel:
+    """Wraps a keras model and records the number of images it scores."""
+
+    def __init__(self, model):
+        self.model = model
+        self.scored = 0
+
+    def __call__(self, batch):
+        self.scored += batch.shape[0]
+        return self.model(batch)
+
+
+@pytest.fixture
+def counting_model(model):
+    original = model.model
+    model.model = _CountingModel(original)
+    model.result_cache.clear()
+    yield model
+    model.model = original
+    model.result_cache.clear()
+
+
+def test_predictions_match_directory_dataset_pipeline(model, images, tmp_path):
+    # Reference: the previous pipeline, which wrote the images to a temporary
+    # directory and read them back with image_dataset_from_directory.
+    for filename, image_bytes in images.items():
+        (tmp_path / filename).write_bytes(image_bytes)
+    dataset = keras.utils.image_dataset_from_directory(
+        str(tmp_path),
+        labels=None,
+        label_mode=None,
+        batch_size=model.batch_size,
+        image_size=model.image_size,
+        shuffle=False,
+    )
+    expected = []
+    for batch in dataset:
+        expected.extend(model.model(batch))
+    expected_filenames = [os.path.basename(path) for path in dataset.file_paths]
+
+    predictions = _predict(model, _payload(images))["predictions"]
+
+    assert [p["filename"] for p in predictions] == expected_filenames
+    for prediction, raw_prediction in zip(predictions, expected):
+        assert prediction["target"] == "logo"
+        assert prediction["prediction"] == round(float(raw_prediction[1]), 4)
+        assert prediction["out_of_domain"] == round(float(raw_prediction[0]), 4)
+
+
+def test_no_temporary_files_are_written(model, images, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("temporary directory created")
+
+    monkeypatch.setattr("tempfile.mkdtemp", fail)
+    predictions = _predict(model, _payload(images))["predictions"]
+
+    assert len(predictions) == len(images)
+
+
+def test_debug_returns_latency(model, images):
+    payload = {**_payload(images), "debug": True}
+    response = _predict(model, payload)
+
+    assert set(response["latency"]) == {"preprocess (s)", "predict (s)", "total (s)"}
+
+
+def test_invalid_image_raises_inference_error(model):
+    payload = _payload({"broken.png": b"not an image"})
+
+    with pytest.raises(InferenceError):
+        asyncio.run(model.preprocess(payload))
+
+
+def test_oversized_image_raises_inference_error(model):
+    payload = _payload({"huge.png": b"0" * (model.image_max_size + 1)})
+
+    with pytest.raises(InferenceError):
+        asyncio.run(model.preprocess(payload))
+
+
+def test_identical_images_in_a_request_are_scored_once(counting_model, images):
+    image_bytes = next(iter(images.values()))
+    payload = _payload({"a.jpg": image_bytes, "b.jpg": image_bytes})
+
+    predictions = _predict(counting_model, payload)["predictions"]
+
+    assert counting_model.model.scored == 1
+    assert predictions[0]["prediction"] == predictions[1]["prediction"]
+    assert predictions[0]["out_of_domain"] == predictions[1]["out_of_domain"]
+
+
+def test_near_duplicate_images_share_a_perceptual_hash(counting_model):
+    # A smooth gradient and a re-encoded half-size thumbnail of it.
+    gradient = np.linspace(0, 255, 64, dtype=np.float32)
+    image = np.stack(np.meshgrid(gradient, gradient[::-1]) + [np.full((64, 64), 100)])
+    image = np.moveaxis(image, 0, -1).astype(np.uint8)
+    thumbnail = tf.cast(tf.image.resize(image, (32, 32)), tf.uint8).numpy()
+    payload = _payload(
+        {"original.png": _encode(image, "png"), "thumb.jpg": _encode(thumbnail, "jpg")}
+    )
+
+    predictions = _predict(counting_model, payload)["predictions"]
+
+    assert counting_model.model.scored == 1
+    assert len(predictions) == 2
+
+
+def test_flat_images_of_different_colors_are_not_deduplicated(counting_model):
+    black = np.zeros((32, 32, 3), dtype=np.uint8)
+    white = np.full((32, 32, 3), 255, dtype=np.uint8)
+    payload = _payload(
+        {"black.png": _encode(black, "png"), "white.png": _encode(white, "png")}
+    )
+
+    _predict(counting_model, payload)
+
+    assert counting_model.model.scored == 2
+
+
+def test_results_are_cached_across_requests(counting_model, images):
+    hits = counting_model.result_cache.hits
+    first = _predict(counting_model, _payload(images))["predictions"]
+    scored = counting_model.model.scored
+    # Same contents under different filenames are served from the cache.
+    renamed = {f"copy_{name}": image_bytes for name, image_bytes in images.items()}
+    second = _predict(counting_model, _payload(renamed))["predictions"]
+
+    assert scored == len(images)
+    assert counting_model.model.scored == scored
+    assert [p["prediction"] for p in first] == [p["prediction"] for p in second]
+    assert counting_model.result_cache.hits - hits == len(images)
+
+
+def test_result_cache_is_bounded(counting_model, images, monkeypatch):
+    monkeypatch.setattr(counting_model.result_cache, "max_entries", 2)
+    _predict(counting_model, _payload(images))
+
+    assert len(counting_model.result_cache) == 2
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,292 @@
+import asyncio
+import math
+import sys
+import types
+from unittest.mock import MagicMock
+
+import pytest
+from kserve.errors import InvalidInput
+from prometheus_client import REGISTRY
+
+
+def _make_mock_package(name):
+    """Create a mock module that acts as a package with __path__."""
+    mod = MagicMock()
+    mod.__path__ = []
+    mod.__name__ = name
+    return mod
+
+
+# Mock GPU-only deps before importing the models.
+sys.modules["vllm"] = _make_mock_package("vllm")
+sys.modules["vllm"].SamplingParams = types.SimpleNamespace
+sys.modules["vllm.engine"] = _make_mock_package("vllm.engine")
+sys.modules["vllm.engine.arg_utils"] = MagicMock()
+sys.modules["vllm.engine.async_llm_engine"] = MagicMock()
+sys.modules["vllm.inputs"] = MagicMock()
+# TokensPrompt is a TypedDict.
+sys.modules["vllm.inputs"].TokensPrompt = dict
+
+from src.models.policy_violation.cope_a_9b import model as cope_a  # noqa: E402
+from src.models.policy_violation.cope_b_a4b import model as cope_b  # noqa: E402
+
+BOS = 2
+POLICY = "Content must not contain spam, phishing attempts, or deceptive links."
+CONTENTS = [
+    "CLICK HERE TO WIN $10000!!! Visit http://totallylegit.biz NOW!!!",
+    "The weather is nice today.",
+    "",
+]
+
+
+class _FakeTokenizer:
+    """Character-level tokenizer with a Gemma-like chat template."""
+
+    def encode(self, text, add_special_tokens=True):
+        return ([BOS] if add_special_tokens else []) + [ord(c) for c in text]
+
+    def apply_chat_template(self, messages, tokenize, add_generation_prompt):
+        (message,) = messages
+        return (
+            f"<bos><start_of_turn>user\n{message['content'].strip()}<end_of_turn>\n"
+            "<start_of_turn>model\n"
+        )
+
+
+class _StubEngine:
+    """
+    AsyncLLMEngine stand-in that records every prompt it generates for and
+    answers with output(prompt_text).
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.prompts = []
+
+    async def generate(self, prompt, sampling_params, request_id):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0)
+        yield types.SimpleNamespace(
+            outputs=[self.output(bytes(prompt["prompt_token_ids"][1:]).decode())],
+            prompt_token_ids=prompt["prompt_token_ids"],
+            num_cached_tokens=len(prompt["prompt_token_ids"]) - 1,
+        )
+
+
+def _metric(name, model_name):
+    return REGISTRY.get_sample_value(name, {"model_name": model_name}) or 0.0
+
+
+@pytest.fixture
+def cope_a_model():
+    model = cope_a.CoPEModel(
+        name="cope-a-test", model_path="/tmp/model", trust_remote_code=False
+    )
+    model.tokenizer = _FakeTokenizer()
+    model.model = _StubEngine(
+        lambda prompt: types.SimpleNamespace(
+            text=" 1\n" if "spam" in prompt else "0", logprobs=None
+        )
+    )
+    return model
+
+
+@pytest.fixture
+def cope_b_model():
+    model = cope_b.CoPEBModel(
+        name="cope-b-test",
+        model_path="/tmp/model",
+        trust_remote_code=False,
+        dtype="bfloat16",
+        quantization=None,
+        max_model_len=8192,
+        disable_log_stats=False,
+    )
+    model.tokenizer = _FakeTokenizer()
+
+    def output(prompt):
+        p_violation = 0.9 if "spam" in prompt else 0.2
+        logprobs = {
+            48: types.SimpleNamespace(
+                decoded_token="0", logprob=math.log(1 - p_violation)
+            ),
+            49: types.SimpleNamespace(decoded_token="1", logprob=math.log(p_violation)),
+        }
+        return types.SimpleNamespace(
+            text="1" if p_violation > 0.5 else "0", logprobs=[logprobs]
+        )
+
+    model.model = _StubEngine(output)
+    return model
+
+
+def test_cope_a_prompts_share_the_policy_prefix():
+    prompts = [
+        (cope_a.render_prefix(POLICY), cope_a.render_suffix(content))
+        for content in CONTENTS
+    ]
+
+    assert len({prefix for prefix, _ in prompts}) == 1
+    assert prompts[0][0].startswith("INSTRUCTIONS")
+    assert POLICY in prompts[0][0]
+    for (prefix, suffix), content in zip(prompts, CONTENTS):
+        assert prefix + suffix == (
+            f"{prompts[0][0].split(POLICY)[0]}{POLICY}\n\nCONTENT\n=======\n"
+            f"{content}\n\nANSWER\n======\n"
+        )
+
+
+def test_cope_a_equivalent_policies_share_the_prefix():
+    assert cope_a.render_prefix(f"\n  {POLICY}\r\n") == cope_a.render_prefix(POLICY)
+
+
+def test_cope_a_prompt_token_ids_share_the_prefix(cope_a_model):
+    tokenizer = cope_a_model.tokenizer
+    prefix = cope_a.render_prefix(POLICY)
+    prefix_ids = tokenizer.encode(prefix)
+
+    for content in CONTENTS:
+        token_ids = cope_a_model.preprocess({"content": content, "policy": POLICY})[
+            "prompts"
+        ][0]["prompt_token_ids"]
+        # The whole prompt is tokenized at once.
+        assert token_ids == tokenizer.encode(prefix + cope_a.render_suffix(content))
+        assert token_ids[: len(prefix_ids)] == prefix_ids
+    # The policy prefix is rendered once.
+    assert cope_a_model.policy_prefixes.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cope_a_predict_exports_prefix_cache_hits(cope_a_model):
+    cached_before = _metric("prompt_cached_tokens_total", "cope-a-test")
+    total_before = _metric("prompt_tokens_total", "cope-a-test")
+    inputs = cope_a_model.preprocess({"content": CONTENTS[0], "policy": POLICY})
+
+    result = cope_a_model.postprocess(await cope_a_model.predict(inputs))
+
+    assert result == {"violation": 1}
+    assert cope_a_model.model.prompts == inputs["prompts"]
+    length = len(inputs["prompts"][0]["prompt_token_ids"])
+    assert _metric("prompt_tokens_total", "cope-a-test") - total_before == length
+    assert (
+        _metric("prompt_cached_tokens_total", "cope-a-test") - cached_before
+        == length - 1
+    )
+
+
+@pytest.mark.parametrize("model_fixture", ["cope_a_model", "cope_b_model"])
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"content": "a"},
+        {"policy": "p"},
+        {"content": ["a"], "policy": "p"},
+        {"content": "a", "policies": []},
+        {"content": "a", "policies": "p"},
+        {"content": "a", "policies": ["p", 1]},
+        {"content": "a", "policies": ["p"] * 33},
+    ],
+)
+def test_invalid_payloads(request, model_fixture, payload):
+    model = request.getfixturevalue(model_fixture)
+
+    with pytest.raises(InvalidInput):
+        model.preprocess(payload)
+
+
+def test_cope_b_prompts_share_the_policy_prefix(cope_b_model):
+    tokenizer = cope_b_model.tokenizer
+    prefix, suffix = cope_b_model.render_policy(POLICY)
+    prefix_ids = tokenizer.encode(prefix, add_special_tokens=False)
+
+    assert prefix.startswith("<bos><start_of_turn>user\nExamine")
+    assert prefix.endswith(f"{POLICY}\n\n\nCONTENT\n=======\n\n")
+    assert suffix == "<end_of_turn>\n<start_of_turn>model\n"
+    for content in [*CONTENTS, "  Trailing whitespace.\n\n ", " \n"]:
+        token_ids = cope_b_model.preprocess({"content": content, "policy": POLICY})[
+            "prompts"
+        ][0]["prompt_token_ids"]
+        # Same rendering as applying the chat template to the whole prompt.
+        message = cope_b.PROMPT_TEMPLATE.format(policy=POLICY, content=content)
+        expected = tokenizer.apply_chat_template(
+            [{"role": "user", "content": message}],
+            tokenize=False,
+            add_generation_prompt=True,
+        )
+        assert bytes(token_ids).decode() == expected
+        if content.strip():
+            assert token_ids[: len(prefix_ids)] == prefix_ids
+
+
+def test_cope_b_policy_is_rendered_once(cope_b_model):
+    for content in CONTENTS:
+        cope_b_model.preprocess({"content": content, "policy": POLICY})
+        cope_b_model.preprocess({"content": content, "policy": f" {POLICY}\n"})
+
+    assert cope_b_model.policy_prompts.stats()["misses"] == 1
+
+
+def test_cope_b_placeholder_in_policy(cope_b_model):
+    policy = f"Never write {cope_b.CONTENT_PLACEHOLDER}."
+    token_ids = cope_b_model.preprocess({"content": "hello", "policy": policy})[
+        "prompts"
+    ][0]["prompt_token_ids"]
+
+    text = bytes(token_ids).decode()
+    assert policy in text
+    assert "=======\n\nhello<end_of_turn>" in text
+
+
+@pytest.mark.asyncio
+async def test_cope_b_predict(cope_b_model):
+    cached_before = _metric("prompt_cached_tokens_total", "cope-b-test")
+    inputs = cope_b_model.preprocess({"content": CONTENTS[0], "policy": POLICY})
+
+    result = cope_b_model.postprocess(await cope_b_model.predict(inputs))
+
+    assert result["violation"] == 1
+    assert result["p_violation"] == pytest.approx(0.9)
+    assert result["p_safe"] == pytest.approx(0.1)
+    assert _metric("prompt_cached_tokens_total", "cope-b-test") > cached_before
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("model_fixture", ["cope_a_model", "cope_b_model"])
+async def test_multiple_policies_in_one_pass(request, model_fixture):
+    model = request.getfixturevalue(model_fixture)
+    policies = ["No harassment.", POLICY, "No vandalism."]
+
+    inputs = model.preprocess({"content": CONTENTS[0], "policies": policies})
+    result = model.postprocess(await model.predict(inputs))
+
+    # One prompt per policy, submitted together.
+    assert model.model.prompts == inputs["prompts"]
+    texts = [bytes(p["prompt_token_ids"][1:]).decode() for p in inputs["prompts"]]
+    assert [policy in text for text in texts for policy in policies] == [
+        i == j for i in range(3) for j in range(3)
+    ]
+    assert all(CONTENTS[0] in text for text in texts)
+    assert [verdict["violation"] for verdict in result["verdicts"]] == [0, 1, 0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("model_fixture", ["cope_a_model", "cope_b_model"])
+async def test_multiple_policies_match_single_requests(request, model_fixture):
+    model = request.getfixturevalue(model_fixture)
+    policies = ["No harassment.", POLICY]
+
+    batch = model.postprocess(
+        await model.predict(
+            model.preprocess({"content": CONTENTS[0], "policies": policies})
+        )
+    )
+    single = [
+        model.postprocess(
+            await model.predict(
+                model.preprocess({"content": CONTENTS[0], "policy": policy})
+            )
+        )
+        for policy in policies
+    ]
+
+    assert batch == {"verdicts": single}
@@ -0,0 +1,223 @@
+import asyncio
+import gc
+from collections.abc import AsyncGenerator
+
+import pytest
+from prometheus_client import REGISTRY
+
+from python.admission_utils import AdmissionController, AdmissionRejected
+
+BUDGETS = {"interactive": 10.0, "batch": 300.0}
+
+
+def _controller(max_running=1, max_queued=16, budgets=BUDGETS, model_name="test"):
+    return AdmissionController(
+        max_running=max_running,
+        max_queued=max_queued,
+        wait_budgets=budgets,
+        model_name=model_name,
+    )
+
+
+def _metric(name, model_name, lane):
+    return (
+        REGISTRY.get_sample_value(name, {"model_name": model_name, "lane": lane}) or 0.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_free_slots_are_granted_at_once():
+    admission = _controller(max_running=2)
+
+    first = await admission.acquire("interactive")
+    second = await admission.acquire("batch")
+
+    assert admission.running == 2
+    admission.release(first)
+    admission.release(second)
+    assert admission.running == 0
+    assert admission.service_time >= 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_lane():
+    with pytest.raises(ValueError):
+        await _controller().acquire("urgent")
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_are_admitted_before_batch():
+    admission = _controller()
+    admitted = []
+
+    async def request(lane, name):
+        async with admission.slot(lane):
+            admitted.append(name)
+            await asyncio.sleep(0)
+
+    holder = await admission.acquire("batch")
+    tasks = [asyncio.create_task(request("batch", f"batch-{i}")) for i in range(2)]
+    await asyncio.sleep(0)
+    tasks += [
+        asyncio.create_task(request("interactive", f"interactive-{i}"))
+        for i in range(2)
+    ]
+    await asyncio.sleep(0)
+    assert admission.queued("batch") == 2
+    assert admission.queued("interactive") == 2
+
+    admission.release(holder)
+    await asyncio.gather(*tasks)
+
+    assert admitted == ["interactive-0", "interactive-1", "batch-0", "batch-1"]
+    assert admission.running == 0
+
+
+@pytest.mark.asyncio
+async def test_full_lane_is_rejected():
+    admission = _controller(max_queued=1, model_name="test-full")
+    rejections = _metric("admission_rejections_total", "test-full", "batch")
+    holder = await admission.acquire("interactive")
+    queued = asyncio.create_task(admission.acquire("batch"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as e:
+        await admission.acquire("batch")
+
+    assert e.value.lane == "batch"
+    assert e.value.retry_after >= 1
+    assert _metric("admission_rejections_total", "test-full", "batch") == (
+        rejections + 1
+    )
+    # The other lane still has room.
+    interactive = asyncio.create_task(admission.acquire("interactive"))
+    await asyncio.sleep(0)
+    assert admission.queued("interactive") == 1
+    admission.release(holder)
+    admission.release(await interactive)
+    admission.release(await queued)
+
+
+@pytest.mark.asyncio
+async def test_request_over_the_wait_budget_is_rejected():
+    admission = _controller(max_running=2, budgets={"interactive": 1.0, "batch": 5.0})
+    holders = [await admission.acquire("interactive") for _ in range(2)]
+    admission.service_time = 4.0
+
+    # One request ahead: (0 + 1) * 4 / 2 = 2s, over the interactive budget.
+    with pytest.raises(AdmissionRejected) as e:
+        await admission.acquire("interactive")
+    assert e.value.retry_after == 2
+    batch = asyncio.create_task(admission.acquire("batch"))
+    await asyncio.sleep(0)
+    # Now (1 + 1) * 4 / 2 = 4s, still within the batch budget, then 6s.
+    second_batch = asyncio.create_task(admission.acquire("batch"))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as e:
+        await admission.acquire("batch")
+    assert e.value.retry_after == 6
+
+    for holder in holders:
+        admission.release(holder)
+    admission.release(await batch)
+    admission.release(await second_batch)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_leaves_the_queue():
+    admission = _controller(model_name="test-cancel")
+    holder = await admission.acquire("interactive")
+    queued = asyncio.create_task(admission.acquire("interactive"))
+    await asyncio.sleep(0)
+    assert _metric("admission_queue_depth", "test-cancel", "interactive") == 1
+
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+
+    assert admission.queued("interactive") == 0
+    assert _metric("admission_queue_depth", "test-cancel", "interactive") == 0
+    admission.release(holder)
+    assert admission.running == 0
+
+
+@pytest.mark.asyncio
+async def test_release_after_holds_the_slot_until_the_stream_is_closed():
+    admission = _controller()
+
+    async def stream():
+        for i in range(3):
+            yield i
+
+    admitted_at = await admission.acquire("interactive")
+    wrapped = admission.release_after(stream(), admitted_at)
+    assert await wrapped.__anext__() == 0
+    assert admission.running == 1
+
+    await wrapped.aclose()
+
+    assert admission.running == 0
+
+
+@pytest.mark.asyncio
+async def test_release_after_releases_the_slot_once_the_stream_ends():
+    admission = _controller()
+
+    async def stream():
+        for i in range(3):
+            yield i
+
+    admitted_at = await admission.acquire("interactive")
+    wrapped = admission.release_after(stream(), admitted_at)
+
+    assert isinstance(wrapped, AsyncGenerator)
+    assert [i async for i in wrapped] == [0, 1, 2]
+    assert admission.running == 0
+    await wrapped.aclose()
+    assert admission.running == 0
+
+
+@pytest.mark.asyncio
+async def test_release_after_releases_the_slot_of_a_dropped_stream():
+    admission = _controller()
+
+    async def stream():
+        yield 0
+
+    admitted_at = await admission.acquire("interactive")
+    wrapped = admission.release_after(stream(), admitted_at)
+    assert admission.running == 1
+
+    # Never iterated, e.g. the client disconnected before the response started.
+    del wrapped
+    gc.collect()
+    await asyncio.sleep(0)
+
+    assert admission.running == 0
+    assert await admission.acquire("interactive")
+
+
+@pytest.mark.asyncio
+async def test_interactive_latency_holds_under_batch_overload():
+    admission = _controller(max_running=2, max_queued=100)
+    waits = {"interactive": [], "batch": []}
+
+    async def request(lane):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with admission.slot(lane):
+            waits[lane].append(loop.time() - start)
+            await asyncio.sleep(0.01)
+
+    batch = [asyncio.create_task(request("batch")) for _ in range(40)]
+    await asyncio.sleep(0.02)
+    interactive = []
+    for _ in range(5):
+        interactive.append(asyncio.create_task(request("interactive")))
+        await asyncio.sleep(0.015)
+    await asyncio.gather(*batch, *interactive)
+
+    # Each interactive request waits for at most one running request to end,
+    # while the batch backlog takes ~200ms to drain.
+    assert max(waits["interactive"]) < 0.1
+    assert max(waits["batch"]) > 0.15
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+
+from python.batching_utils import MicroBatcher, estimate_tokens
+
+
+class _RecordingBatchFn:
+    """Batch function stub that records every batch it receives."""
+
+    def __init__(self, delay: float = 0.0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.delay:
+            time.sleep(self.delay)
+        return [f"result-{item}" for item in items]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("a" * 40) == 10
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_share_a_batch():
+    batch_fn = _RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_wait_ms=50)
+
+    results = await asyncio.gather(
+        batcher.submit(["a", "b"]), batcher.submit(["c"]), batcher.submit(["d"])
+    )
+
+    assert results == [
+        ["result-a", "result-b"],
+        ["result-c"],
+        ["result-d"],
+    ]
+    assert len(batch_fn.batches) == 1
+    assert sorted(batch_fn.batches[0]) == ["a", "b", "c", "d"]
+
+
+@pytest.mark.asyncio
+async def test_batches_are_packed_by_cost_and_sorted():
+    batch_fn = _RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_wait_ms=50, max_batch_cost=10, cost=len)
+
+    results = await batcher.submit(["xxxxxx", "x", "xxxxx", "xxx", "xxxxxxxxxxxx"])
+
+    assert results == [
+        "result-xxxxxx",
+        "result-x",
+        "result-xxxxx",
+        "result-xxx",
+        "result-xxxxxxxxxxxx",
+    ]
+    # Shortest first, each batch within budget; oversized items run alone.
+    assert batch_fn.batches == [
+        ["x", "xxx", "xxxxx"],
+        ["xxxxxx"],
+        ["xxxxxxxxxxxx"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batches_respect_max_batch_size():
+    batch_fn = _RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_wait_ms=50, max_batch_size=2)
+
+    await batcher.submit(["a", "b", "c", "d", "e"])
+
+    assert [len(batch) for batch in batch_fn.batches] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_items_are_grouped_by_key():
+    batch_fn = _RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_wait_ms=50, group_key=lambda item: item[0])
+
+    await asyncio.gather(batcher.submit(["q1", "d1"]), batcher.submit(["q2", "d2"]))
+
+    assert sorted(sorted(batch) for batch in batch_fn.batches) == [
+        ["d1", "d2"],
+        ["q1", "q2"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_does_not_wait_for_the_window():
+    batcher = MicroBatcher(_RecordingBatchFn(), max_wait_ms=5000, max_batch_size=2)
+
+    results = await asyncio.wait_for(batcher.submit(["a", "b"]), timeout=1)
+
+    assert results == ["result-a", "result-b"]
+
+
+@pytest.mark.asyncio
+async def test_errors_are_propagated_to_every_caller_in_the_batch():
+    def failing(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(failing, max_wait_ms=50)
+
+    results = await asyncio.gather(
+        batcher.submit(["a"]), batcher.submit(["b"]), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    # The batcher keeps working after a failing batch.
+    batcher.process_batch = _RecordingBatchFn()
+    assert await batcher.submit(["c"]) == ["result-c"]
+
+
+@pytest.mark.asyncio
+async def test_event_loop_is_not_blocked_while_a_batch_runs():
+    batcher = MicroBatcher(_RecordingBatchFn(delay=0.2), max_wait_ms=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    await batcher.submit(["a"])
+    task.cancel()
+
+    assert ticks >= 5
+
+
+if __name__ == "__main__":
+    pytest.main()
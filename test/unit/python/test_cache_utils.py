@@ -0,0 +1,182 @@
+import sqlite3
+
+import pytest
+from prometheus_client import REGISTRY
+
+from python.cache_utils import DiskCache, LRUCache
+
+
+def _metric(name, cache_name):
+    return REGISTRY.get_sample_value(
+        name, {"model_name": "test-model", "cache": cache_name}
+    )
+
+
+def test_get_returns_default_on_miss():
+    cache = LRUCache("miss", model_name="test-model", max_entries=2)
+    assert cache.get("a") is None
+    assert cache.get("a", 42) == 42
+
+
+def test_evicts_least_recently_used_entry():
+    cache = LRUCache("entries", model_name="test-model", max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used entry
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_evicts_to_stay_within_max_bytes():
+    cache = LRUCache("bytes", model_name="test-model", max_bytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xxxx")
+
+    assert "a" not in cache
+    assert cache.size_bytes == 8
+
+
+def test_replacing_an_entry_updates_its_size():
+    cache = LRUCache("replace", model_name="test-model", max_bytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("a", "xx")
+
+    assert cache.size_bytes == 2
+    assert cache.get("a") == "xx"
+
+
+def test_oversized_values_are_not_cached():
+    cache = LRUCache("oversized", model_name="test-model", max_bytes=4, sizeof=len)
+    cache.put("a", "xxxxx")
+
+    assert "a" not in cache
+    assert cache.size_bytes == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = LRUCache("disabled", model_name="test-model", max_entries=0)
+    cache.put("a", 1)
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+
+
+def test_pop_and_clear():
+    cache = LRUCache("pop", model_name="test-model", max_bytes=10, sizeof=len)
+    cache.put("a", "xx")
+    cache.put("b", "xxx")
+
+    assert cache.pop("a") == "xx"
+    assert cache.pop("a") is None
+    assert cache.size_bytes == 3
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size_bytes == 0
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("python.cache_utils.time.monotonic", lambda: now[0])
+    cache = LRUCache("ttl", model_name="test-model", ttl=10, sizeof=len)
+    cache.put("a", "xx")
+    now[0] = 105.0
+    cache.put("b", "xxx")
+
+    now[0] = 109.0
+    assert cache.get("a") == "xx"
+    now[0] = 110.0
+    assert cache.get("a") is None
+    assert cache.get("b") == "xxx"
+    assert "a" not in cache
+    assert cache.size_bytes == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_stats_and_prometheus_metrics():
+    cache = LRUCache("metrics", model_name="test-model", max_entries=10, sizeof=len)
+    cache.put("a", "xyz")
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+
+    assert cache.stats() == {
+        "entries": 1,
+        "size_bytes": 3,
+        "hits": 2,
+        "misses": 1,
+        "hit_rate": pytest.approx(2 / 3),
+    }
+    assert _metric("cache_hits_total", "metrics") == 2
+    assert _metric("cache_misses_total", "metrics") == 1
+    assert _metric("cache_entries", "metrics") == 1
+    assert _metric("cache_size_bytes", "metrics") == 3
+
+
+def test_disk_cache_persists_values(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = DiskCache(path, "disk", model_name="test-model")
+    cache.put_many({"a": "x", "b": ["y", 1]})
+    cache.close()
+
+    cache = DiskCache(path, "disk", model_name="test-model")
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": "x", "b": ["y", 1]}
+    assert cache.get("c", 0) == 0
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_disk_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), "disk_lru", "test-model", 2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # "b" is now the least recently used entry
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+    assert _metric("cache_entries", "disk_lru") == 2
+
+
+def test_disk_cache_buffers_last_used_times_of_hits(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = DiskCache(path, "disk_touch", "test-model", 2, touch_interval=3600)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    def used(key):
+        with sqlite3.connect(path) as connection:
+            query = "SELECT used FROM cache WHERE key = ?"
+            return connection.execute(query, (key,)).fetchone()[0]
+
+    before = used("a")
+    cache.get("a")
+    # Reads don't write...
+    assert used("a") == before
+    # ...until the next put, which evicts by the buffered times.
+    cache.put("c", 3)
+    assert used("a") > before
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test_disk_cache_shared_between_connections(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    bounded = DiskCache(path, "disk_shared", "test-model", 3)
+    other = DiskCache(path, "disk_shared_other", "test-model")
+    bounded.put("a", 1)
+    other.put_many({"b": 2, "c": 3})
+    bounded.put("d", 4)
+
+    # The entries put by the other connection count towards the bound, and
+    # the least recently used entry of either is evicted first.
+    assert len(bounded) == 3
+    assert bounded.get_many(["a", "b", "c", "d"]) == {"b": 2, "c": 3, "d": 4}
+    assert _metric("cache_entries", "disk_shared") == 3
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+from kserve.errors import InvalidInput
+from prometheus_client import REGISTRY
+
+from python.policy_utils import get_policies, normalize_policy, record_prefix_cache
+
+
+def _metric(name):
+    return REGISTRY.get_sample_value(name, {"model_name": "policy-test"}) or 0.0
+
+
+def test_normalize_policy():
+    assert normalize_policy("\n  No spam.\r\nNo ads.\r\n") == "No spam.\nNo ads."
+
+
+def test_get_policies():
+    assert get_policies({"policy": "a"}, max_policies=2) == (["a"], False)
+    assert get_policies({"policies": ["a", "b"]}, max_policies=2) == (["a", "b"], True)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {},
+        {"policies": []},
+        {"policies": "a"},
+        {"policies": ["a", "b", "c"]},
+        {"policies": ["a", 1]},
+        {"policy": None},
+    ],
+)
+def test_get_policies_rejects_invalid_payloads(payload):
+    with pytest.raises(InvalidInput):
+        get_policies(payload, max_policies=2)
+
+
+def test_record_prefix_cache():
+    record_prefix_cache(
+        "policy-test", SimpleNamespace(prompt_token_ids=[1, 2, 3], num_cached_tokens=2)
+    )
+    record_prefix_cache(
+        "policy-test", SimpleNamespace(prompt_token_ids=[1], num_cached_tokens=None)
+    )
+
+    assert _metric("prompt_tokens_total") == 4
+    assert _metric("prompt_cached_tokens_total") == 2
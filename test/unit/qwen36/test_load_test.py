@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+from src.models.qwen36.model_server import load_test
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
+
+
+def test_percentile_matches_numpy_linear():
+    assert load_test.percentile([], 50) is None
+    assert load_test.percentile([3.0], 99) == 3.0
+    assert load_test.percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert load_test.percentile([1.0, 2.0, 3.0, 4.0, 5.0], 90) == pytest.approx(4.6)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_tokens", [None, 5])
+async def test_stub_engine_streams_output_len_tokens(max_tokens):
+    tokenizer = load_test.StubTokenizer()
+    engine = load_test.StubAsyncLLMEngine(
+        tokenizer, output_len=48, reasoning=True, tool_call=True
+    )
+
+    outputs = [
+        request_output
+        async for request_output in engine.generate(
+            "hello", types.SimpleNamespace(max_tokens=max_tokens), "id"
+        )
+    ]
+
+    assert len(outputs) == (max_tokens or 48)
+    assert [o.finished for o in outputs] == [False] * (len(outputs) - 1) + [True]
+    final = outputs[-1].outputs[0]
+    assert final.text == tokenizer.decode(final.token_ids)
+    assert final.finish_reason == "length"
+    if max_tokens is None:
+        assert final.text.startswith("<think>")
+        assert final.text.endswith("</tool_call>")
+    assert engine.cpu_seconds > 0
+
+
+def test_load_test_writes_results_and_summary(tmp_path):
+    result_dir = tmp_path / "results"
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.join(REPO_ROOT, "src/models/qwen36/model_server/load_test.py"),
+            "--num-prompts=8",
+            "--input-len=16",
+            "--output-len=32",
+            "--concurrencies",
+            "1",
+            "4",
+            "--reasoning",
+            "--tool-call",
+            f"--result-dir={result_dir}",
+        ],
+        check=True,
+        cwd=REPO_ROOT,
+        env=env,
+        timeout=120,
+    )
+
+    for concurrency in (1, 4):
+        result = json.loads((result_dir / f"c{concurrency}.json").read_text())
+        assert result["max_concurrency"] == concurrency
+        assert result["completed"] == 8
+        assert result["total_output_tokens"] == 8 * 32
+        assert result["cpu_us_per_token"] > 0
+        assert result["cpu_ms_per_request"] > 0
+    summary = (result_dir / "summary.md").read_text().splitlines()
+    assert summary[0] == "| " + " | ".join(load_test.SUMMARY_HEADER) + " |"
+    assert [row.split(" | ")[0] for row in summary[2:]] == ["| 1", "| 4"]
+    assert all(row.split(" | ")[10] == "0" for row in summary[2:])
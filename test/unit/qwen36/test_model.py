@@ -49,8 +49,11 @@ sys.modules["vllm.reasoning"] = _make_mock_package("vllm.reasoning")
 sys.modules["vllm.sampling_params"] = MagicMock()
 sys.modules["vllm.tool_parsers"] = _make_mock_package("vllm.tool_parsers")
 
+from python.admission_utils import AdmissionController  # noqa: E402
+from python.cache_utils import LRUCache  # noqa: E402
 from src.models.qwen36.model_server.model import (  # noqa: E402
     RAW_COMPLETIONS_DEFAULTS,
+    ChatChunkEnvelope,
     PerRequestOptions,
     Qwen36Model,  # noqa: E402
 )
@@ -146,6 +149,15 @@ def model():
         m.tokenizer = MagicMock()
         m.tokenizer.encode.return_value = [100, 200, 300, 400, 500]
         m.tokenizer.apply_chat_template.return_value = "mocked template output"
+        m.admission = AdmissionController(
+            max_running=128,
+            max_queued=256,
+            wait_budgets={"interactive": 10.0, "batch": 300.0},
+            model_name=m.name,
+        )
+        m.response_cache = LRUCache("responses", model_name=m.name, max_entries=0)
+        m.stream_flush_interval = 0.0
+        m.stream_flush_max_chars = 512
         yield m
 
 
@@ -1420,31 +1432,24 @@ class TestReasoningExtractionStreaming:
         import src.models.qwen36.model_server.model as model_module
 
         with _patched_stream_types(model_module):
-            with patch.object(
-                model,
-                "_build_sampling_params_from_request",
-                return_value=MagicMock(),
-            ):
-                request = MagicMock()
-                request.model = "test-model"
-                chat_prompt = MagicMock()
-                chat_prompt.response_role = "assistant"
-                completion_request = MagicMock()
-                completion_request.request_id = None
-                completion_request.prompt = "test prompt"
-
-                async def _collect():
-                    chunks = []
-                    async for chunk in model._stream_chat_completion(
-                        request,
-                        chat_prompt,
-                        completion_request,
-                        options=PerRequestOptions(enable_thinking=thinking),
-                    ):
-                        chunks.append(chunk)
-                    return chunks
-
-                chunks = asyncio.run(_collect())
+            request = MagicMock()
+            request.model = "test-model"
+            chat_prompt = MagicMock()
+            chat_prompt.response_role = "assistant"
+
+            async def _collect():
+                chunks = []
+                async for chunk in model._stream_chat_completion(
+                    request,
+                    chat_prompt,
+                    model.model.generate(),
+                    "req-1",
+                    options=PerRequestOptions(enable_thinking=thinking),
+                ):
+                    chunks.append(chunk)
+                return chunks
+
+            chunks = asyncio.run(_collect())
 
         return [
             json.loads(c[len("data: ") :])
@@ -1581,6 +1586,38 @@ class TestReasoningExtractionStreaming:
         assert final["usage"]["completion_tokens"] == 3
         assert final["usage"]["total_tokens"] == 6
 
+    def test_parser_not_called_after_reasoning_ends(self, model_with_parser):
+        model = model_with_parser
+        model.reasoning_parser.extract_reasoning_streaming.side_effect = [
+            self._make_delta(reasoning="trace"),
+            self._make_delta(reasoning=" end", content="ans"),
+        ]
+        outputs = self._make_final_outputs(
+            [
+                ("trace", [100], False),
+                ("trace end</think>ans", [100, 200, 300], False),
+                ("trace end</think>answer", [100, 200, 300, 400], False),
+                ("trace end</think>answer", [100, 200, 300, 400, 500], False),
+                ("trace end</think>answer.", [100, 200, 300, 400, 500, 600], True),
+            ]
+        )
+        model.model = MagicMock()
+        model.model.generate.return_value = self._async_gen(outputs)
+
+        data_chunks = self._collect_stream(model, thinking=True)
+
+        # Everything after the first content delta is content; an output that
+        # adds no text produces no chunk.
+        assert model.reasoning_parser.extract_reasoning_streaming.call_count == 2
+        deltas = [c["choices"][0]["delta"] for c in data_chunks[:-1]]
+        assert [(d["reasoning"], d["content"]) for d in deltas] == [
+            ("trace", None),
+            (" end", "ans"),
+            (None, "wer"),
+            (None, "."),
+        ]
+        assert data_chunks[-1]["usage"]["completion_tokens"] == 6
+
 
 class TestToolCallParsingStreaming:
     """Tests for streamed tool calls routed through vLLM's streaming parser."""
@@ -1635,32 +1672,25 @@ class TestToolCallParsingStreaming:
         import src.models.qwen36.model_server.model as model_module
 
         with _patched_stream_types(model_module):
-            with patch.object(
-                model,
-                "_build_sampling_params_from_request",
-                return_value=MagicMock(),
-            ):
-                request = MagicMock()
-                request.model = "test-model"
-                chat_prompt = MagicMock()
-                chat_prompt.response_role = "assistant"
-                completion_request = MagicMock()
-                completion_request.request_id = None
-                completion_request.prompt = "test prompt"
-
-                async def _collect():
-                    chunks = []
-                    async for chunk in model._stream_chat_completion(
-                        request,
-                        chat_prompt,
-                        completion_request,
-                        parse_tool_calls,
-                        options=PerRequestOptions(enable_thinking=thinking),
-                    ):
-                        chunks.append(chunk)
-                    return chunks
-
-                chunks = asyncio.run(_collect())
+            request = MagicMock()
+            request.model = "test-model"
+            chat_prompt = MagicMock()
+            chat_prompt.response_role = "assistant"
+
+            async def _collect():
+                chunks = []
+                async for chunk in model._stream_chat_completion(
+                    request,
+                    chat_prompt,
+                    model.model.generate(),
+                    "req-1",
+                    parse_tool_calls,
+                    options=PerRequestOptions(enable_thinking=thinking),
+                ):
+                    chunks.append(chunk)
+                return chunks
+
+            chunks = asyncio.run(_collect())
 
         return [
             json.loads(c[len("data: ") :])
@@ -1925,6 +1955,220 @@ class TestToolCallParsingStreaming:
         assert model.tool_parser_cls.call_count == 2
         model.tool_parser_cls.assert_called_with(model.tokenizer)
 
+    def test_parser_called_from_the_first_possible_tag(self, model):
+        model.reasoning_parser = None
+        model.tool_parser_cls = MagicMock()
+        tool_parser = MagicMock()
+        tool_parser.tool_call_start_token = "<tool_call>"
+        tool_parser.extract_tool_calls_streaming.side_effect = [
+            self._make_tool_delta(content=" a <b>"),
+            self._make_tool_delta(content=" c"),
+        ]
+        model.tool_parser_cls.return_value = tool_parser
+
+        steps = [
+            ("Plain", [100], False),
+            ("Plain text", [100, 200], False),
+            ("Plain text a <b>", [100, 200, 300], False),
+            ("Plain text a <b> c", [100, 200, 300, 400], True),
+        ]
+        model.model = MagicMock()
+        model.model.generate.return_value = self._async_gen(
+            self._make_request_outputs(steps)
+        )
+
+        data_chunks = self._collect_stream(model)
+
+        # The parser sees the content from the first "<" on as the whole text.
+        calls = tool_parser.extract_tool_calls_streaming.call_args_list
+        assert [call.args[:3] for call in calls] == [
+            ("", " a <b>", " a <b>"),
+            (" a <b>", " a <b> c", " c"),
+        ]
+        assert [c["choices"][0]["delta"]["content"] for c in data_chunks[:-1]] == [
+            "Plain",
+            " text",
+            " a <b>",
+            " c",
+        ]
+        assert data_chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+
+class TestStreamCoalescing:
+    """Tests for coalescing streamed chat deltas into timed flushes."""
+
+    _collect_stream = TestToolCallParsingStreaming._collect_stream
+
+    @staticmethod
+    async def _outputs(texts, delay=0.0):
+        import asyncio
+
+        for n, text in enumerate(texts, start=1):
+            out = MagicMock()
+            out.index = 0
+            out.text = text
+            out.token_ids = list(range(n))
+            out.finish_reason = "stop" if n == len(texts) else None
+            req = MagicMock()
+            req.prompt_token_ids = [1, 2, 3]
+            req.outputs = [out]
+            req.finished = n == len(texts)
+            yield req
+            await asyncio.sleep(delay)
+
+    def _contents(self, model, texts, delay=0.0):
+        model.reasoning_parser = None
+        model.model = MagicMock()
+        model.model.generate.return_value = self._outputs(texts, delay)
+        data_chunks = self._collect_stream(model, parse_tool_calls=False)
+        assert data_chunks[-1]["usage"]["completion_tokens"] == len(texts)
+        return [c["choices"][0]["delta"]["content"] for c in data_chunks[:-1]]
+
+    def test_deltas_within_the_interval_are_merged(self, model):
+        model.stream_flush_interval = 60.0
+
+        contents = self._contents(model, ["a", "ab", "abc", "abcd"])
+
+        # The first chunk is not delayed; the last output flushes the rest.
+        assert contents == ["a", "bcd"]
+
+    def test_elapsed_interval_flushes(self, model):
+        model.stream_flush_interval = 0.001
+
+        contents = self._contents(model, ["a", "ab", "abc"], delay=0.01)
+
+        assert contents == ["a", "b", "c"]
+
+    def test_pending_characters_flush(self, model):
+        model.stream_flush_interval = 60.0
+        model.stream_flush_max_chars = 3
+
+        contents = self._contents(model, ["a", "ab", "abc", "abcd", "abcde"])
+
+        assert contents == ["a", "bcd", "e"]
+
+    def _parsed_stream(self, model, texts, interval, thinking, parse_tool_calls):
+        model.stream_flush_interval = interval
+        model.model = MagicMock()
+        model.model.generate.return_value = self._outputs(texts)
+        return self._collect_stream(
+            model, thinking=thinking, parse_tool_calls=parse_tool_calls
+        )
+
+    @staticmethod
+    def _strip_ids(data_chunks):
+        return [c["choices"] for c in data_chunks]
+
+    def test_tool_call_stream_is_not_coalesced(self, model):
+        seen = []
+
+        def extract(prev, curr, delta, prev_ids, curr_ids, delta_ids, request):
+            seen.append(delta)
+            if "</tool_call>" in curr:
+                call = _FakeType(index=0, function=_FakeType(name="f", arguments="{}"))
+                return _FakeType(content=None, tool_calls=[call])
+            return None
+
+        tool_parser = MagicMock()
+        tool_parser.tool_call_start_token = "<tool_call>"
+        tool_parser.extract_tool_calls_streaming.side_effect = extract
+        model.reasoning_parser = None
+        model.tool_parser_cls = MagicMock(return_value=tool_parser)
+        # The tool call tag is split across two engine outputs.
+        texts = [
+            "Hi",
+            "Hi <tool_",
+            "Hi <tool_call>{}",
+            "Hi <tool_call>{}</tool_call>",
+        ]
+
+        per_token = self._parsed_stream(model, texts, 0.0, False, True)
+        per_token_seen, seen[:] = list(seen), []
+        data_chunks = self._parsed_stream(model, texts, 60.0, False, True)
+
+        assert seen == per_token_seen == [" <tool_", "call>{}", "</tool_call>"]
+        assert self._strip_ids(data_chunks) == self._strip_ids(per_token)
+        assert data_chunks[0]["choices"][0]["delta"]["content"] == "Hi"
+        assert data_chunks[1]["choices"][0]["delta"]["tool_calls"][0]["function"] == {
+            "name": "f",
+            "arguments": "{}",
+        }
+        assert data_chunks[-1]["choices"][0]["finish_reason"] == "tool_calls"
+
+    def test_reasoning_stream_is_not_coalesced(self, model):
+        seen = []
+
+        def extract(prev, curr, delta, prev_ids, curr_ids, delta_ids):
+            seen.append(delta)
+            if "</think>" in curr:
+                return _FakeType(reasoning=None, content=curr.partition("</think>")[2])
+            if "<" in delta:
+                return None
+            return _FakeType(reasoning=delta, content=None)
+
+        model.reasoning_parser = MagicMock()
+        model.reasoning_parser.extract_reasoning_streaming.side_effect = extract
+        # The </think> tag is split across two engine outputs.
+        texts = ["a", "ab", "ab</thi", "ab</think>", "ab</think>c"]
+
+        per_token = self._parsed_stream(model, texts, 0.0, True, False)
+        per_token_seen, seen[:] = list(seen), []
+        data_chunks = self._parsed_stream(model, texts, 60.0, True, False)
+
+        # The parser is not called again once the reasoning has ended.
+        assert seen == per_token_seen == ["a", "b", "</thi", "nk>"]
+        assert self._strip_ids(data_chunks) == self._strip_ids(per_token)
+        deltas = [c["choices"][0]["delta"] for c in data_chunks[:-1]]
+        assert [d.get("reasoning") for d in deltas] == ["a", "b", None, None]
+        assert [d.get("content") for d in deltas] == [None, None, "", "c"]
+
+
+class TestChatChunkEnvelope:
+    """The pre-rendered chunk envelope must match the pydantic rendering."""
+
+    @pytest.fixture
+    def envelope(self):
+        import src.models.qwen36.model_server.model as model_module
+
+        with _patched_stream_types(model_module):
+            yield ChatChunkEnvelope("req-1", 123, "test-model", "assistant")
+
+    @pytest.mark.parametrize(
+        "content, reasoning",
+        [
+            ("plain", None),
+            (None, "thinking"),
+            ('quote " backslash \\ slash /', "tab\tnewline\ncontrol\x01"),
+            ("Kampala é 日本 🙂", "\u2028"),
+            ("", ""),
+        ],
+    )
+    def test_event_matches_the_rendered_chunk(self, envelope, content, reasoning):
+        import json
+
+        event = envelope.event(0, content, reasoning)
+
+        assert envelope.parts is not None
+        assert event.startswith("data: ") and event.endswith("\n\n")
+        assert json.loads(event[len("data: ") :]) == json.loads(
+            envelope.render(0, content, reasoning)[len("data: ") :]
+        )
+
+    def test_ascii_event_is_byte_identical(self, envelope):
+        assert envelope.event(0, "a\nb", None) == envelope.render(0, "a\nb", None)
+
+    def test_tool_calls_and_other_outputs_are_rendered(self, envelope):
+        import json
+
+        tool_calls = [{"index": 0, "function": {"name": "f"}}]
+
+        event = json.loads(envelope.event(0, None, None, tool_calls)[6:])
+        other = json.loads(envelope.event(1, "x", None)[6:])
+
+        assert event["choices"][0]["delta"]["tool_calls"] == tool_calls
+        assert other["choices"][0]["index"] == 1
+        assert other["choices"][0]["delta"]["content"] == "x"
+
 
 class TestResolveStructuredOutputs:
     """Tests for _resolve_structured_outputs."""
@@ -2178,6 +2422,7 @@ class TestCreateChatCompletionStructuredOutputs:
 
         sentinel = MagicMock()
         request = self._chat_request(stream=True)
+        model.model = MagicMock()
 
         with patch.object(
             model,
@@ -2642,3 +2887,362 @@ class TestChatCompletionToolCallParsing:
         mock_warning.assert_not_called()
         model.tool_parser_cls.assert_not_called()
         assert result.choices[0].message.content == "just an answer"
+
+
+class TestAdmissionControl:
+    @staticmethod
+    def _request_output(finish_reason="stop"):
+        output = MagicMock(index=0, text="Hi", token_ids=[1, 2])
+        output.finish_reason = finish_reason
+        return MagicMock(prompt_token_ids=[1, 2, 3], outputs=[output])
+
+    async def _stream(self, items):
+        for item in items:
+            yield item
+
+    def _limit(self, model, max_running=1, max_queued=0):
+        model.admission = AdmissionController(
+            max_running=max_running,
+            max_queued=max_queued,
+            wait_budgets={"interactive": 10.0, "batch": 300.0},
+            model_name=model.name,
+        )
+
+    @pytest.mark.parametrize(
+        "headers, priority",
+        [
+            (None, "interactive"),
+            ({}, "interactive"),
+            ({"x-request-priority": "batch"}, "batch"),
+            ({"X-Request-Priority": " Interactive "}, "interactive"),
+        ],
+    )
+    def test_resolve_priority(self, headers, priority):
+        assert Qwen36Model._resolve_priority(headers) == priority
+
+    def test_resolve_priority_rejects_unknown_lanes(self):
+        with pytest.raises(InvalidInput):
+            Qwen36Model._resolve_priority({"x-request-priority": "urgent"})
+
+    def test_priority_is_carried_in_request_options(self, model):
+        request = MagicMock(
+            chat_template_kwargs=None, thinking_token_budget=None, response_format=None
+        )
+
+        options = model._resolve_request_options(
+            request, {"headers": {"x-request-priority": "batch"}}
+        )
+
+        assert options.priority == "batch"
+        assert model._resolve_request_options(request).priority == "interactive"
+
+    def test_preprocess_resolves_priority(self, model):
+        inputs = model.preprocess(
+            {"prompt": "Hello"}, headers={"x-request-priority": "batch"}
+        )
+
+        assert inputs["priority"] == "batch"
+
+    def test_rejected_request_gets_429_with_retry_after(self, model):
+        import asyncio
+
+        from fastapi import HTTPException
+
+        self._limit(model)
+        model.model = MagicMock()
+
+        async def run():
+            holder = await model.admission.acquire("interactive")
+            try:
+                await model.create_completion(_completion_request_mock())
+            finally:
+                model.admission.release(holder)
+
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(run())
+
+        assert e.value.status_code == 429
+        assert int(e.value.headers["Retry-After"]) >= 1
+        model.model.generate.assert_not_called()
+
+    def test_slot_is_released_after_non_streaming_completion(self, model):
+        import asyncio
+
+        import src.models.qwen36.model_server.model as model_module
+
+        self._limit(model)
+        model.model = MagicMock()
+        model.model.generate.return_value = self._stream([self._request_output()])
+
+        with patch.multiple(
+            model_module,
+            Completion=_FakeType,
+            CompletionChoice=_FakeType,
+            UsageInfo=_FakeType,
+        ):
+            asyncio.run(model.create_completion(_completion_request_mock()))
+
+        assert model.admission.running == 0
+
+    def test_slot_is_released_when_generation_fails(self, model):
+        import asyncio
+
+        self._limit(model)
+        model.model = MagicMock()
+        model.model.generate.side_effect = RuntimeError("engine dead")
+
+        with pytest.raises(Exception):
+            asyncio.run(model.create_completion(_completion_request_mock()))
+
+        assert model.admission.running == 0
+
+    def test_streaming_holds_the_slot_until_the_stream_ends(self, model):
+        import asyncio
+
+        import src.models.qwen36.model_server.model as model_module
+
+        self._limit(model)
+        model.model = MagicMock()
+        model.model.generate.return_value = self._stream(
+            [self._request_output(None), self._request_output()]
+        )
+
+        async def run():
+            request = _completion_request_mock()
+            request.stream = True
+            stream = await model.create_completion(request)
+            running = [model.admission.running]
+            chunks = [chunk async for chunk in stream]
+            running.append(model.admission.running)
+            return chunks, running
+
+        with patch.multiple(
+            model_module, CompletionChunk=_FakeType, CompletionChunkChoice=_FakeType
+        ):
+            with patch.object(_FakeType, "model_dump_json", return_value="{}"):
+                chunks, running = asyncio.run(run())
+
+        assert chunks[-1] == "data: [DONE]\n\n"
+        assert running == [1, 0]
+
+    def test_batch_priority_reaches_admission(self, model):
+        import asyncio
+
+        model.admission = MagicMock()
+        model.admission.acquire = AsyncMock(return_value=0.0)
+        model.model = MagicMock()
+        model.model.generate.return_value = self._stream([self._request_output()])
+
+        asyncio.run(
+            model.predict(
+                model.preprocess(
+                    {"prompt": "Hello"}, headers={"x-request-priority": "batch"}
+                )
+            )
+        )
+
+        model.admission.acquire.assert_awaited_once_with("batch")
+        model.admission.release.assert_called_once_with(0.0)
+
+
+class _CountingEngine:
+    """Stub AsyncLLMEngine streaming "Hello world" one word at a time."""
+
+    def __init__(self, finish_reason="stop"):
+        self.calls = 0
+        self.finish_reason = finish_reason
+
+    async def generate(self, prompt, sampling_params, request_id):
+        self.calls += 1
+        words = ["Hello", " world"]
+        for i in range(len(words)):
+            output = MagicMock(
+                index=0, text="".join(words[: i + 1]), token_ids=list(range(i + 1))
+            )
+            output.finish_reason = self.finish_reason if i == len(words) - 1 else None
+            yield MagicMock(prompt_token_ids=[1, 2, 3], outputs=[output])
+
+
+class TestResponseCache:
+    @pytest.fixture
+    def cached_model(self, model):
+        import src.models.qwen36.model_server.model as model_module
+
+        model.model = _CountingEngine()
+        model.response_cache = LRUCache(
+            "responses", model_name=model.name, max_entries=8, ttl=60
+        )
+        with patch.multiple(
+            model_module,
+            SamplingParams=_FakeType,
+            Completion=_FakeType,
+            CompletionChoice=_FakeType,
+            CompletionChunk=_FakeType,
+            CompletionChunkChoice=_FakeType,
+            UsageInfo=_FakeType,
+        ):
+            yield model
+
+    @staticmethod
+    def _request(temperature=0.0, max_tokens=16, prompt="Hello?", stream=False):
+        request = _completion_request_mock(
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=None,
+            top_k=None,
+            presence_penalty=None,
+            repetition_penalty=None,
+            model="qwen36-27b",
+        )
+        request.prompt = prompt
+        request.stream = stream
+        return request
+
+    def _complete(self, model, request):
+        import asyncio
+
+        return asyncio.run(model.create_completion(request))
+
+    def test_second_identical_request_does_not_reach_the_engine(self, cached_model):
+        first = self._complete(cached_model, self._request())
+        second = self._complete(cached_model, self._request())
+
+        assert cached_model.model.calls == 1
+        assert second.choices[0].text == first.choices[0].text == "Hello world"
+        assert second.choices[0].finish_reason == "stop"
+        assert second.usage.prompt_tokens == 3
+        assert second.usage.completion_tokens == 2
+        assert cached_model.response_cache.stats()["hits"] == 1
+
+    @pytest.mark.parametrize(
+        "other",
+        [
+            dict(prompt="Goodbye?"),
+            dict(max_tokens=32),
+        ],
+    )
+    def test_different_requests_are_cached_separately(self, cached_model, other):
+        self._complete(cached_model, self._request())
+        self._complete(cached_model, self._request(**other))
+
+        assert cached_model.model.calls == 2
+
+    def test_sampled_requests_are_not_cached(self, cached_model):
+        self._complete(cached_model, self._request(temperature=0.7))
+        self._complete(cached_model, self._request(temperature=0.7))
+
+        assert cached_model.model.calls == 2
+        assert cached_model.response_cache.stats()["misses"] == 0
+
+    def test_disabled_by_default(self, cached_model):
+        cached_model.response_cache = LRUCache(
+            "responses", model_name=cached_model.name, max_entries=0
+        )
+
+        self._complete(cached_model, self._request())
+        self._complete(cached_model, self._request())
+
+        assert cached_model.model.calls == 2
+
+    def test_aborted_responses_are_not_cached(self, cached_model):
+        cached_model.model = _CountingEngine(finish_reason="abort")
+
+        self._complete(cached_model, self._request())
+        self._complete(cached_model, self._request())
+
+        assert cached_model.model.calls == 2
+
+    def test_tool_requests_are_not_cacheable(self, cached_model):
+        import asyncio
+
+        async def run():
+            generator, admitted_at = await cached_model._start_generation(
+                "prompt",
+                _FakeType(temperature=0),
+                "id",
+                PerRequestOptions(cacheable=False),
+            )
+            outputs = [output async for output in generator]
+            cached_model.admission.release(admitted_at)
+            return outputs
+
+        asyncio.run(run())
+        asyncio.run(run())
+
+        assert cached_model.model.calls == 2
+        assert len(cached_model.response_cache) == 0
+
+    def test_cached_response_is_replayed_when_streaming(self, cached_model):
+        import asyncio
+        import json
+
+        self._complete(cached_model, self._request())
+
+        async def run():
+            stream = await cached_model.create_completion(self._request(stream=True))
+            return [chunk async for chunk in stream]
+
+        with patch.object(
+            _FakeType,
+            "model_dump_json",
+            lambda chunk: json.dumps(
+                {
+                    "text": chunk.choices[0].text,
+                    "finish_reason": chunk.choices[0].finish_reason,
+                }
+            ),
+        ):
+            chunks = asyncio.run(run())
+
+        assert cached_model.model.calls == 1
+        assert chunks == [
+            'data: {"text": "Hello world", "finish_reason": "stop"}\n\n',
+            "data: [DONE]\n\n",
+        ]
+
+    def test_hits_do_not_take_an_engine_slot(self, cached_model):
+        import asyncio
+
+        self._complete(cached_model, self._request())
+        # A single slot and no queue: a miss is rejected while it is held.
+        cached_model.admission = AdmissionController(
+            max_running=1,
+            max_queued=0,
+            wait_budgets={"interactive": 10.0, "batch": 300.0},
+            model_name=cached_model.name,
+        )
+
+        async def run():
+            held = await cached_model.admission.acquire("interactive")
+            completion = await cached_model.create_completion(self._request())
+            stream = await cached_model.create_completion(self._request(stream=True))
+            chunks = [chunk async for chunk in stream]
+            with pytest.raises(Exception) as rejected:
+                await cached_model.create_completion(self._request(prompt="Other?"))
+            cached_model.admission.release(held)
+            return completion, chunks, rejected.value
+
+        completion, chunks, rejected = asyncio.run(run())
+
+        assert cached_model.model.calls == 1
+        assert completion.choices[0].text == "Hello world"
+        assert chunks[-1] == "data: [DONE]\n\n"
+        assert rejected.status_code == 429
+        assert cached_model.admission.running == 0
+
+    def test_cache_key_is_canonical(self, model):
+        params = dict(
+            temperature=0,
+            max_tokens=16,
+            structured_outputs={"json": {"b": 1, "a": 2}},
+        )
+        reordered = dict(
+            structured_outputs={"json": {"a": 2, "b": 1}},
+            max_tokens=16,
+            temperature=0,
+        )
+
+        key = model._response_cache_key("p", _FakeType(**params))
+
+        assert key == model._response_cache_key("p", _FakeType(**reordered))
+        assert key != model._response_cache_key("q", _FakeType(**params))